@@ -6,6 +6,7 @@ __copyright__ = "
 __license__ = "GNU GENERAL PUBLIC LICENSE v3"
 
 # Built-in Imports
+import glob
 import os
 import subprocess
 import shutil
@@ -28,6 +29,10 @@ class MCSMGenerator:
         self.__version = version
         self.__mcver = mcver
         self.__readme_path = "./README.txt"
+        self.__resources_path = r"../../resources"
+
+        # The resources the MCSM reads while running, which the binary unpacks into sys._MEIPASS.
+        self.__bundled_resources = ["CONFIG_TEMPLATE3.0.txt", "SERVER_PROPERTIES_*.txt"]
 
 
     def run(self):
@@ -53,8 +58,16 @@ class MCSMGenerator:
         # Copies the icon.ico file into the build folder
         shutil.copy(self.__icon_path, build_path)
 
+        # Copies the resources into the build folder, to be bundled into the binary.
+        bundle_arguments = list()
+        for pattern in self.__bundled_resources:
+            for resource_path in sorted(glob.glob(os.path.join(self.__resources_path, pattern))):
+                print(f"Bundling '{os.path.basename(resource_path)}'...")
+                shutil.copy(resource_path, build_path)
+                bundle_arguments += ["--add-data", f"{os.path.basename(resource_path)}{os.pathsep}."]
+
         # Builds the binary
-        subprocess.run(["pyinstaller", "--onefile", f"--icon=icon.ico", "main.py"],
+        subprocess.run(["pyinstaller", "--onefile", f"--icon=icon.ico", *bundle_arguments, "main.py"],
                        cwd=build_path)
 
         # Renames the binary to MCSM.exe and takes it out of the dist folder.
@@ -0,0 +1,782 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import ctypes
+import ctypes.util
+import hashlib
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+import zlib
+
+# Third Party Imports
+# Local Application Imports
+from exceptions import CorruptBackup
+from MCSMThrottle import MCSMThrottle
+from MCSMPathRules import MCSMPathRules
+
+
+# The name of the member holding the index of a .zip backup. It is stored uncompressed,
+# right before the central directory, so listing a backup doesn't decompress anything.
+INDEX_NAME = "MCSM-INDEX.json"
+
+# The manifest of a backup is saved next to it, with this suffix added to its name.
+MANIFEST_SUFFIX = ".manifest.json"
+
+# The formats the backups can be written in.
+FORMATS = ["tar.gz", "zip"]
+
+CHUNK_SIZE = 1024 * 1024
+
+# Files going into more than one archive are read into memory once, if they are at most this big.
+BUFFER_LIMIT = 16 * 1024 * 1024
+
+
+class MCSMArchiveWriter:
+    """
+    This class implements the writing of the backup archives, either as a .tar.gz, or as a
+    seekable .zip where every file is compressed on its own and indexed, so a single file
+    can be restored without decompressing the whole backup.
+    Every file, and the archive itself, is hashed while it is written, and the hashes are
+    saved into a manifest next to the archive once it is closed.
+    """
+
+    def __init__(self, output_path: str, archive_format: str = "tar.gz", throttle: MCSMThrottle = None,
+                 expected_size: int = 0):
+        self.output_path = output_path
+        self.archive_format = archive_format
+        self.index = list()
+        self.__throttle = throttle
+        self.__file = open(output_path, "wb")
+        self.__output = _HashingFile(self.__file, throttle=throttle)
+
+        # Reserving the expected size up front keeps the archive in one piece on the disk.
+        self.__preallocated = preallocate(self.__file, expected_size)
+
+        # The output can't be seeked, so the archive is written (and hashed) strictly in order.
+        if self.archive_format == "zip":
+            self.__archive = zipfile.ZipFile(self.__output, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        else:
+            self.__archive = tarfile.open(fileobj=self.__output, mode="w:gz")
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(completed=exc_type is None)
+
+
+    def add_folder(self, folder: str, arcname: str, rules: MCSMPathRules = None):
+        """
+        Adds every file inside a folder into the archive.
+        :param folder: The folder to add.
+        :param arcname: The name of the folder inside the archive. (e.g. "world")
+        :param rules: The rules choosing which files are left out, by their name inside the archive.
+        :return:
+        """
+        pipeline = MCSMArchivePipeline(self.__throttle)
+        pipeline.add_output(self, arcname, rules)
+        pipeline.run(folder, arcname)
+
+
+    def add_directory(self, path: str, arcname: str):
+        """
+        Adds a folder entry into the archive, without its contents. Tarballs keep
+        the folders, so empty ones are restored as well. Zips don't need them.
+        :param path: The path of the folder.
+        :param arcname: The name of the folder inside the archive.
+        :return:
+        """
+        if self.archive_format != "zip":
+            self.__archive.add(path, arcname, recursive=False)
+
+
+    def add_file(self, path: str, arcname: str):
+        """
+        Adds a single file into the archive, hashing it while it is streamed in.
+        :param path: The path of the file.
+        :param arcname: The name of the file inside the archive.
+        :return:
+        """
+        digest = hashlib.sha256()
+
+        if self.archive_format != "zip":
+            member_info = self.__archive.gettarinfo(path, arcname)
+
+            # Links and other special files have no contents to stream.
+            if not member_info.isreg():
+                self.__archive.addfile(member_info)
+                return
+
+            with open(path, "rb") as source:
+                self.__archive.addfile(member_info, _HashingFile(source, digest, self.__throttle))
+
+            self.index.append({"path": arcname, "size": member_info.size, "sha256": digest.hexdigest()})
+            return
+
+        # Streams the file into its own compressed member.
+        member_info = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+        member_info.compress_type = zipfile.ZIP_DEFLATED
+
+        with open(path, "rb") as source, self.__archive.open(member_info, "w", force_zip64=True) as member:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                if self.__throttle: self.__throttle.consume(len(chunk))
+                digest.update(chunk)
+                member.write(chunk)
+
+        self.index.append({
+            "path": arcname,
+            "offset": member_info.header_offset,
+            "size": member_info.file_size,
+            "compressed_size": member_info.compress_size,
+            "sha256": digest.hexdigest(),
+        })
+
+
+    def add_buffered_file(self, path: str, arcname: str, data: bytes, sha256: str):
+        """
+        Adds a file that was already read (and hashed) into the archive, so a file
+        going into more than one archive is only read once.
+        :param path: The path of the file, used for its metadata.
+        :param arcname: The name of the file inside the archive.
+        :param data: The contents of the file.
+        :param sha256: The sha256 hash of the contents.
+        :return:
+        """
+        if self.archive_format != "zip":
+            member_info = self.__archive.gettarinfo(path, arcname)
+            member_info.size = len(data)
+            self.__archive.addfile(member_info, io.BytesIO(data))
+            self.index.append({"path": arcname, "size": member_info.size, "sha256": sha256})
+            return
+
+        member_info = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+        member_info.compress_type = zipfile.ZIP_DEFLATED
+
+        with self.__archive.open(member_info, "w", force_zip64=True) as member:
+            member.write(data)
+
+        self.index.append({
+            "path": arcname,
+            "offset": member_info.header_offset,
+            "size": member_info.file_size,
+            "compressed_size": member_info.compress_size,
+            "sha256": sha256,
+        })
+
+
+    def close(self, completed: bool = True):
+        """
+        Writes the index (for .zip backups), closes the archive, and saves its manifest.
+        :param completed: If set to False, the archive failed halfway, so it gets no manifest.
+        :return:
+        """
+        if self.archive_format == "zip":
+            index_info = zipfile.ZipInfo(INDEX_NAME, date_time=(1980, 1, 1, 0, 0, 0))
+            index_info.compress_type = zipfile.ZIP_STORED
+            self.__archive.writestr(index_info, json.dumps(self.index))
+
+        self.__archive.close()
+
+        # Gives back the reserved space the archive didn't use.
+        if self.__preallocated: self.__file.truncate(self.__output.processed_bytes)
+        self.__output.close()
+        if not completed: return
+
+        write_manifest(self.output_path, {
+            "size": self.__output.processed_bytes,
+            "sha256": self.__output.digest.hexdigest(),
+            "files": self.index,
+        })
+
+
+class MCSMArchivePipeline:
+    """
+    This class implements a single walk over a folder that feeds several archives at once.
+    Every file is read once and sent to every archive whose folder contains it, (e.g. the
+    playerdata files go into both the world and the playerdata backups) instead of every
+    archive walking and reading the folder on its own.
+    """
+
+    def __init__(self, throttle: MCSMThrottle = None):
+        self.__outputs = list()
+        self.__throttle = throttle
+        self.read_bytes = 0
+        self.shared_bytes = 0
+
+
+    def add_output(self, writer: MCSMArchiveWriter, prefix: str, rules: MCSMPathRules = None):
+        """
+        Adds an archive to be fed by the pipeline.
+        :param writer: The archive to write into.
+        :param prefix: The folder that goes into this archive, by its name inside the archives. (e.g. "world/playerdata")
+        :param rules: The rules choosing which files are left out of this archive.
+        :return:
+        """
+        self.__outputs.append((writer, prefix, rules or MCSMPathRules()))
+
+
+    def run(self, folder: str, arcname: str):
+        """
+        Walks the folder once, sending every file into the archives that contain it.
+        :param folder: The folder to walk.
+        :param arcname: The name of the folder inside the archives. (e.g. "world")
+        :return:
+        """
+        for dirpath, dirnames, filenames in os.walk(folder):
+            relative_dir = os.path.relpath(dirpath, folder)
+            archive_dir = arcname if relative_dir == "." else f"{arcname}/{relative_dir.replace(os.sep, '/')}"
+
+            # Folders no archive needs are never walked into.
+            dirnames[:] = [dirname for dirname in sorted(dirnames) if self.__is_needed(f"{archive_dir}/{dirname}")]
+
+            for writer, prefix, rules in self.__outputs:
+                if self.__contains(prefix, archive_dir) and rules.excluded_by(archive_dir) is None:
+                    writer.add_directory(dirpath, archive_dir)
+
+            for filename in sorted(filenames):
+                member = f"{archive_dir}/{filename}"
+                writers = [writer for writer, prefix, rules in self.__outputs
+                           if self.__contains(prefix, member) and rules.excluded_by(member) is None]
+
+                # The file may be removed by the server while walking, skip it if so.
+                try:
+                    self.__add_file(os.path.join(dirpath, filename), member, writers)
+                except FileNotFoundError:
+                    pass
+
+
+    def __is_needed(self, folder: str):
+        """
+        Checks if any archive needs something from inside a folder.
+        :param folder: The folder, by its name inside the archives.
+        :return: Boolean, True if the folder should be walked into.
+        """
+        for writer, prefix, rules in self.__outputs:
+            if prefix.startswith(folder + "/"): return True
+            if self.__contains(prefix, folder) and not rules.can_prune(folder): return True
+
+        return False
+
+
+    def __add_file(self, path: str, member: str, writers: list):
+        """
+        Sends a file into the given archives, reading it only once if it goes into more than one.
+        :param path: The path of the file.
+        :param member: The name of the file inside the archives.
+        :param writers: The archives to send the file into.
+        :return:
+        """
+        if not writers: return
+
+        # Big files (and links) are streamed into every archive on their own, instead of being held in memory.
+        size = os.path.getsize(path)
+        if len(writers) == 1 or size > BUFFER_LIMIT or os.path.islink(path):
+            for writer in writers:
+                writer.add_file(path, member)
+                self.read_bytes += size
+            return
+
+        with open(path, "rb") as source:
+            data = source.read()
+
+        if self.__throttle: self.__throttle.consume(len(data))
+        sha256 = hashlib.sha256(data).hexdigest()
+        for writer in writers:
+            writer.add_buffered_file(path, member, data, sha256)
+
+        self.read_bytes += len(data)
+        self.shared_bytes += len(data) * (len(writers) - 1)
+
+
+    @staticmethod
+    def __contains(prefix: str, name: str):
+        """
+        Checks if a name inside the archives is inside the given folder.
+        :param prefix: The folder.
+        :param name: The name to check.
+        :return: Boolean, True if the name is the folder itself or is inside it.
+        """
+        return name == prefix or name.startswith(prefix + "/")
+
+
+class MCSMArchive:
+    """
+    This class implements the reading of existing backups, which can be .tar.gz
+    or .zip archives, or snapshot folders. File paths are always relative to the
+    server files, (e.g. "world/region/r.0.0.mca") so the root is the folder that was
+    backed up, which snapshots and old tarballs don't include in their member names.
+    """
+
+    def __init__(self, path: str, root: str = "world"):
+        self.path = path
+        self.root = root
+
+
+    def list_members(self):
+        """
+        Lists the files inside the backup. For .zip backups, only the index is read.
+        :return: List, containing a dictionary with the path, size and (if known) sha256 of every file.
+        """
+        if os.path.isdir(self.path):
+            members = list()
+            for dirpath, dirnames, filenames in os.walk(self.path):
+                for filename in filenames:
+                    relative_path = os.path.relpath(os.path.join(dirpath, filename), self.path).replace(os.sep, "/")
+                    members.append({"path": f"{self.root}/{relative_path}",
+                                    "size": os.path.getsize(os.path.join(dirpath, filename))})
+            return members
+
+        if zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as archive:
+                if INDEX_NAME in archive.namelist():
+                    return json.loads(archive.read(INDEX_NAME))
+
+                return [{"path": info.filename, "size": info.file_size, "compressed_size": info.compress_size,
+                         "offset": info.header_offset} for info in archive.infolist() if not info.is_dir()]
+
+        with tarfile.open(self.path, "r:*") as archive:
+            return [{"path": self.__normalize(member.name), "size": member.size}
+                    for member in archive.getmembers() if member.isfile()]
+
+
+    def extract_member(self, member_path: str, destination_folder: str):
+        """
+        Extracts a single file from the backup into a destination folder, keeping its
+        path inside the backup. The file is written next to its destination and then
+        moved into place, so it is never left half-written, and its hash is checked
+        against the one it was saved with, if the backup has it.
+        :param member_path: The path of the file inside the backup. (e.g. "world/region/r.0.0.mca")
+        :param destination_folder: The folder to extract the file into. (e.g. the server files)
+        :return: String, the path of the extracted file, or None if the backup doesn't have it.
+        """
+        destination = os.path.join(destination_folder, *member_path.split("/"))
+        temporary_destination = destination + ".restoring"
+        digest = hashlib.sha256()
+
+        with self.__open_member(member_path) as member:
+            if member is None: return None
+
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with open(temporary_destination, "wb") as output:
+                for chunk in iter(lambda: member.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    output.write(chunk)
+
+        expected_hash = self.get_hashes().get(member_path)
+        if expected_hash and expected_hash != digest.hexdigest():
+            os.remove(temporary_destination)
+            raise CorruptBackup(f"'{member_path}' in {self.path} doesn't match the hash it was saved with.")
+
+        os.replace(temporary_destination, destination)
+        return destination
+
+
+    def extract_all(self, destination_folder: str, workers: int = 1):
+        """
+        Extracts every file of the backup into a destination folder, keeping their paths inside the root folder,
+        (e.g. "world/region/r.0.0.mca" goes into "<destination>/region/r.0.0.mca") and checks every file against
+        the hash it was saved with. Zip members and snapshot files can be read on their own, so they are spread
+        over several workers, while tarballs are a single compressed stream, extracted in one pass.
+        Snapshot files are always copied, so the restored files are never hardlinks into the snapshot.
+        :param destination_folder: The folder to extract the contents of the root folder into.
+        :param workers: The amount of files extracted at the same time.
+        :return: Tuple, containing the amount of files and the amount of bytes extracted.
+        """
+        try:
+            extracted_sizes = self.__extract_all(destination_folder, workers)
+        except (tarfile.TarError, zipfile.BadZipFile, zlib.error, EOFError) as error:
+            raise CorruptBackup(f"{self.path} can't be read: {error}")
+
+        expected_hashes = self.get_hashes()
+        missing_paths = [path for path in expected_hashes if self.__strip_root(path) and path not in extracted_sizes]
+        if missing_paths:
+            raise CorruptBackup(f"{len(missing_paths)} files are missing from {self.path}, "
+                                f"such as '{missing_paths[0]}'.")
+
+        return len(extracted_sizes), sum(extracted_sizes.values())
+
+
+    def __extract_all(self, destination_folder: str, workers: int):
+        """
+        Extracts every file of the backup into a destination folder, as described in extract_all.
+        :param destination_folder: The folder to extract the contents of the root folder into.
+        :param workers: The amount of files extracted at the same time.
+        :return: Dictionary, mapping the path of every extracted file to its size.
+        """
+        expected_hashes = self.get_hashes()
+        extracted_sizes = dict()
+
+        if os.path.isdir(self.path) or zipfile.is_zipfile(self.path):
+            # The biggest files are dealt first, in turns, so every worker gets about the same amount of bytes.
+            members = sorted((member for member in self.list_members() if self.__strip_root(member["path"])),
+                             key=lambda member: member["size"], reverse=True)
+            batches = [members[index::max(workers, 1)] for index in range(max(workers, 1))]
+
+            with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+                for batch_sizes in pool.map(lambda batch: self.__extract_batch(batch, destination_folder,
+                                                                               expected_hashes), batches):
+                    extracted_sizes.update(batch_sizes)
+
+        else:
+            with tarfile.open(self.path, "r|*") as archive:
+                for member_info in archive:
+                    member_path = self.__normalize(member_info.name)
+                    if not self.__strip_root(member_path) or not (member_info.isfile() or member_info.isdir()): continue
+
+                    # Folders are kept, so the empty ones are restored as well.
+                    if member_info.isdir():
+                        os.makedirs(self.__get_destination(member_path, destination_folder), exist_ok=True)
+                        continue
+
+                    extracted_sizes[member_path] = self.__write_member(archive.extractfile(member_info), member_path,
+                                                                       destination_folder, expected_hashes,
+                                                                       member_info.mtime)
+
+        return extracted_sizes
+
+
+    def get_hashes(self):
+        """
+        Gets the sha256 hashes the files were saved with, from the manifest or the index of the backup.
+        :return: Dictionary, mapping the path of every file to its hash.
+        """
+        manifest = read_manifest(self.path)
+        if manifest:
+            return {member["path"]: member["sha256"] for member in manifest["files"]}
+
+        if os.path.isdir(self.path) or not zipfile.is_zipfile(self.path): return dict()
+        return {member["path"]: member["sha256"] for member in self.list_members() if member.get("sha256")}
+
+
+    def verify(self, throttle: MCSMThrottle = None):
+        """
+        Reads the whole backup, checking that it can be decompressed and that the
+        archive and every file inside it match the hashes they were saved with.
+        :param throttle: Limits the rate at which the backup is read.
+        :return: Dictionary, containing the status ("verified", "readable" if the backup
+        has no hashes to check against, or "corrupt"), the problems found, and the bytes read.
+        """
+        manifest = read_manifest(self.path)
+        expected_hashes = self.get_hashes()
+        found_paths = set()
+        problems = list()
+        archive_reader = None
+
+        try:
+            if os.path.isdir(self.path):
+                for member in self.list_members():
+                    with self.__open_member(member["path"]) as source:
+                        self.__check_member(member["path"], _HashingFile(source, throttle=throttle),
+                                            expected_hashes, found_paths, problems)
+
+            elif zipfile.is_zipfile(self.path):
+                # The whole archive is hashed first, then every member is decompressed. (Which checks their CRC)
+                with open(self.path, "rb") as source:
+                    archive_reader = _HashingFile(source, throttle=throttle)
+                    for _ in iter(lambda: archive_reader.read(CHUNK_SIZE), b""): pass
+
+                # The members go through the throttle as well, since they are read from the disk once more.
+                # Their decompressed bytes are counted, which are never less than the ones read.
+                with zipfile.ZipFile(self.path) as archive:
+                    for member_info in archive.infolist():
+                        if member_info.is_dir() or member_info.filename == INDEX_NAME: continue
+
+                        with archive.open(member_info) as member:
+                            self.__check_member(member_info.filename, _HashingFile(member, throttle=throttle),
+                                                expected_hashes, found_paths, problems)
+
+            else:
+                # Tarballs are streamed, so the archive and its members are hashed in a single pass.
+                with open(self.path, "rb") as source:
+                    archive_reader = _HashingFile(source, throttle=throttle)
+
+                    with tarfile.open(fileobj=archive_reader, mode="r|*") as archive:
+                        for member_info in archive:
+                            if not member_info.isfile(): continue
+
+                            self.__check_member(self.__normalize(member_info.name), archive.extractfile(member_info),
+                                                expected_hashes, found_paths, problems)
+
+                    # Reads whatever is left after the end of the tarball, so the whole file gets hashed.
+                    for _ in iter(lambda: archive_reader.read(CHUNK_SIZE), b""): pass
+
+        except (tarfile.TarError, zipfile.BadZipFile, zlib.error, EOFError, OSError) as error:
+            problems.append(f"The backup can't be read: {error}")
+
+        if manifest and archive_reader and archive_reader.digest.hexdigest() != manifest["sha256"]:
+            problems.append("The archive doesn't match the hash it was saved with.")
+
+        problems += [f"'{path}' is missing." for path in expected_hashes if path not in found_paths]
+
+        if problems: status = "corrupt"
+        elif expected_hashes: status = "verified"
+        else: status = "readable"
+
+        size = os.path.getsize(self.path) if os.path.isfile(self.path) \
+            else sum(member["size"] for member in self.list_members())
+        return {"status": status, "problems": problems, "bytes": size}
+
+
+    @staticmethod
+    def __check_member(member_path: str, member, expected_hashes: dict, found_paths: set, problems: list):
+        """
+        Reads a file inside the backup, comparing its hash with the one it was saved with.
+        :param member_path: The path of the file inside the backup.
+        :param member: The file object to read the file from.
+        :return:
+        """
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: member.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+        found_paths.add(member_path)
+        if member_path in expected_hashes and expected_hashes[member_path] != digest.hexdigest():
+            problems.append(f"'{member_path}' doesn't match the hash it was saved with.")
+
+
+    def __extract_batch(self, members: list, destination_folder: str, expected_hashes: dict):
+        """
+        Extracts some files of a snapshot or a .zip backup. Every worker opens the
+        backup on its own, so none of them waits on the others to read it.
+        :param members: The files to extract, as returned by list_members.
+        :param destination_folder: The folder to extract the contents of the root folder into.
+        :param expected_hashes: The hashes the files were saved with.
+        :return: Dictionary, mapping the path of every extracted file to its size.
+        """
+        extracted_sizes = dict()
+        if not members: return extracted_sizes
+
+        if os.path.isdir(self.path):
+            for member in members:
+                path = os.path.join(self.path, *self.__strip_root(member["path"]).split("/"))
+                with open(path, "rb") as source:
+                    extracted_sizes[member["path"]] = self.__write_member(source, member["path"], destination_folder,
+                                                                          expected_hashes, os.path.getmtime(path))
+            return extracted_sizes
+
+        with zipfile.ZipFile(self.path) as archive:
+            for member in members:
+                member_info = archive.getinfo(member["path"])
+                with archive.open(member_info) as source:
+                    extracted_sizes[member["path"]] = self.__write_member(source, member["path"], destination_folder,
+                                                                          expected_hashes,
+                                                                          time.mktime(member_info.date_time + (0, 0, -1)))
+
+        return extracted_sizes
+
+
+    def __write_member(self, source, member_path: str, destination_folder: str, expected_hashes: dict, mtime: float):
+        """
+        Writes a file of the backup into the destination folder, checking it against the hash it was saved with.
+        The modification time is kept, so the next snapshot still knows which files didn't change.
+        :param source: The file object to read the file from.
+        :param member_path: The path of the file inside the backup.
+        :param destination_folder: The folder to extract the contents of the root folder into.
+        :param expected_hashes: The hashes the files were saved with.
+        :param mtime: The modification time of the file.
+        :return: Integer, the size of the file.
+        """
+        destination = self.__get_destination(member_path, destination_folder)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+
+        with open(destination, "wb") as output:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                output.write(chunk)
+                size += len(chunk)
+
+        if member_path in expected_hashes and expected_hashes[member_path] != digest.hexdigest():
+            raise CorruptBackup(f"'{member_path}' in {self.path} doesn't match the hash it was saved with.")
+
+        os.utime(destination, (mtime, mtime))
+        return size
+
+
+    def __get_destination(self, member_path: str, destination_folder: str):
+        """
+        Finds where a file of the backup goes inside the destination folder.
+        :param member_path: The path of the file inside the backup.
+        :param destination_folder: The folder to extract the contents of the root folder into.
+        :return: String, the path of the file inside the destination folder.
+        """
+        destination = os.path.normpath(os.path.join(destination_folder, *self.__strip_root(member_path).split("/")))
+
+        # A damaged (or crafted) backup can't write anywhere outside of the destination folder.
+        if not destination.startswith(os.path.join(os.path.normpath(destination_folder), "")):
+            raise CorruptBackup(f"'{member_path}' in {self.path} points outside of the backed up folder.")
+
+        return destination
+
+
+    @contextmanager
+    def __open_member(self, member_path: str):
+        """
+        Opens a file inside the backup for reading.
+        :param member_path: The path of the file inside the backup.
+        :return: A file object, or None if the backup doesn't have the file.
+        """
+        if os.path.isdir(self.path):
+            relative_path = self.__strip_root(member_path)
+            path = os.path.join(self.path, *relative_path.split("/")) if relative_path else None
+
+            if not path or not os.path.isfile(path):
+                yield None
+                return
+
+            with open(path, "rb") as member:
+                yield member
+
+        elif zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as archive:
+                try:
+                    member_info = archive.getinfo(member_path)
+                except KeyError:
+                    yield None
+                    return
+
+                with archive.open(member_info) as member:
+                    yield member
+
+        else:
+            # Tarballs can't be seeked, so they have to be decompressed up to the file.
+            with tarfile.open(self.path, "r:*") as archive:
+                for member in archive:
+                    if member.isfile() and self.__normalize(member.name) == member_path:
+                        yield archive.extractfile(member)
+                        return
+
+                yield None
+
+
+    def __normalize(self, name: str):
+        """
+        Adds the root folder to the member names of old tarballs, which were saved without it.
+        :param name: The name of the member inside the tarball.
+        :return: String, the path of the member relative to the server files.
+        """
+        name = name.lstrip("/")
+        if name == self.root or name.startswith(f"{self.root}/"): return name
+        return f"{self.root}/{name}"
+
+
+    def __strip_root(self, member_path: str):
+        """
+        Removes the root folder from a member path.
+        :return: String, the path relative to the root folder, or None if it isn't inside it.
+        """
+        if not member_path.startswith(f"{self.root}/"): return None
+        return member_path[len(self.root) + 1:]
+
+
+def read_manifest(backup_path: str):
+    """
+    Reads the manifest saved next to a backup.
+    :param backup_path: The path of the backup.
+    :return: Dictionary, containing the size and sha256 of the archive and of every file
+    inside it, or None if the backup has no manifest.
+    """
+    try:
+        with open(backup_path + MANIFEST_SUFFIX, "r") as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_manifest(backup_path: str, manifest: dict):
+    """
+    Saves the manifest of a backup next to it.
+    :param backup_path: The path of the backup.
+    :param manifest: The manifest, containing the size and sha256 of the archive (if it
+    is one) and a list with the path, size and sha256 of every file inside the backup.
+    :return:
+    """
+    with open(backup_path + MANIFEST_SUFFIX, "w") as manifest_file:
+        json.dump({"backup": os.path.basename(backup_path), **manifest}, manifest_file)
+
+
+def preallocate(file, size: int):
+    """
+    Reserves disk space for a file that is about to be written, so it is laid out in one piece,
+    and a full disk is found before anything is written rather than halfway through.
+    This uses fallocate, which only exists on Linux, and does nothing on the filesystems
+    that don't support it, instead of writing zeroes like posix_fallocate does.
+    :param file: The file, opened for writing.
+    :param size: The amount of bytes to reserve.
+    :return: Boolean, True if the space was reserved, in which case the file is that big until truncated.
+    """
+    if not sys.platform.startswith("linux") or size <= 0: return False
+
+    library = ctypes.util.find_library("c")
+    libc = ctypes.CDLL(library, use_errno=True) if library else None
+    fallocate = getattr(libc, "fallocate64", None) or getattr(libc, "fallocate", None) if libc else None
+    if fallocate is None: return False
+
+    # fallocate(fd, mode, offset, length), where mode 0 also grows the file to the reserved size.
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    return fallocate(file.fileno(), 0, 0, size) == 0
+
+
+class _HashingFile:
+    """
+    Wraps a file object, hashing every byte read from or written into it, and
+    optionally limiting the rate at which that happens. It can't be seeked,
+    so archives written through it are written strictly in order.
+    """
+
+    def __init__(self, file, digest=None, throttle: MCSMThrottle = None):
+        self.digest = digest or hashlib.sha256()
+        self.processed_bytes = 0
+        self.__file = file
+        self.__throttle = throttle
+
+
+    def read(self, size: int = -1):
+        data = self.__file.read(size)
+        self.__process(data)
+        return data
+
+
+    def write(self, data: bytes):
+        self.__process(data)
+        return self.__file.write(data)
+
+
+    def tell(self):
+        return self.processed_bytes
+
+
+    def seek(self, *args):
+        raise OSError("This file can't be seeked.")
+
+
+    def seekable(self):
+        return False
+
+
+    def flush(self):
+        self.__file.flush()
+
+
+    def close(self):
+        self.__file.close()
+
+
+    def __process(self, data: bytes):
+        self.digest.update(data)
+        self.processed_bytes += len(data)
+        if self.__throttle: self.__throttle.consume(len(data))
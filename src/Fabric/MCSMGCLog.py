@@ -0,0 +1,275 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from collections import deque
+from datetime import datetime
+import json
+import math
+import os
+import re
+import threading
+import time
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+from MCSMThrottle import LAG_MESSAGE
+
+
+# The decorators every GC log line starts with, as set by the -Xlog flag. (time, uptime, level, tags)
+GC_LOG_DECORATORS = "time,uptime,level,tags"
+
+# A line of the GC log, split into its time, uptime, tags and message.
+GC_LINE = re.compile(r"\[([^\]]+)\]\[([\d.]+)s\]\[\w+\s*\]\[([\w,]+)\s*\]\s*GC\(\d+\)\s*(.*)")
+
+# A pause of the application, and how long it took. Generational ZGC starts them with "y:" or "O:".
+PAUSE_MESSAGE = re.compile(r"(?:\w: )?(Pause .*?)(?: \d+M->\d+M\(\d+M\))? ([\d.]+)ms")
+
+# The heap before and after a collection. (e.g. "120M->40M(1024M)", or "400M(10%)->100M(3%)" for ZGC)
+HEAP_MESSAGE = re.compile(r"(\d+)M(?:\(\d+%\))?->(\d+)M")
+
+# How far behind the server fell, as it reports along with the LAG_MESSAGE.
+LAG_BEHIND = re.compile(r"Running (\d+)ms")
+
+# The amount of recent pauses, collections and lag events the rolling statistics are taken from.
+ROLLING_WINDOW = 1000
+
+# The amount of seconds between every read of the GC log.
+TAIL_INTERVAL = 2
+
+# The amount of seconds before the lag is reported, where a pause is still taken as its cause.
+LAG_MARGIN = 5
+
+
+class MCSMGCLog:
+    """
+    This class implements the following of the GC log the server writes, keeping rolling statistics of
+    the pauses, the heap left after every collection, and the rate the server allocates memory at.
+    Whenever the server can't keep up, the pauses right before it tell if the lag came from the GC.
+    A summary of the whole run is written when the server stops.
+    """
+
+    def __init__(self, logger: MCSMLogger, gc_log_path: str, long_pause: int):
+        self.__logger = logger
+        self.gc_log_path = gc_log_path
+        self.__long_pause = long_pause
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+        # Where the log was read up to, and the part of a line not written yet.
+        self.__identity = None
+        self.__position = 0
+        self.__remainder = ""
+
+        self.__pauses = deque(maxlen=ROLLING_WINDOW)
+        self.__heap_after = deque(maxlen=ROLLING_WINDOW)
+        self.__allocation_rates = deque(maxlen=ROLLING_WINDOW)
+        self.__last_collection = None
+        self.__durations = list()
+        self.__longest = None
+        self.__uptime = 0
+        self.lag_events = 0
+        self.gc_lag_events = 0
+
+
+    def start(self):
+        """
+        Starts following the GC log in the background. Whatever the log had before is left out,
+        since it belongs to an earlier run of the server.
+        :return:
+        """
+        with self.__lock:
+            self.__identity = self.__get_identity()
+            self.__position = os.path.getsize(self.gc_log_path) if self.__identity else 0
+
+        self.__thread = threading.Thread(target=self.__follow, daemon=True)
+        self.__thread.start()
+
+
+    def stop(self):
+        """
+        Stops following the GC log, reading what is left of it, and writes the summary of the run.
+        :return: Dictionary, the statistics of the run, as given by get_stats.
+        """
+        self.__stopped.set()
+        if self.__thread: self.__thread.join()
+
+        with self.__lock:
+            self.__read()
+            stats = self.get_stats(rolling=False)
+
+        if not stats["pauses"]:
+            self.__logger.log("No GC pauses were logged during this run.", level="GC/INFO", console=False)
+            return stats
+
+        self.__logger.log(f"GC summary: {stats['pauses']:,} pauses adding up to {round(stats['total_pause'] / 1000, 1)}s "
+                          f"({round(stats['pause_share'] * 100, 2)}% of the uptime). p50 {stats['p50']}ms, "
+                          f"p99 {stats['p99']}ms, max {stats['max']}ms ({stats['longest']}). "
+                          f"{stats['gc_lag_events']} of the {stats['lag_events']} times the server couldn't keep up "
+                          f"were during GC pauses.", level="GC/INFO")
+
+        summary_path = os.path.join(os.path.dirname(self.gc_log_path), "gc-summary.json")
+        with open(summary_path, "w") as summary_file:
+            json.dump(stats, summary_file, indent=4)
+
+        return stats
+
+
+    def get_stats(self, rolling: bool = True):
+        """
+        Gets the statistics of the pauses, the heap and the allocation rate.
+        :param rolling: If set to True, the pauses are only the latest ones, instead of the whole run.
+        :return: Dictionary, containing the amount of pauses, their total, p50, p99 and max, in milliseconds,
+        the share of the uptime spent paused, the average heap after a collection and allocation rate,
+        in megabytes (per second), and the amount of lag events, in total and during GC pauses.
+        """
+        durations = sorted(pause[2] for pause in self.__pauses) if rolling else sorted(self.__durations)
+        average = lambda values: round(sum(values) / len(values), 1) if values else None
+
+        return {"pauses": len(durations), "total_pause": round(sum(durations), 1),
+                "pause_share": sum(durations) / 1000 / self.__uptime if self.__uptime else 0,
+                "p50": self.percentile(durations, 0.5), "p99": self.percentile(durations, 0.99),
+                "max": durations[-1] if durations else None,
+                "longest": self.__longest[1] if self.__longest else None,
+                "heap_after": average(self.__heap_after), "allocation_rate": average(self.__allocation_rates),
+                "lag_events": self.lag_events, "gc_lag_events": self.gc_lag_events}
+
+
+    def process_console(self, message: str):
+        """
+        Looks for the pauses behind every time the server reports it can't keep up.
+        :param message: The message logged by the server.
+        :return:
+        """
+        if not message.startswith(LAG_MESSAGE): return
+
+        behind = LAG_BEHIND.search(message)
+        since = time.time() - (int(behind.group(1)) / 1000 if behind else 0) - LAG_MARGIN
+
+        # The log is read first, so the pauses the server just went through are in.
+        with self.__lock:
+            self.__read()
+            pauses = [pause for pause in self.__pauses if pause[0] >= since]
+            self.lag_events += 1
+            paused = sum(pause[2] for pause in pauses)
+            long_pause = bool(pauses) and paused >= self.__long_pause
+            if long_pause: self.gc_lag_events += 1
+
+        if long_pause:
+            longest = max(pauses, key=lambda pause: pause[2])
+            self.__logger.log(f"The server couldn't keep up during {len(pauses)} GC pauses adding up to {round(paused)}ms. "
+                              f"The longest was {longest[3]} at {longest[2]}ms.", level="GC/WARN")
+        else:
+            self.__logger.log(f"The server couldn't keep up, but the GC only paused it for {round(paused)}ms, "
+                              f"so the lag came from somewhere else.", level="GC/INFO", console=False)
+
+
+    @staticmethod
+    def percentile(values: list, fraction: float):
+        """
+        Gets a percentile of some sorted values, by the nearest rank.
+        :param values: The values, sorted.
+        :param fraction: The percentile, between 0 and 1. (e.g. 0.99)
+        :return: The value at the percentile, or None if there are no values.
+        """
+        if not values: return None
+
+        # The rank is rounded first, so float errors (e.g. 0.07 * 100 = 7.000000000000001) don't move it up.
+        return values[min(max(math.ceil(round(fraction * len(values), 9)) - 1, 0), len(values) - 1)]
+
+
+    def __follow(self):
+        """
+        Reads the GC log every few seconds, until stopped.
+        :return:
+        """
+        while not self.__stopped.wait(TAIL_INTERVAL):
+            with self.__lock:
+                self.__read()
+
+
+    def __read(self):
+        """
+        Reads the lines written into the GC log since the last read. The JVM rotates the log by moving it
+        away and starting a new one, which is then read from the start. Must be called while holding the lock.
+        :return:
+        """
+        identity = self.__get_identity()
+        if identity is None: return
+
+        if identity != self.__identity or os.path.getsize(self.gc_log_path) < self.__position:
+            self.__identity, self.__position, self.__remainder = identity, 0, ""
+
+        try:
+            with open(self.gc_log_path, "r", encoding="latin-1") as gc_log:
+                gc_log.seek(self.__position)
+                text = self.__remainder + gc_log.read()
+                self.__position = gc_log.tell()
+        except OSError:
+            return
+
+        # The last line may still be being written, so it is kept for the next read.
+        lines = text.split("\n")
+        self.__remainder = lines.pop()
+        for line in lines:
+            self.__parse(line)
+
+
+    def __parse(self, line: str):
+        """
+        Adds a line of the GC log into the statistics.
+        :param line: The line.
+        :return:
+        """
+        match = GC_LINE.match(line)
+        if not match: return
+
+        moment, uptime, tags, message = match.groups()
+        uptime = float(uptime)
+        self.__uptime = max(self.__uptime, uptime)
+
+        try:
+            moment = datetime.strptime(moment, "%Y-%m-%dT%H:%M:%S.%f%z").timestamp()
+        except ValueError:
+            moment = time.time()
+
+        pause = PAUSE_MESSAGE.fullmatch(message.strip())
+        if pause:
+            name, duration = pause.group(1), float(pause.group(2))
+            self.__pauses.append((moment, uptime, duration, name))
+            self.__durations.append(duration)
+            if self.__longest is None or duration > self.__longest[0]: self.__longest = (duration, name)
+
+            if duration >= self.__long_pause:
+                self.__logger.log(f"Long GC pause, {name} took {duration}ms.", level="GC/WARN", console=False)
+
+        # Only the line ending every collection is taken for the heap, since the phases repeat it.
+        heap = HEAP_MESSAGE.search(message)
+        if tags != "gc" or not heap: return
+
+        before, after = int(heap.group(1)), int(heap.group(2))
+        self.__heap_after.append(after)
+
+        # Whatever the heap grew by since the last collection was allocated in between.
+        if self.__last_collection and uptime > self.__last_collection[0] and before >= self.__last_collection[1]:
+            self.__allocation_rates.append((before - self.__last_collection[1]) / (uptime - self.__last_collection[0]))
+        self.__last_collection = (uptime, after)
+
+
+    def __get_identity(self):
+        """
+        Gets what tells the GC log apart from the ones it is rotated into.
+        :return: Tuple, containing the device and inode of the log, or None if it doesn't exist.
+        """
+        try:
+            stat = os.stat(self.gc_log_path)
+        except OSError:
+            return None
+
+        return stat.st_dev, stat.st_ino
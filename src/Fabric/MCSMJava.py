@@ -0,0 +1,228 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Third Party Imports
+# Local Application Imports
+from exceptions import NoSuitableJava
+from MCSMLogger import MCSMLogger
+from MCSMSettings import MCSMSettings
+
+
+# The oldest Java every Minecraft version runs on, from the newest version down.
+JAVA_REQUIREMENTS = [((1, 20, 5), 21), ((1, 18), 17), ((1, 17), 16), ((1, 0), 8)]
+
+# The folders Java is usually installed into, where it isn't in the PATH.
+JAVA_FOLDERS = {
+    "linux": ["/usr/lib/jvm/*", "/usr/java/*", "/opt/java/*", "/opt/jdk*", "~/.sdkman/candidates/java/*",
+              "~/.jdks/*"],
+    "darwin": ["/Library/Java/JavaVirtualMachines/*/Contents/Home", "~/Library/Java/JavaVirtualMachines/*/Contents/Home",
+               "/opt/homebrew/opt/openjdk*", "~/.sdkman/candidates/java/*"],
+    "win32": [r"C:\Program Files\Java\*", r"C:\Program Files\Eclipse Adoptium\*", r"C:\Program Files\Zulu\*",
+              r"C:\Program Files\Microsoft\jdk*", r"C:\Program Files\Amazon Corretto\*", r"~\.jdks\*"],
+}
+
+# The amount of seconds a runtime has to answer the probe.
+PROBE_TIMEOUT = 30
+
+
+class MCSMJava:
+    """
+    This class implements the discovery of the Java runtimes installed, and the choice of the one
+    the server runs with. Every runtime is only probed once, and its version, vendor and supported flags
+    are cached by the modification time of its binary, so they are probed again after an update.
+    """
+
+    def __init__(self, logger: MCSMLogger, settings: MCSMSettings):
+        self.__logger = logger
+        self._settings = settings
+        self.__cache_path = os.path.join(os.getcwd(), "server_files", "MCSM-Runtime", "java.json")
+        self.__executable = "java.exe" if sys.platform == "win32" else "java"
+
+
+    def find_runtimes(self):
+        """
+        Finds every Java runtime installed, probing the ones that aren't cached yet.
+        :return: List, containing a dictionary with the path, version, major version, vendor and
+        supported flags of every runtime that could be probed.
+        """
+        cache = self.__load_cache()
+        runtimes, changed = list(), False
+
+        for java_path in self.__get_candidates():
+            stat = os.stat(java_path)
+            runtime = cache.get(java_path)
+
+            if runtime is None or runtime["mtime"] != stat.st_mtime_ns or runtime["size"] != stat.st_size:
+                runtime = self.probe(java_path)
+                changed = True
+                if runtime is None:
+                    cache.pop(java_path, None)
+                    continue
+
+                runtime.update({"mtime": stat.st_mtime_ns, "size": stat.st_size})
+                cache[java_path] = runtime
+
+            runtimes.append(runtime)
+
+        if changed: self.__save_cache(cache)
+        return runtimes
+
+
+    def select(self, minimum: int, maximum: int = None):
+        """
+        Picks the runtime the server runs with. JAVA-PATH wins if it is set, and otherwise the
+        newest runtime the server runs on is picked.
+        :param minimum: The oldest major version of Java the server runs on.
+        :param maximum: The newest major version of Java the server runs on, or None if there is no limit.
+        :return: Dictionary, the runtime, as given by find_runtimes.
+        :raises NoSuitableJava: If no runtime found can run the server, listing the ones found.
+        """
+        runtimes = self.find_runtimes()
+        required = f"Java {minimum}" + (f" to {maximum}" if maximum else " or newer")
+
+        # The runtime set in the config is used even if it isn't one the server is known to run on.
+        if self._settings["java-path"]:
+            explicit = [runtime for runtime in runtimes if runtime["path"] == self.__resolve(self._settings["java-path"])]
+            if not explicit:
+                raise NoSuitableJava(f"The Java runtime set in JAVA-PATH ({self._settings['java-path']}) "
+                                     f"couldn't be run. This server needs {required}.")
+
+            if not minimum <= explicit[0]["major"] <= (maximum or explicit[0]["major"]):
+                self.__logger.log(f"The Java runtime set in JAVA-PATH is Java {explicit[0]['major']}, but this server "
+                                  f"needs {required}. It might not start, or run slower.", level="WARN")
+            return explicit[0]
+
+        suitable = [runtime for runtime in runtimes if minimum <= runtime["major"] <= (maximum or runtime["major"])]
+        if not suitable:
+            found = "\n".join(f"  Java {runtime['version']} ({runtime['vendor']}) at {runtime['path']}"
+                              for runtime in runtimes) or "  None"
+            raise NoSuitableJava(f"This server needs {required}, but none of the Java runtimes found can run it. "
+                                 f"Install it, or set its path in JAVA-PATH.\nRuntimes found:\n{found}")
+
+        return max(suitable, key=lambda runtime: (runtime["major"], self.__version_key(runtime["version"])))
+
+
+    def probe(self, java_path: str):
+        """
+        Runs a Java runtime to find out its version, vendor and supported flags.
+        :param java_path: The path of the java binary.
+        :return: Dictionary, containing the path, version, major version, vendor and flags, or None if it couldn't run.
+        """
+        try:
+            result = subprocess.run([java_path, "-XshowSettings:properties", "-version"], capture_output=True,
+                                    text=True, timeout=PROBE_TIMEOUT)
+            flags_result = subprocess.run([java_path, "-XX:+UnlockExperimentalVMOptions",
+                                           "-XX:+UnlockDiagnosticVMOptions", "-XX:+PrintFlagsFinal", "-version"],
+                                          capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+        except (OSError, subprocess.SubprocessError):
+            self.__logger.log(f"Couldn't run the Java runtime at {java_path}, it was left out.", console=False)
+            return None
+
+        properties = dict(re.findall(r"^\s*([\w.]+) = (.*)$", result.stderr, re.MULTILINE))
+        if "java.version" not in properties:
+            self.__logger.log(f"Couldn't find out the version of the Java runtime at {java_path}, it was left out.",
+                              console=False)
+            return None
+
+        # Java 8 and older report their versions as "1.8", newer ones start with the major version.
+        specification = properties.get("java.specification.version", properties["java.version"])
+        major = int(specification.split(".")[1] if specification.startswith("1.") else specification.split(".")[0])
+
+        # PrintFlagsFinal lists every flag as "type name = value {kind}". If it lists none, every flag is kept.
+        flags = sorted(set(re.findall(r"^\s*\S+\s+(\w+)\s+:?=", flags_result.stdout, re.MULTILINE))) or None
+
+        self.__logger.log(f"Found Java {properties['java.version']} ({properties.get('java.vendor', 'unknown')}) "
+                          f"at {java_path}.", console=False)
+        return {"path": java_path, "version": properties["java.version"], "major": major,
+                "vendor": properties.get("java.vendor", "unknown"), "vm": properties.get("java.vm.name", "unknown"),
+                "arch": properties.get("os.arch", "unknown"), "flags": flags}
+
+
+    @staticmethod
+    def get_required_version(minecraft_version: str):
+        """
+        Gets the oldest major version of Java a Minecraft version runs on.
+        :param minecraft_version: The Minecraft version. (e.g. "1.18.1")
+        :return: Integer, the major version of Java.
+        """
+        version = tuple(int(part) for part in minecraft_version.split("."))
+        return next(java for since, java in JAVA_REQUIREMENTS if version >= since)
+
+
+    def __get_candidates(self):
+        """
+        Gets the paths of the java binaries that might be installed. The ones set in JAVA-PATH and JAVA_HOME
+        go first, followed by the ones in the PATH, and the ones in the usual install folders.
+        :return: List, containing the resolved path of every java binary found, without repeating any.
+        """
+        homes = [self._settings["java-path"], os.environ.get("JAVA_HOME")]
+        homes += os.environ.get("PATH", "").split(os.pathsep)
+        homes += [home for pattern in JAVA_FOLDERS.get(sys.platform, JAVA_FOLDERS["linux"])
+                  for home in sorted(glob.glob(os.path.expanduser(pattern)))]
+
+        candidates = list()
+        for home in filter(None, homes):
+            java_path = self.__resolve(home)
+            if java_path and java_path not in candidates: candidates.append(java_path)
+
+        return candidates
+
+
+    def __resolve(self, path: str):
+        """
+        Resolves a java binary, a Java home, or the bin folder of a Java home, into the path of the binary.
+        :param path: The path.
+        :return: String, the resolved path of the binary, or None if there is none.
+        """
+        for java_path in [path, os.path.join(path, self.__executable), os.path.join(path, "bin", self.__executable)]:
+            if os.path.isfile(java_path) and os.access(java_path, os.X_OK): return os.path.realpath(java_path)
+
+        return None
+
+
+    @staticmethod
+    def __version_key(version: str):
+        """
+        Turns a Java version into a key, so newer updates sort after older ones. (e.g. "17.0.9" after "17.0.2")
+        :param version: The Java version.
+        :return: Tuple, containing every number of the version.
+        """
+        return tuple(int(part) for part in re.findall(r"\d+", version))
+
+
+    def __load_cache(self):
+        """
+        Loads the runtimes probed before.
+        :return: Dictionary, mapping the path of every runtime to it.
+        """
+        try:
+            with open(self.__cache_path, "r") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return dict()
+
+
+    def __save_cache(self, cache: dict):
+        """
+        Saves the runtimes probed, so they aren't probed again next time.
+        :param cache: The runtimes, mapped by their paths.
+        :return:
+        """
+        os.makedirs(os.path.dirname(self.__cache_path), exist_ok=True)
+        temporary_path = self.__cache_path + ".tmp"
+        with open(temporary_path, "w") as cache_file:
+            json.dump(cache, cache_file, indent=4)
+
+        os.replace(temporary_path, self.__cache_path)
@@ -0,0 +1,215 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import os
+import re
+import sys
+
+# Third Party Imports
+# Local Application Imports
+
+
+# The server.properties settings every profile tunes, picked with SERVER-PROPERTIES-PROFILE.
+# Settings the server version doesn't have (e.g. simulation-distance before 1.18) are left out when applying them.
+PROFILES = {
+    "none": {},
+
+    # Keeps the ticks short, and spends less time compressing packets, at the cost of some bandwidth.
+    "low-latency": {"view-distance": "8", "simulation-distance": "6", "network-compression-threshold": "512",
+                    "sync-chunk-writes": "false"},
+
+    # Keeps less of the world loaded and ticking around every player, so more players fit in a tick.
+    "many-players": {"view-distance": "6", "simulation-distance": "4", "network-compression-threshold": "256",
+                     "sync-chunk-writes": "false", "entity-broadcast-range-percentage": "75",
+                     "max-tick-time": "120000"},
+
+    # Keeps as few chunks and entities loaded as is playable, for small heaps that take longer to collect.
+    "low-memory": {"view-distance": "5", "simulation-distance": "4", "entity-broadcast-range-percentage": "50",
+                   "max-tick-time": "120000"},
+}
+
+# The default server.properties of every Minecraft version, bundled next to the MCSM, or in the resources folder.
+TEMPLATE_NAME = "SERVER_PROPERTIES_{version}.txt"
+
+# Splits a property line into its key and value, the same way java.util.Properties does.
+PROPERTY_LINE = re.compile(r"\s*((?:\\.|[^=:\s\\])+)\s*[=:\s]\s*(.*)|\s*((?:\\.|[^=:\s\\])+)\s*")
+
+# The characters written escaped, as java.util.Properties does.
+ESCAPES = {"\\": "\\\\", "=": "\\=", ":": "\\:", "#": "\\#", "!": "\\!", "\t": "\\t", "\n": "\\n", "\r": "\\r",
+           "\f": "\\f"}
+
+
+class MCSMProperties:
+    """
+    This class implements the server.properties file, keeping its comments and the order of its lines.
+    Only the lines of the properties that change are rewritten, and the file is only written when one did,
+    so the server, and anyone comparing the file, only sees the settings that were actually changed.
+    """
+
+    def __init__(self, properties_path: str):
+        self.properties_path = properties_path
+        self.__lines = list()
+        self.__indexes = dict()
+        self.__newline = "\n"
+        self.__changed = False
+
+        if os.path.isfile(properties_path):
+            self.__load()
+
+
+    def __contains__(self, key: str):
+        return key in self.__indexes
+
+
+    def get(self, key: str, default: str = None):
+        """
+        Gets the value of a property.
+        :param key: The name of the property.
+        :param default: The value returned if the file doesn't have the property.
+        :return: String, the value of the property.
+        """
+        if key not in self.__indexes: return default
+        return self.__lines[self.__indexes[key]][1]
+
+
+    def set(self, key: str, value: str, add: bool = False):
+        """
+        Sets the value of a property, only rewriting its line if the value is different.
+        :param key: The name of the property.
+        :param value: The value of the property.
+        :param add: If set to True, the property is added to the end of the file if it doesn't have it.
+        :return: Boolean, True if the property changed.
+        """
+        value = str(value)
+
+        # Java reads switches regardless of their case, so "True" and "true" aren't a change.
+        if value.lower() in ("true", "false"): value = value.lower()
+
+        if key not in self.__indexes:
+            if not add: return False
+            self.__indexes[key] = len(self.__lines)
+            self.__lines.append((key, value, self.__format(key, value)))
+            self.__changed = True
+            return True
+
+        index = self.__indexes[key]
+        if self.__lines[index][1] == value: return False
+
+        self.__lines[index] = (key, value, self.__format(key, value))
+        self.__changed = True
+        return True
+
+
+    def apply(self, values: dict, add: bool = False):
+        """
+        Sets many properties at once.
+        :param values: The value of every property, by its name.
+        :param add: If set to True, the properties the file doesn't have are added to it, instead of left out.
+        :return: Tuple, containing a dictionary mapping every property that changed to its (old, new) values,
+        and a list of the properties left out, since the file doesn't have them.
+        """
+        changes, missing = dict(), list()
+        for key, value in values.items():
+            old_value = self.get(key)
+            if self.set(key, value, add):
+                changes[key] = (old_value, self.get(key))
+            elif key not in self.__indexes:
+                missing.append(key)
+
+        return changes, missing
+
+
+    def save(self):
+        """
+        Writes the properties into the file, if any of them changed. The file is written into a copy
+        first, and moved over the file, so the server never reads it half-written.
+        :return: Boolean, True if the file was written.
+        """
+        if not self.__changed: return False
+
+        temporary_path = self.properties_path + ".tmp"
+        with open(temporary_path, "w", encoding="latin-1", newline="") as properties_file:
+            properties_file.writelines(line + self.__newline for key, value, line in self.__lines)
+
+        os.replace(temporary_path, self.properties_path)
+        self.__changed = False
+        return True
+
+
+    @staticmethod
+    def find_template(version: str):
+        """
+        Finds the default server.properties of a Minecraft version.
+        :param version: The Minecraft version. (e.g. "1.18.1")
+        :return: String, the path of the template, or None if there is none for the version.
+        """
+        # Frozen builds unpack the bundled files into sys._MEIPASS.
+        module_folder = os.path.dirname(os.path.abspath(__file__))
+        template_name = TEMPLATE_NAME.format(version=version)
+
+        for template_path in [os.path.join(getattr(sys, "_MEIPASS", module_folder), template_name),
+                              os.path.join(module_folder, os.pardir, os.pardir, "resources", template_name)]:
+            if os.path.isfile(template_path): return template_path
+
+        return None
+
+
+    def __load(self):
+        """
+        Reads the properties from the file. Java writes server.properties in latin-1, escaping any other character.
+        :return:
+        """
+        with open(self.properties_path, "r", encoding="latin-1", newline="") as properties_file:
+            text = properties_file.read()
+
+        if "\r\n" in text: self.__newline = "\r\n"
+
+        for line in text.splitlines():
+            stripped = line.strip()
+            match = PROPERTY_LINE.fullmatch(line)
+
+            if not stripped or stripped.startswith(("#", "!")) or not match:
+                self.__lines.append((None, None, line))
+                continue
+
+            key = self.__unescape(match.group(1) or match.group(3))
+            self.__indexes[key] = len(self.__lines)
+            self.__lines.append((key, self.__unescape(match.group(2) or ""), line))
+
+
+    @staticmethod
+    def __format(key: str, value: str):
+        """
+        Formats a property into its line, escaping it the way java.util.Properties does.
+        :param key: The name of the property.
+        :param value: The value of the property.
+        :return: String, the line of the property.
+        """
+        def escape(text: str):
+            return "".join(ESCAPES.get(character) or (character if " " <= character <= "~" else
+                                                      f"\\u{ord(character):04x}") for character in text)
+
+        # Leading spaces of the value would be taken as the separator, so they are escaped too.
+        value = escape(value)
+        if value.startswith(" "): value = "\\" + value
+        return f"{escape(key).replace(' ', chr(92) + ' ')}={value}"
+
+
+    @staticmethod
+    def __unescape(text: str):
+        """
+        Turns the escaped characters of a property back into the characters.
+        :param text: The escaped key or value.
+        :return: String, the unescaped text.
+        """
+        def unescape(match):
+            escaped = match.group(1)
+            if escaped.startswith("u"): return chr(int(escaped[1:], 16))
+            return {"t": "\t", "n": "\n", "r": "\r", "f": "\f"}.get(escaped, escaped)
+
+        return re.sub(r"\\(u[0-9a-fA-F]{4}|.)", unescape, text)
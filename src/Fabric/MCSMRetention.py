@@ -0,0 +1,198 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from datetime import datetime
+import os
+import shutil
+import threading
+import time
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+from MCSMCatalog import MCSMCatalog
+from MCSMArchive import MANIFEST_SUFFIX
+from MCSMSettings import MCSMSettings
+
+
+class MCSMRetention:
+    """
+    This class implements the retention policy for the backups. It decides which backups
+    to keep using grandfather-father-son rules (keep the last N hourly, daily, weekly and
+    monthly backups) and a size quota, and deletes the rest.
+    """
+
+    # The strftime format identifying the period each rule keeps one backup for.
+    PERIODS = {
+        "hourly": "%Y-%m-%d %H",
+        "daily": "%Y-%m-%d",
+        "weekly": "%G-%V",
+        "monthly": "%Y-%m",
+    }
+
+    def __init__(self, logger: MCSMLogger, catalog: MCSMCatalog):
+        self.__logger = logger
+        self.__catalog = catalog
+        self.__lock = threading.Lock()
+
+
+    def prune(self, kind: str, policy: dict, upcoming_size: int = None):
+        """
+        Deletes every backup of a given type that isn't kept by the policy,
+        removing it from the catalog as well.
+        :param kind: The type of the backups to prune.
+        :param policy: The retention policy, as returned by load_policy.
+        :param upcoming_size: The estimated size of a backup about to be made. If given, the backups
+        it would push out of the policy are deleted ahead of it, waiting for any running prune first.
+        :return: Integer, the amount of backups deleted.
+        """
+        # Only one prune at a time. If one is already running, the prune after the next backup catches up.
+        if not self.__lock.acquire(blocking=upcoming_size is not None): return 0
+        deleted = 0
+
+        try:
+            backups = self.__catalog.get_backups(kind)
+            if upcoming_size is not None:
+                backups.append({"path": None, "created": time.time(), "size": upcoming_size})
+
+            for backup in self.select_expired(backups, policy):
+
+                if os.path.isdir(backup["path"]):
+                    shutil.rmtree(backup["path"], ignore_errors=True)
+                elif os.path.isfile(backup["path"]):
+                    os.remove(backup["path"])
+
+                if os.path.isfile(backup["path"] + MANIFEST_SUFFIX):
+                    os.remove(backup["path"] + MANIFEST_SUFFIX)
+
+                self.__catalog.remove_backup(backup["path"])
+                self.__logger.log(f"Deleted old backup '{backup['path']}'.", level="BACKUPS/INFO", console=False)
+                deleted += 1
+
+        finally:
+            self.__lock.release()
+
+        return deleted
+
+
+    def make_room(self, kind: str, policy: dict, folder: str, needed_bytes: int):
+        """
+        Checks that a backup about to be made fits on the disk, leaving the reserved space of the policy
+        free for the server. If it doesn't, the backups the policy would delete once it is made are
+        deleted ahead of it.
+        :param kind: The type of the backup.
+        :param policy: The retention policy, as returned by load_policy.
+        :param folder: The folder the backup is written into.
+        :param needed_bytes: The estimated size of the backup.
+        :return: Tuple, containing a boolean, True if the backup fits, and the amount of free bytes.
+        """
+        reserved_bytes = policy["reserved"]
+        free_bytes = shutil.disk_usage(folder).free
+        if free_bytes - needed_bytes >= reserved_bytes: return True, free_bytes
+
+        deleted = self.prune(kind, policy, needed_bytes)
+        free_bytes = shutil.disk_usage(folder).free
+        if deleted:
+            self.__logger.log(f"Deleted {deleted} old backups ahead of the next one to make room for it, "
+                              f"{free_bytes:,} bytes are free now.", level="BACKUPS/INFO", console=False)
+
+        return free_bytes - needed_bytes >= reserved_bytes, free_bytes
+
+
+    @classmethod
+    def select_expired(cls, backups: list, policy: dict):
+        """
+        Selects the backups that should be deleted according to a policy.
+        The newest backup is always kept.
+        :param backups: The backups, as returned by the catalog.
+        :param policy: The retention policy, as returned by load_policy.
+        :return: List, containing the backups to delete.
+        """
+        newest_first = sorted(backups, key=lambda backup: backup["created"], reverse=True)
+        if not newest_first: return []
+
+        # If no grandfather-father-son rule is set, every backup is kept. (Only the quota applies)
+        if any(policy[rule] for rule in ["last", *cls.PERIODS]):
+            kept_paths = {backup["path"] for backup in newest_first[:max(policy["last"], 1)]}
+
+            # Keeps the newest backup of each of the last N periods of every rule.
+            for rule, period_format in cls.PERIODS.items():
+                periods = set()
+
+                for backup in newest_first:
+                    if len(periods) >= policy[rule]: break
+
+                    period = datetime.fromtimestamp(backup["created"]).strftime(period_format)
+                    if period in periods: continue
+
+                    periods.add(period)
+                    kept_paths.add(backup["path"])
+
+            kept = [backup for backup in newest_first if backup["path"] in kept_paths]
+        else:
+            kept = newest_first
+
+        # Drops the oldest kept backups until they fit in the quota.
+        # Snapshots share their unchanged files through hardlinks, so each one is counted by the files that no
+        # newer kept snapshot links to. Their size in the catalog is only what they copied when they were made,
+        # and a file it linked stays on the disk for as long as any snapshot links to it.
+        if policy["quota"] > 0:
+            total_size = 0
+            seen_inodes = set()
+
+            for index, backup in enumerate(kept):
+                if backup["path"] is not None and os.path.isdir(backup["path"]):
+                    total_size += cls.__get_unique_size(backup["path"], seen_inodes)
+                else:
+                    total_size += backup["size"]
+                if total_size > policy["quota"] and index > 0:
+                    kept = kept[:index]
+                    break
+
+        kept_paths = {backup["path"] for backup in kept}
+        return [backup for backup in newest_first if backup["path"] not in kept_paths]
+
+
+    @staticmethod
+    def __get_unique_size(folder: str, seen_inodes: set):
+        """
+        Sums the size of the files inside a folder that weren't already counted, telling
+        hardlinks of the same file apart by their inode.
+        :param folder: The folder to measure. (e.g. a snapshot)
+        :param seen_inodes: The inodes already counted, updated with the ones in the folder.
+        :return: Integer, the amount of bytes the folder adds on the disk.
+        """
+        unique_size = 0
+
+        for dirpath, dirnames, filenames in os.walk(folder):
+            for filename in filenames:
+                try:
+                    stat = os.stat(os.path.join(dirpath, filename))
+                except FileNotFoundError:
+                    continue
+
+                if (stat.st_dev, stat.st_ino) in seen_inodes: continue
+                seen_inodes.add((stat.st_dev, stat.st_ino))
+                unique_size += stat.st_size
+
+        return unique_size
+
+
+    @staticmethod
+    def load_policy(settings: MCSMSettings, prefix: str):
+        """
+        Builds a retention policy from the settings.
+        :param settings: The loaded settings.
+        :param prefix: The prefix of the settings to use. ("backups" or "playerdata-backups")
+        :return: Dictionary, containing the amount of backups to keep per rule, the quota in bytes,
+        and the bytes to always leave free on the disk.
+        """
+        policy = {rule: settings[f"{prefix}-keep-{rule}"] for rule in ["last", *MCSMRetention.PERIODS]}
+        policy["quota"] = settings[f"{prefix}-quota"]
+        policy["reserved"] = settings[f"{prefix}-min-free-space"]
+        return policy
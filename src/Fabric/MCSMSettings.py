@@ -0,0 +1,51 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from collections.abc import Mapping
+import time
+
+# Third Party Imports
+# Local Application Imports
+
+
+class MCSMSettings(Mapping):
+    """
+    This class implements an immutable snapshot of the settings, mapping the lowercase name
+    of every setting to its typed value. (e.g. settings["backups-cooldown"] is 7200.0 seconds)
+    The text every setting was written as is kept too, for the settings copied into other files.
+    """
+
+    def __init__(self, values: dict, raw_values: dict):
+        self.__values = dict(values)
+        self.__raw_values = dict(raw_values)
+        self.loaded_at = time.time()
+
+
+    def __getitem__(self, key: str):
+        return self.__values[key]
+
+
+    def __iter__(self):
+        return iter(self.__values)
+
+
+    def __len__(self):
+        return len(self.__values)
+
+
+    def __repr__(self):
+        return f"MCSMSettings({self.__values!r})"
+
+
+    def raw(self, key: str):
+        """
+        Gets a setting as it was written in the config file.
+        :param key: The lowercase name of the setting.
+        :return: String, the text of the setting.
+        """
+        return self.__raw_values[key]
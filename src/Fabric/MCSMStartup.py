@@ -0,0 +1,116 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from datetime import datetime
+import json
+import os
+import re
+import time
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+
+
+# The messages of the server that mark every step of its startup, by their name in the timeline.
+MILESTONES = {"properties": "Loading properties", "world": "Preparing level", "ready": "Done ("}
+
+# The time the server reports it took to start, in its "Done" message.
+DONE_MESSAGE = re.compile(r"Done \(([\d.]+)s\)")
+
+# How every class sharing mode is described in the logs.
+CLASS_SHARING_MODES = {"on": "using the class sharing archive", "dumping": "writing the class sharing archive",
+                       "off": "without class sharing"}
+
+# The amount of starts kept in the timeline.
+TIMELINE_LENGTH = 50
+
+
+class MCSMStartup:
+    """
+    This class implements the startup timeline of the server, which keeps how long every start took
+    to reach each step, and how the server was started. (e.g. with the class sharing archive or without it)
+    """
+
+    def __init__(self, logger: MCSMLogger, timeline_path: str):
+        self.__logger = logger
+        self.timeline_path = timeline_path
+        self.__started = None
+        self.__entry = None
+
+
+    def launched(self, **details):
+        """
+        Starts timing a start of the server, from the moment its process was launched.
+        :param details: How the server was started, kept along with the times. (e.g. class_sharing="on")
+        :return:
+        """
+        self.__started = time.monotonic()
+        self.__entry = {"launched": datetime.now().isoformat(timespec="seconds"), **details, "milestones": dict()}
+
+
+    def process_output(self, message: str):
+        """
+        Marks the steps of the startup as the server logs them, saving the start once the server is ready.
+        :param message: The message logged by the server.
+        :return:
+        """
+        if self.__entry is None: return
+
+        milestones = self.__entry["milestones"]
+        if not milestones: milestones["output"] = round(time.monotonic() - self.__started, 3)
+
+        for name, milestone in MILESTONES.items():
+            if name not in milestones and message.startswith(milestone):
+                milestones[name] = round(time.monotonic() - self.__started, 3)
+
+        if "ready" not in milestones: return
+
+        reported = DONE_MESSAGE.match(message)
+        self.__entry["reported"] = float(reported.group(1)) if reported else None
+        self.__save(self.__entry)
+        self.__entry = None
+
+
+    def __save(self, entry: dict):
+        """
+        Adds a start into the timeline, and logs how long it took against the earlier starts.
+        :param entry: The start.
+        :return:
+        """
+        timeline = self.__load()
+        earlier = [start["milestones"]["ready"] for start in timeline
+                   if start.get("class_sharing") == entry.get("class_sharing")]
+
+        timeline = (timeline + [entry])[-TIMELINE_LENGTH:]
+        os.makedirs(os.path.dirname(self.timeline_path), exist_ok=True)
+        with open(self.timeline_path, "w") as timeline_file:
+            json.dump(timeline, timeline_file, indent=4)
+
+        # Starts with and without the class sharing archive are told apart, to see what it saves.
+        others = [start["milestones"]["ready"] for start in timeline[:-1]
+                  if start.get("class_sharing") != entry.get("class_sharing")]
+        comparison = ""
+        if earlier: comparison += f" Earlier starts the same way averaged {round(sum(earlier) / len(earlier), 1)}s."
+        if others: comparison += f" Starts the other ways averaged {round(sum(others) / len(others), 1)}s."
+
+        self.__logger.log(f"The server started in {entry['milestones']['ready']}s, "
+                          f"{CLASS_SHARING_MODES.get(entry.get('class_sharing'), CLASS_SHARING_MODES['off'])}."
+                          f"{comparison}", level="INFO", console=False)
+
+
+    def __load(self):
+        """
+        Loads the timeline of the earlier starts.
+        :return: List, containing every start, oldest first.
+        """
+        try:
+            with open(self.timeline_path, "r") as timeline_file:
+                return json.load(timeline_file)
+        except (OSError, ValueError):
+            return list()
@@ -6,86 +6,373 @@ __copyright__ = "
 __license__ = "GNU GENERAL PUBLIC LICENSE v3"
 
 # Built-in Imports
-from datetime import datetime
+import hashlib
 import os
-import tarfile
+import shutil
+import threading
 
 # Third Party Imports
 # Local Application Imports
 import time
 
 from MCSMLogger import MCSMLogger
-from MCSMConfig import MCSMConfig
+from MCSMSettings import MCSMSettings
+from MCSMCatalog import MCSMCatalog
+from MCSMRetention import MCSMRetention
+from MCSMArchive import MCSMArchive, CHUNK_SIZE, MANIFEST_SUFFIX, write_manifest
+from MCSMArchiveWorker import MCSMArchiveWorker
+from MCSMScheduler import MCSMScheduler
+from MCSMPlayerdataBackups import MCSMPlayerdataBackups
+from MCSMChangeDetector import MCSMChangeDetector
+from MCSMThrottle import MCSMThrottle
+from MCSMPathRules import MCSMPathRules
 
 
-class MCSMBackups(MCSMConfig):
+class MCSMBackups:
     """
     This class implements a periodical backups system which will be built-in the server.
-    This class inherits from MCSMConfig to access the settings.
+    The settings are given as the snapshot loaded by MCSMConfig.
     """
 
-    def __init__(self, logger: MCSMLogger):
-        super().__init__(logger)
-
+    def __init__(self, logger: MCSMLogger, settings: MCSMSettings):
         self.__logger = logger
         self._server_files_path = os.path.join(os.getcwd(), "server_files")
-        self._config_path = os.path.join(self._server_files_path, "config.mcsm")
-        self._settings = self.load_settings()
+        self._settings = settings
+        self.__backups_path = self.__get_backups_path()
+        self.__archive_format = self._settings["backups-format"]
+        self.__snapshots_path = os.path.join(self.__backups_path, "Snapshots")
+        self.__catalog = MCSMCatalog(self._server_files_path)
+        self.__retention = MCSMRetention(logger, self.__catalog)
+        self.__scheduler = None
+        self.__playerdata_backups = None
+        self.__import_existing_backups()
 
-        if not self._settings["backups-path"] or not os.path.exists(self._settings["backups-path"]):
-            self.__backups_path = os.path.join(self._server_files_path, "MCSM-Backups", "Server")
-            self.__logger.log(f"Backups path is unspecified or does not exist. "
-                              f"Defaulted to {self.__backups_path}.", level="BACKUPS/WARN")
-        else:
-            self.__backups_path = self._settings["backups-path"]
+        # The rules choosing which files are left out of the backups.
+        self.__rules = MCSMPathRules.load(self._settings, "backups")
+
+        # Limits the rate the backups use the disk at, slowing them down further if the server lags.
+        self.__throttle = MCSMThrottle.load(self._settings)
 
-        os.makedirs(self.__backups_path, exist_ok=True)
+        # Backups of a world where nothing changed are skipped, unless too many were skipped in a row.
+        self.__detector = None
+        if self._settings["backups-skip-unchanged"]:
+            self.__detector = MCSMChangeDetector(logger, [os.path.join(self._server_files_path, "world")],
+                                                 self._settings["backups-force-after-skips"])
 
 
-    def start(self):
+    def schedule(self, scheduler: MCSMScheduler, playerdata_backups: MCSMPlayerdataBackups = None):
         """
-        Starts the backups system taking into account the
+        Adds the backups to the scheduler taking into account the
         defined settings for conditioning the system.
+        :param scheduler: The scheduler that runs the backups.
+        :param playerdata_backups: The playerdata backups, written alongside the world backups when combined.
         :return:
         """
+        self.__scheduler = scheduler
+        self.__playerdata_backups = playerdata_backups if playerdata_backups and playerdata_backups.combined else None
 
         # If the backups are set to False in the configs, don't do any backups.
-        if self._settings["backups"] == "False":
+        if not self._settings["backups"]:
             self.__logger.log("The backups setting is set to False, so no backups will be made. "
                               "You can change this by going to settings and "
                               "changing the \"BACKUPS\" setting to True.", level="BACKUPS/INFO")
             return
 
-        while True:
-            # Create a backup and wait for a configured amount of time.
-            saved_path = self.__do_backup()
+        if self.__detector:
+            scheduler.add_console_listener(self.__detector.process_console)
+            method = "watched" if self.__detector.start_watching() else "scanned"
+            self.__logger.log(f"The world will be {method} for changes, unchanged backups are skipped.",
+                              level="BACKUPS/INFO", console=False)
+
+        scheduler.add_console_listener(self.__throttle.process_console)
+
+        cooldown = self._settings["backups-cooldown"]
+        scheduler.add_job("backups", self.backup, interval=cooldown, priority=0, jitter=min(cooldown * 0.05, 60))
+
+
+    def apply_settings(self, settings: MCSMSettings, changed: set):
+        """
+        Applies new settings to the running backups, when config.mcsm is changed.
+        :param settings: The new settings.
+        :param changed: The names of the settings that changed.
+        :return: Set, containing the changed settings that only apply after a restart.
+        """
+        self._settings = settings
+
+        if "backups-path" in changed:
+            self.__backups_path = self.__get_backups_path()
+            self.__snapshots_path = os.path.join(self.__backups_path, "Snapshots")
+            self.__import_existing_backups()
+
+        self.__archive_format = settings["backups-format"]
+        if changed & {"backups-include", "backups-exclude"}: self.__rules = MCSMPathRules.load(settings, "backups")
 
-            # Check if the user wants to be notified about the backup.
-            if self._settings["backups-notify"] == "True":
-                self.__logger.log(f"Backup created. Saved at '{saved_path}'.",
-                                  level="BACKUPS/INFO")
+        if changed & {"backups-rate-limit", "backups-adaptive-throttle"}:
+            self.__throttle.set_rate(settings["backups-rate-limit"], settings["backups-adaptive-throttle"])
 
-            time.sleep(float(self._settings["backups-cooldown"]))
+        if "backups-cooldown" in changed and self.__scheduler:
+            cooldown = settings["backups-cooldown"]
+            self.__scheduler.update_job("backups", cooldown, min(cooldown * 0.05, 60))
 
+        # Turning the backups on or off, and the change detection, are only set up when the MCSM starts.
+        return changed & {"backups", "backups-skip-unchanged", "backups-force-after-skips"}
 
-    def __do_backup(self):
+
+    def backup(self):
+        """
+        Creates a backup (or a snapshot), and prunes the old ones in the background.
+        The backup is skipped if the world didn't change since the last one.
+        :return: String, describing what was done.
         """
-        Zips the world folder and puts the .zip into
-        the backups path. Ignores the session.lock file.
+        changed, reason = self.__detector.check() if self.__detector else (True, "skipping is disabled")
+        if not changed:
+            self.__logger.log(f"Backup skipped, {reason}.", level="BACKUPS/INFO", console=False)
+            return f"skipped, {reason}"
+
+        kind = "snapshot" if self._settings["backups-mode"] == "snapshot" else "server"
+        policy = MCSMRetention.load_policy(self._settings, "backups")
+
+        # The size of the backup is estimated from the previous ones, so a full disk is found before writing it.
+        expected_size = self.__catalog.estimate_size(kind) or 0
+        if self.__playerdata_backups: expected_size += self.__catalog.estimate_size("playerdata") or 0
+
+        fits, free_bytes = self.__retention.make_room(kind, policy, self.__backups_path, expected_size)
+        if not fits:
+            self.__logger.log(f"Backup skipped, it needs about {expected_size:,} bytes, but only {free_bytes:,} "
+                              f"bytes are free and {policy['reserved']:,} are kept free for the server. Free some "
+                              f"space or keep less backups.", level="BACKUPS/WARN")
+            return "skipped, not enough disk space"
+
+        # The backups run in their own thread, so only the backups are affected by the lower priority.
+        MCSMThrottle.lower_priority(*MCSMThrottle.load_priority(self._settings))
+        started = time.perf_counter()
+        consumed_bytes, throttled_time = self.__throttle.consumed_bytes, self.__throttle.throttled_time
+
+        if kind == "snapshot":
+            saved_path = self.__do_snapshot()
+        else:
+            saved_path = self.__do_backup(self.__catalog.estimate_size(kind) or 0)
+
+        # Only a saved backup becomes the base of the next check, so a failed one is tried again.
+        if self.__detector: self.__detector.commit()
+
+        # Keeps how fast the backup was, and how long it waited on the rate limit.
+        duration = time.perf_counter() - started
+        throughput = (self.__throttle.consumed_bytes - consumed_bytes) / duration if duration > 0 else 0
+        throttled_time = self.__throttle.throttled_time - throttled_time
+        self.__catalog.set_performance(saved_path, duration, throughput, throttled_time)
+        self.__logger.log(f"Backup took {round(duration, 1)}s at {round(throughput / (1024 * 1024), 1)} MB/s, "
+                          f"{round(throttled_time, 1)}s of it throttled.", level="BACKUPS/INFO", console=False)
+
+        # Deletes the backups that aren't kept by the retention policy in the background.
+        threading.Thread(target=self.__retention.prune, args=(kind, policy), daemon=True).start()
+
+        # Check if the user wants to be notified about the backup.
+        if self._settings["backups-notify"]:
+            self.__logger.log(f"Backup created. Saved at '{saved_path}'.",
+                              level="BACKUPS/INFO")
+
+        return f"saved, {reason}"
+
+
+    def __do_backup(self, expected_size: int = 0):
+        """
+        Archives the world folder into a .tar.gz or .zip inside
+        the backups path. Leaves out the files excluded by the rules.
+        :param expected_size: The estimated size of the archive, reserved on the disk before writing it.
         :return:
         """
         world_folder = os.path.join(self._server_files_path, "world")
-        now = datetime.now()
-        backup_filename = f"{now.year}-{now.month}-{now.day}.{now.hour}.{now.minute}.tar.gz"
-        output_path = os.path.join(self.__backups_path, backup_filename)
+        created = time.time()
+        output_path = self.__catalog.new_backup_path(self.__backups_path, f".{self.__archive_format}")
+
+        # The archiving runs in a worker process, so it never holds up the server output.
+        worker = MCSMArchiveWorker(self.__logger, self.__throttle, MCSMThrottle.load_priority(self._settings),
+                                   self._settings["backups-worker-process"])
+        worker.add_output(output_path, self.__archive_format, "world", self.__rules, expected_size)
+
+        # If a playerdata backup is due soon, it is written from the same reads instead of on its own.
+        playerdata_output = None
+        if self.__playerdata_backups and self.__scheduler.claim_job("playerdata-backups") \
+                and self.__playerdata_backups.check_changes()[0]:
+            playerdata_output = self.__playerdata_backups.start_archive()
+            worker.add_output(playerdata_output[0], playerdata_output[1], "world/playerdata")
+
+        # Makes the backup, filtering out the excluded files.
+        # If it fails, nothing it started is left behind, and the playerdata backup runs on its own again.
+        try:
+            indexes = worker.run(world_folder, "world")
+        except BaseException:
+            for path in [output_path, output_path + MANIFEST_SUFFIX]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+            if playerdata_output:
+                self.__playerdata_backups.abort_archive(playerdata_output[0])
+                self.__scheduler.release_job("playerdata-backups")
+            raise
+
+        self.__catalog.add_backup("server", output_path, created, os.path.getsize(output_path),
+                                  sum(member["size"] for member in indexes[0]), len(indexes[0]))
+
+        if playerdata_output:
+            self.__playerdata_backups.finish_archive(playerdata_output[0], indexes[1], playerdata_output[2])
+            self.__logger.log(f"The playerdata backup was written along with the world backup, "
+                              f"saving {worker.shared_bytes:,} bytes of reads.", level="BACKUPS/INFO", console=False)
+
+        return output_path
+
+
+    def __do_snapshot(self):
+        """
+        Copies the world folder into a new snapshot directory inside the backups path.
+        Files that didn't change since the previous snapshot are hardlinked to it instead
+        of being copied, so each snapshot only costs the changed bytes. Leaves out the files excluded by the rules.
+        :return: String, the path of the created snapshot.
+        """
+        world_folder = os.path.join(self._server_files_path, "world")
+        os.makedirs(self.__snapshots_path, exist_ok=True)
+
+        created = time.time()
+        output_path = self.__catalog.new_backup_path(self.__snapshots_path)
+        partial_path = output_path + ".partial"
+        previous_snapshots = [snapshot for snapshot in self.__catalog.get_backups("snapshot")
+                              if os.path.isdir(snapshot["path"])]
+        previous_path = previous_snapshots[-1]["path"] if previous_snapshots else None
+        previous_hashes = MCSMArchive(previous_path).get_hashes() if previous_path else dict()
+        copied_bytes = 0
+        files = list()
+
+        # Removes any leftovers of interrupted snapshots, they can't be trusted as a base.
+        for item in os.listdir(self.__snapshots_path):
+            if item.endswith(".partial"):
+                shutil.rmtree(os.path.join(self.__snapshots_path, item), ignore_errors=True)
 
-        # Prevents two backups with the same name
-        if os.path.isfile(output_path):
-            os.remove(output_path)
+        for dirpath, dirnames, filenames in os.walk(world_folder):
+            relative_dir = os.path.relpath(dirpath, world_folder)
+            archive_dir = "world" if relative_dir == "." else "world/" + relative_dir.replace(os.sep, "/")
+            os.makedirs(os.path.join(partial_path, relative_dir), exist_ok=True)
 
-        # Makes the backup, filtering out the session.lock file.
-        exclude = ["world/session.lock"]
-        with tarfile.open(output_path, "w:gz") as tar:
-            tar.add(world_folder, arcname="", filter=lambda x: None if x.name in exclude else x)
+            # Excluded folders are never walked into.
+            dirnames[:] = [dirname for dirname in dirnames if not self.__rules.can_prune(f"{archive_dir}/{dirname}")]
 
+            for filename in filenames:
+                relative_file = os.path.normpath(os.path.join(relative_dir, filename))
+                member_path = f"{archive_dir}/{filename}"
+                if self.__rules.excluded_by(member_path) is not None: continue
+
+                source = os.path.join(dirpath, filename)
+                destination = os.path.join(partial_path, relative_file)
+                previous = os.path.join(previous_path, relative_file) if previous_path else None
+
+                # Linked files keep the hash they had in the previous snapshot.
+                try:
+                    if previous and self.__is_unchanged(source, previous):
+                        os.link(previous, destination)
+                        file_hash = previous_hashes.get(member_path) or self.__hash_file(destination)
+                        files.append({"path": member_path, "size": os.path.getsize(destination), "sha256": file_hash})
+                        continue
+                except OSError:
+                    pass  # Hardlinks aren't supported by the filesystem, fall back to a copy.
+
+                # The file may be removed by the server while walking, skip it if so.
+                try:
+                    file_hash = self.__copy_file(source, destination, self.__throttle)
+                    copied_bytes += os.path.getsize(destination)
+                    files.append({"path": member_path, "size": os.path.getsize(destination), "sha256": file_hash})
+                except FileNotFoundError:
+                    pass
+
+        # Only complete snapshots get their final name, so they can always be used as a base.
+        # Their size in the catalog is what they cost on disk when made, the bytes that were copied.
+        # (The quota measures them by their files instead, since deleting older snapshots moves the cost)
+        os.rename(partial_path, output_path)
+        write_manifest(output_path, {"files": files})
+        self.__catalog.add_backup("snapshot", output_path, created, copied_bytes,
+                                  sum(file["size"] for file in files), len(files))
         return output_path
+
+
+    def __get_backups_path(self):
+        """
+        Picks the folder the backups are saved into from the settings, creating it if needed.
+        :return: String, the path of the folder.
+        """
+        if not self._settings["backups-path"] or not os.path.exists(self._settings["backups-path"]):
+            backups_path = os.path.join(self._server_files_path, "MCSM-Backups", "Server")
+            self.__logger.log(f"Backups path is unspecified or does not exist. "
+                              f"Defaulted to {backups_path}.", level="BACKUPS/WARN")
+        else:
+            backups_path = self._settings["backups-path"]
+
+        os.makedirs(backups_path, exist_ok=True)
+        return backups_path
+
+
+    def __import_existing_backups(self):
+        """
+        Registers the backups and snapshots made before the catalog existed into it.
+        :return:
+        """
+        self.__catalog.import_existing("server", [os.path.join(self.__backups_path, item)
+                                                  for item in os.listdir(self.__backups_path)
+                                                  if item.endswith((".tar.gz", ".zip"))])
+
+        if os.path.isdir(self.__snapshots_path):
+            self.__catalog.import_existing("snapshot", [os.path.join(self.__snapshots_path, item)
+                                                        for item in os.listdir(self.__snapshots_path)
+                                                        if not item.endswith(".partial")
+                                                        and os.path.isdir(os.path.join(self.__snapshots_path, item))])
+
+
+    @staticmethod
+    def __is_unchanged(source: str, previous: str):
+        """
+        Checks if a file is the same as its copy in the previous snapshot, by comparing
+        their size and modification time. (shutil.copystat preserves the modification time)
+        The times are compared in nanoseconds, since a region file rewritten within the same
+        second keeps its size, and would otherwise be linked to its outdated copy.
+        :return: Boolean, True if the file didn't change.
+        """
+        source_stat = os.stat(source)
+        previous_stat = os.stat(previous)
+        return source_stat.st_size == previous_stat.st_size and source_stat.st_mtime_ns == previous_stat.st_mtime_ns
+
+
+    @staticmethod
+    def __copy_file(source: str, destination: str, throttle: MCSMThrottle):
+        """
+        Copies a file along with its metadata, hashing it while it is copied.
+        :param source: The file to copy.
+        :param destination: Where to copy the file into.
+        :param throttle: Limits the rate at which the file is copied.
+        :return: String, the sha256 hash of the file.
+        """
+        digest = hashlib.sha256()
+
+        with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+            for chunk in iter(lambda: source_file.read(CHUNK_SIZE), b""):
+                throttle.consume(len(chunk))
+                digest.update(chunk)
+                destination_file.write(chunk)
+
+        shutil.copystat(source, destination)
+        return digest.hexdigest()
+
+
+    @staticmethod
+    def __hash_file(path: str):
+        """
+        Hashes a file, for linked files that have no hash in the previous snapshot.
+        :param path: The file to hash.
+        :return: String, the sha256 hash of the file.
+        """
+        digest = hashlib.sha256()
+
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+        return digest.hexdigest()
@@ -0,0 +1,232 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import re
+import struct
+import threading
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+
+
+# Files the server rewrites on every autosave even when nothing happened, (the level.dat holds
+# the time of the day) so they don't count as changes on their own.
+IGNORED_FILES = ["session.lock", "level.dat", "level.dat_old"]
+
+# The console messages that tell the players are changing the world. Player names can't have
+# spaces, so chat messages can't pass as these.
+JOINED_PATTERN = re.compile(r"^(\w{1,16}) joined the game$")
+LEFT_PATTERN = re.compile(r"^(\w{1,16}) left the game$")
+SAVED_MESSAGE = "Saved the game"
+
+# The inotify events that mean a file changed. (IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_FROM,
+# IN_MOVED_TO, IN_CREATE, IN_DELETE) and the flags needed to follow new folders and lost events.
+INOTIFY_CHANGES = 0x002 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+IN_CREATE, IN_MOVED_TO, IN_Q_OVERFLOW, IN_ISDIR = 0x100, 0x080, 0x4000, 0x40000000
+
+
+class MCSMChangeDetector:
+    """
+    This class implements the detection of changes in a set of folders since the last backup,
+    so backups of a world where nothing happened can be skipped. The console tells when players
+    are online or the game was saved by hand, and the files themselves are watched through
+    inotify where it is available, or scanned by their size and modification time otherwise.
+    """
+
+    def __init__(self, logger: MCSMLogger, folders: list, force_after: int = 0):
+        self.__logger = logger
+        self.__folders = folders
+        self.__force_after = force_after
+        self.__lock = threading.Lock()
+        self.__checked = False
+        self.__fingerprint = None
+        self.__uncommitted = False
+        self.__pending_fingerprint = None
+        self.__skips = 0
+        self.__players = set()
+        self.__players_seen = False
+        self.__saved = False
+        self.__files_changed = False
+        self.__watching = False
+
+
+    def start_watching(self):
+        """
+        Starts watching the folders for changes through inotify, if the system supports it.
+        Otherwise, the folders are scanned every time the changes are checked.
+        :return: Boolean, True if the folders are being watched.
+        """
+        # Folders that don't exist yet couldn't be followed once created, so they are scanned instead.
+        if not all(os.path.isdir(folder) for folder in self.__folders): return False
+
+        library = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(library, use_errno=True) if library else None
+        if libc is None or not hasattr(libc, "inotify_init1"): return False
+
+        inotify = libc.inotify_init1(os.O_CLOEXEC)
+        if inotify < 0: return False
+
+        watches = dict()
+        for folder in self.__folders:
+            if not self.__add_watches(libc, inotify, folder, watches):
+                os.close(inotify)
+                self.__logger.log("Couldn't watch the world for changes, it will be scanned instead. "
+                                  "(Raising fs.inotify.max_user_watches may help)", level="BACKUPS/WARN", console=False)
+                return False
+
+        self.__watching = True
+        threading.Thread(target=self.__watch, args=(libc, inotify, watches), daemon=True).start()
+        return True
+
+
+    def process_console(self, message: str):
+        """
+        Keeps track of the console messages that mean the world is being changed.
+        :param message: The message logged by the server.
+        :return:
+        """
+        with self.__lock:
+            if JOINED_PATTERN.match(message):
+                self.__players.add(JOINED_PATTERN.match(message).group(1))
+                self.__players_seen = True
+
+            elif LEFT_PATTERN.match(message):
+                self.__players.discard(LEFT_PATTERN.match(message).group(1))
+
+            elif message == SAVED_MESSAGE:
+                self.__saved = True
+
+
+    def check(self):
+        """
+        Checks if anything changed since the last backup. If so, the current state is kept aside, and
+        becomes the base for the next check once the backup is committed, so anything changing during
+        the backup counts for the next one. Until then, every check asks for a backup.
+        :return: Tuple, containing a boolean, True if a backup should be made, and the reason why.
+        """
+        # The scan runs outside the lock, so the console is never held up by it.
+        fingerprint = self.__scan() if not self.__watching else None
+
+        with self.__lock:
+            if not self.__checked:
+                changed, reason = True, "first backup since the server started"
+            elif self.__uncommitted:
+                changed, reason = True, "the last backup didn't finish"
+            elif self.__force_after and self.__skips >= self.__force_after:
+                changed, reason = True, f"forced after {self.__skips} skipped backups"
+            elif self.__players_seen or self.__players:
+                changed, reason = True, "players were online"
+            elif self.__saved:
+                changed, reason = True, "the game was saved"
+            elif self.__watching:
+                changed, reason = self.__files_changed, "files changed"
+            else:
+                changed, reason = fingerprint != self.__fingerprint, "files changed"
+
+            if not changed:
+                self.__skips += 1
+                return False, f"nothing changed since the last backup ({self.__skips} skipped in a row)"
+
+            # The flags are cleared right away, since the state they describe is the one about to be backed up.
+            self.__uncommitted = True
+            self.__pending_fingerprint = fingerprint
+            self.__players_seen = False
+            self.__saved = False
+            self.__files_changed = False
+            return True, reason
+
+
+    def commit(self):
+        """
+        Makes the state kept aside by the last check the base for the next one. Should only be
+        called once the backup it asked for was saved, so a failed backup is tried again next time.
+        :return:
+        """
+        with self.__lock:
+            if not self.__uncommitted: return
+
+            self.__checked = True
+            self.__fingerprint = self.__pending_fingerprint
+            self.__uncommitted = False
+            self.__skips = 0
+
+
+    def __scan(self):
+        """
+        Fingerprints the folders through the size and modification time of their files.
+        Only the file metadata is read, never their contents.
+        :return: String, the fingerprint of the folders.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+
+        for folder in self.__folders:
+            for dirpath, dirnames, filenames in os.walk(folder):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename in IGNORED_FILES: continue
+
+                    # The file may be removed by the server while scanning, skip it if so.
+                    try:
+                        stat = os.stat(os.path.join(dirpath, filename))
+                    except FileNotFoundError:
+                        continue
+
+                    digest.update(f"{dirpath}/{filename}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+
+        return digest.hexdigest()
+
+
+    def __watch(self, libc: ctypes.CDLL, inotify: int, watches: dict):
+        """
+        Reads the inotify events, flagging any file change. This method never
+        returns, so it should be run in a daemon thread.
+        :param libc: The C library.
+        :param inotify: The inotify file descriptor.
+        :param watches: The watched folders, by their watch descriptor.
+        :return:
+        """
+        while True:
+            events = os.read(inotify, 64 * 1024)
+            offset = 0
+
+            while offset < len(events):
+                watch, mask, cookie, length = struct.unpack_from("iIII", events, offset)
+                name = events[offset + 16:offset + 16 + length].rstrip(b"\0").decode("utf-8", "replace")
+                offset += 16 + length
+
+                # New folders (e.g. a new dimension) are watched as well.
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and watch in watches:
+                    self.__add_watches(libc, inotify, os.path.join(watches[watch], name), watches)
+
+                if name in IGNORED_FILES and not mask & IN_Q_OVERFLOW: continue
+
+                with self.__lock:
+                    self.__files_changed = True
+
+
+    @staticmethod
+    def __add_watches(libc: ctypes.CDLL, inotify: int, folder: str, watches: dict):
+        """
+        Watches a folder, and every folder inside it, through inotify.
+        :param libc: The C library.
+        :param inotify: The inotify file descriptor.
+        :param folder: The folder to watch.
+        :param watches: The watched folders, by their watch descriptor, to add the new ones into.
+        :return: Boolean, False if a folder couldn't be watched.
+        """
+        for dirpath, dirnames, filenames in os.walk(folder):
+            watch = libc.inotify_add_watch(inotify, os.fsencode(dirpath), INOTIFY_CHANGES)
+            if watch < 0: return False
+            watches[watch] = dirpath
+
+        return True
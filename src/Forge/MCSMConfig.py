@@ -6,76 +6,402 @@ __copyright__ = "
 __license__ = "GNU GENERAL PUBLIC LICENSE v3"
 
 # Built-in Imports
+import ctypes
+import ctypes.util
 import os
+import re
+import struct
+import sys
+import threading
+import time
+import traceback
 
 # Third Party Imports
-import requests
-from bs4 import BeautifulSoup
-
 # Local Application Imports
+from exceptions import InvalidConfig, FatalException
 from MCSMLogger import MCSMLogger
+from MCSMSettings import MCSMSettings
+from MCSMProperties import PROFILES
+from MCSMLaunch import JVM_PROFILES
+from MCSMAffinity import MCSMAffinity
+
+
+# The config template, bundled into the MCSM, or found in the resources folder of the repository.
+TEMPLATE_NAME = "CONFIG_TEMPLATE3.0.txt"
+
+# The type of every setting. Tuples list the only values a setting can take.
+# Settings that aren't in here (e.g. server.properties settings) are kept as text.
+SCHEMA = {
+    "allocated_ram": "memory",
+    "server_name": "str",
+    "server-ip": "str",
+    "server-port": "int",
+    "server-properties-profile": tuple(PROFILES),
+    "jvm-profile": ("auto", *JVM_PROFILES),
+    "jvm-large-pages": "bool",
+    "jvm-flags": "str",
+    "java-path": "path",
+    "gc-logging": "bool",
+    "gc-long-pause": "positive",
+    "class-sharing": "bool",
+    "server-cpus": "cpus",
+    "server-cpu-count": "int",
+    "mcsm-cpus": "cpus",
+
+    "backups": "bool",
+    "backups-cooldown": "duration",
+    "backups-notify": "bool",
+    "backups-path": "path",
+    "backups-mode": ("tarball", "snapshot"),
+    "backups-format": ("tar.gz", "zip"),
+    "backups-keep-last": "int",
+    "backups-keep-hourly": "int",
+    "backups-keep-daily": "int",
+    "backups-keep-weekly": "int",
+    "backups-keep-monthly": "int",
+    "backups-quota": "size",
+    "backups-min-free-space": "size",
+    "backups-exclude": "list",
+    "backups-include": "list",
+    "backups-skip-unchanged": "bool",
+    "backups-force-after-skips": "int",
+
+    "playerdata-backups": "bool",
+    "playerdata-backups-cooldown": "duration",
+    "playerdata-backups-notify": "bool",
+    "playerdata-backups-path": "path",
+    "playerdata-backups-mode": ("archive", "pack"),
+    "playerdata-backups-combine": "bool",
+    "playerdata-backups-format": ("tar.gz", "zip"),
+    "playerdata-backups-keep-last": "int",
+    "playerdata-backups-keep-hourly": "int",
+    "playerdata-backups-keep-daily": "int",
+    "playerdata-backups-keep-weekly": "int",
+    "playerdata-backups-keep-monthly": "int",
+    "playerdata-backups-quota": "size",
+    "playerdata-backups-min-free-space": "size",
+    "playerdata-backups-skip-unchanged": "bool",
+    "playerdata-backups-force-after-skips": "int",
+
+    "backups-io-class": ("idle", "best-effort", "none"),
+    "backups-io-level": "int",
+    "backups-niceness": "int",
+    "backups-rate-limit": "size",
+    "backups-adaptive-throttle": "bool",
+    "backups-worker-process": "bool",
+
+    "verify-workers": "int",
+    "verify-rate-limit": "size",
+}
+
+# The seconds in every unit a duration can be given in. Durations without a unit are in minutes.
+DURATION_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# Settings only read when the server starts, so they take a restart of the server to change.
+# Settings that aren't in the schema are copied into server.properties when starting, so they do as well.
+RESTART_SETTINGS = ["allocated_ram", "server_name", "server-ip", "server-port", "server-properties-profile",
+                    "jvm-profile", "jvm-large-pages", "jvm-flags", "java-path",
+                    "gc-logging", "gc-long-pause", "class-sharing",
+                    "server-cpus", "server-cpu-count", "mcsm-cpus"]
+
+# The inotify events that mean the config file was saved. (IN_CLOSE_WRITE, and IN_MOVED_TO
+# for the editors that save into a copy and move it over the file)
+INOTIFY_SAVES = 0x008 | 0x080
+
+# The amount of seconds between every check of the config file, where inotify isn't available.
+POLL_INTERVAL = 5
+
+# Editors may save in more than one write, so the file is only read once it settled for this long.
+SETTLE_SECONDS = 0.5
 
 
 class MCSMConfig:
     """
-    This class implements a way to retrieve the mcsm settings in the
-    config file in a dictionary, ready to be used.
-    This class parents MCSMPlayerdataBackups, MCSMServer and MCSMBackups
+    This class implements the configuration of the MCSM. The config.mcsm file is parsed once,
+    checked against the schema, and turned into an immutable snapshot of typed settings, which
+    is shared by every component. Settings missing from the file take their default from the template.
+    While the server runs, the file is watched, and the settings that change are passed to the
+    subscribers. Settings that can't change while the server runs wait for the next restart.
     """
 
-
     def __init__(self, logger: MCSMLogger):
         self.__server_files_path = os.path.join(os.getcwd(), "server_files")
         self.config_path = os.path.join(self.__server_files_path, "config.mcsm")
         self.__logger = logger
+        self.__template = None
+        self.__subscribers = list()
+        self.__lock = threading.Lock()
         self.__ensure_config_existance()
+        self.settings = self.load_settings()
+        self.__started_settings = self.settings
+
+        # The settings that changed, but only apply after a restart.
+        self.pending_restart = set()
 
 
     def load_settings(self):
         """
-        Parses the settings config file into a dictionary to be used in the server run.
-        :return:
+        Parses the settings config file, converting every setting into its type.
+        :return: MCSMSettings
+        :raises InvalidConfig: If any setting has a value it can't take, listing every one of them.
         """
         with open(self.config_path, "r") as config_file:
-            settings = config_file.readlines()
-
-        # Ignores any "#" or "//" starting lines or any empty strings in the lines.
-        filtered_settings = [setting.strip() for setting in settings
-                             if not setting.startswith("#")
-                             and not setting.startswith("//")
-                             and setting.strip() != ""]
-
-        # Creates the dictionary by splitting the settings by the "="
-        # and assigning the leftmost part to the value, and the rightmost to the key.
-        settings_dictionary = dict()
-        for setting in filtered_settings:
-            key_value_setting = setting.split("=")
-
-            if key_value_setting[0].strip().lower() == "server-port":  # Server port needs to be an integer.
-                settings_dictionary[key_value_setting[0].strip().lower()] = int(key_value_setting[-1].strip())
+            raw_values = self.parse(config_file.read())
+
+        # Config files made by older versions don't have the newer settings. Empty numbers and switches are unset too.
+        # (Empty cores mean every core)
+        missing = [key for key in SCHEMA if key not in raw_values
+                   or raw_values[key] == "" and SCHEMA[key] not in ("str", "path", "list", "cpus")]
+        if missing:
+            defaults = self.parse(self.__get_template())
+            raw_values.update({key: defaults[key] for key in missing if key in defaults})
+            self.__logger.log(f"Using the default values of {', '.join(key.upper() for key in missing)}, "
+                              f"since they aren't set in config.mcsm.", console=False)
+
+        values, problems = dict(), list()
+        for key, raw_value in raw_values.items():
+            try:
+                values[key] = self.convert(SCHEMA.get(key, "str"), raw_value)
+            except ValueError as error:
+                problems.append(f"{key.upper()}={raw_value} is invalid, {error}.")
+
+        problems += [f"{key.upper()} is missing, and the template has no default for it."
+                     for key in SCHEMA if key not in raw_values]
+
+        if problems:
+            raise InvalidConfig(f"The config file at {self.config_path} has invalid settings:\n" + "\n".join(problems))
+
+        return MCSMSettings(values, raw_values)
+
+
+    def subscribe(self, subscriber):
+        """
+        Adds a function to be called with the new settings whenever config.mcsm changes.
+        :param subscriber: The function, taking the new settings and the set of the names of the settings
+        that changed. It returns the changed settings it couldn't apply, if any, which wait for a restart.
+        :return:
+        """
+        self.__subscribers.append(subscriber)
+
+
+    def watch(self):
+        """
+        Starts watching config.mcsm in the background, reloading it whenever it is saved.
+        Uses inotify where it is available, and checks the file every few seconds otherwise.
+        :return: Boolean, True if the file is watched through inotify.
+        """
+        library = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(library, use_errno=True) if library else None
+        inotify = libc.inotify_init1(os.O_CLOEXEC) if libc is not None and hasattr(libc, "inotify_init1") else -1
+
+        # The folder is watched, since editors may replace the file instead of writing into it.
+        if inotify >= 0 and libc.inotify_add_watch(inotify, os.fsencode(self.__server_files_path), INOTIFY_SAVES) < 0:
+            os.close(inotify)
+            inotify = -1
+
+        threading.Thread(target=self.__watch, args=(inotify if inotify >= 0 else None,), daemon=True).start()
+        self.__logger.log(f"Watching config.mcsm for changes through {'inotify' if inotify >= 0 else 'polling'}.",
+                          console=False)
+        return inotify >= 0
+
+
+    def reload(self):
+        """
+        Parses config.mcsm again, and passes the settings that changed to the subscribers.
+        A config file that can't be parsed is reported and ignored, so the running settings stay as they were.
+        :return: Set, containing the names of the settings that changed.
+        """
+        with self.__lock:
+            try:
+                settings = self.load_settings()
+            except (InvalidConfig, OSError, UnicodeDecodeError) as error:
+                self.__logger.log(f"config.mcsm was changed, but the changes can't be applied. "
+                                  f"The current settings are kept until it is fixed.\n{error}", level="CONFIG/WARN")
+                return set()
+
+            previous = self.settings
+            changed = {key for key in set(settings) | set(previous) if settings.get(key) != previous.get(key)}
+            if not changed: return changed
+
+            self.settings = settings
+            deferred = {key for key in changed if key in RESTART_SETTINGS or key not in SCHEMA}
+
+            for subscriber in self.__subscribers:
+                try:
+                    deferred.update(subscriber(settings, changed) or ())
+                except Exception:
+                    self.__logger.log(f"Couldn't apply the new settings.\n{traceback.format_exc()}",
+                                      level="CONFIG/ERROR")
+
+            for key in sorted(changed):
+                self.__logger.log(f"{key.upper()} changed from \"{previous.raw(key) if key in previous else ''}\" to "
+                                  f"\"{settings.raw(key) if key in settings else ''}\".", level="CONFIG/INFO",
+                                  console=False)
+
+            # A setting changed back to the value the server started with doesn't need the restart anymore.
+            self.pending_restart = {key for key in self.pending_restart | deferred
+                                    if settings.get(key) != self.__started_settings.get(key)}
+
+            waiting = deferred & self.pending_restart
+
+        applied = sorted(key.upper() for key in changed - deferred)
+        if applied:
+            self.__logger.log(f"Applied the new settings of {', '.join(applied)}.", level="CONFIG/INFO")
+        if waiting:
+            self.__logger.log(f"{', '.join(sorted(key.upper() for key in waiting))} will only change once the "
+                              f"server is restarted.", level="CONFIG/WARN")
+
+        return changed
+
+
+    @staticmethod
+    def parse(text: str):
+        """
+        Parses the text of a config file into a dictionary.
+        Lines starting with "#" or "//", and lines without a "=", are ignored.
+        :param text: The text of the config file.
+        :return: Dictionary, mapping the lowercase name of every setting to its text.
+        """
+        settings = dict()
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith(("#", "//")) or "=" not in line: continue
+
+            key, _, value = line.partition("=")
+            settings[key.strip().lower()] = value.strip()
+
+        return settings
+
+
+    @staticmethod
+    def convert(kind, value: str):
+        """
+        Converts the text of a setting into its type.
+        :param kind: The type of the setting, as given in the schema.
+        :param value: The text of the setting.
+        :return: The typed value. Durations are in seconds, and sizes (given in megabytes) in bytes.
+        Memory is kept in megabytes, or as "auto". Cores are kept as a tuple, as "auto", or as None if empty.
+        :raises ValueError: If the text isn't a value of that type, describing what was expected.
+        """
+        if isinstance(kind, tuple):
+            if value.lower() not in kind: raise ValueError(f"expected one of {', '.join(kind)}")
+            return value.lower()
+
+        if kind == "bool":
+            if value.lower() not in ("true", "false"): raise ValueError("expected True or False")
+            return value.lower() == "true"
+
+        if kind == "int":
+            if not re.fullmatch(r"-?\d+", value): raise ValueError("expected a whole number")
+            return int(value)
+
+        if kind == "positive":
+            if not re.fullmatch(r"\d+", value) or int(value) < 1: raise ValueError("expected a whole number above 0")
+            return int(value)
+
+        if kind == "memory":
+            if value.lower() == "auto": return "auto"
+            if not re.fullmatch(r"\d+", value): raise ValueError("expected an amount of megabytes, or auto")
+            return int(value)
+
+        if kind == "cpus":
+            if value.lower() == "auto": return "auto"
+            return MCSMAffinity.parse_cpus(value) if value else None
+
+        if kind == "size":
+            if not re.fullmatch(r"\d+(\.\d+)?", value): raise ValueError("expected an amount of megabytes")
+            return int(float(value) * 1024 * 1024)
+
+        if kind == "duration":
+            match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smhd]?)", value.lower())
+            if not match: raise ValueError("expected an amount of minutes, or of another unit (e.g. 30s, 2h or 1d)")
+            return float(match.group(1)) * DURATION_UNITS[match.group(2) or "m"]
+
+        if kind == "path":
+            return os.path.abspath(os.path.expanduser(value)) if value else None
+
+        if kind == "list":
+            return tuple(item.strip() for item in value.split(",") if item.strip())
+
+        return value
+
+
+    def __watch(self, inotify: int = None):
+        """
+        Reloads config.mcsm whenever it is saved. This method never returns, so it should be run in a daemon thread.
+        :param inotify: The inotify file descriptor watching the server files, or None to check the file instead.
+        :return:
+        """
+        last_state = self.__get_file_state()
+
+        while True:
+            if inotify is None:
+                time.sleep(POLL_INTERVAL)
             else:
-                # Everything else can be a string.
-                settings_dictionary[key_value_setting[0].strip().lower()] = str(key_value_setting[-1].strip())
+                self.__wait_for_save(inotify)
 
-        return settings_dictionary
+            time.sleep(SETTLE_SECONDS)
+            state = self.__get_file_state()
+            if state == last_state: continue
 
+            last_state = state
+            try:
+                self.reload()
+            except Exception:
+                self.__logger.log(f"Couldn't reload config.mcsm.\n{traceback.format_exc()}", level="CONFIG/ERROR")
 
-    def __get_config_file(self):
+
+    @staticmethod
+    def __wait_for_save(inotify: int):
         """
-        Gets the config template from github.
+        Waits for the config file to be saved.
+        :param inotify: The inotify file descriptor watching the server files.
         :return:
         """
+        while True:
+            events = os.read(inotify, 64 * 1024)
+            offset = 0
+
+            while offset < len(events):
+                watch, mask, cookie, length = struct.unpack_from("iIII", events, offset)
+                name = events[offset + 16:offset + 16 + length].rstrip(b"\0")
+                offset += 16 + length
+                if name == b"config.mcsm": return
+
+
+    def __get_file_state(self):
+        """
+        Gets the modification time and size of the config file, to tell if it changed.
+        :return: Tuple, containing the modification time and the size, or None if the file doesn't exist.
+        """
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size
+
 
-        config_template_url = "https://github.com/MrKelpy/MCSMs/blob/master/resources/CONFIG_TEMPLATE3.0.txt"
-        self.__logger.log(f"Getting config template from {config_template_url}")
-        data = requests.get(config_template_url)
-        soup = BeautifulSoup(data.text, "html.parser")
-        config_template = ""
+    def __get_template(self):
+        """
+        Gets the config template, from the copy bundled into the MCSM, or the one in the repository.
+        It is never downloaded, so the MCSM starts without an internet connection.
+        :return: String, the text of the template.
+        :raises FatalException: If the template isn't found, which means the MCSM wasn't built with it.
+        """
+        if self.__template is not None: return self.__template
 
-        for line in soup.find_all("tr"):
-            config_template += f"{line.text.strip()}\n"
+        # Frozen builds unpack the bundled files into sys._MEIPASS.
+        module_folder = os.path.dirname(os.path.abspath(__file__))
+        for template_path in [os.path.join(getattr(sys, "_MEIPASS", module_folder), TEMPLATE_NAME),
+                              os.path.join(module_folder, os.pardir, os.pardir, "resources", TEMPLATE_NAME)]:
+            if os.path.isfile(template_path):
+                with open(template_path, "r") as template_file:
+                    self.__template = template_file.read()
+                return self.__template
 
-        return config_template
+        raise FatalException(f"The config template ({TEMPLATE_NAME}) wasn't bundled with the MCSM. "
+                             f"Build it with the generator, which bundles it, or run it from the repository.")
 
 
     def __ensure_config_existance(self):
@@ -84,11 +410,11 @@ class MCSMConfig:
         :return:
         """
 
-        # Checks if the config.mcsm file exists. If not, check the template on GitHub
-        # and create the file.
+        # Checks if the config.mcsm file exists. If not, create it from the template.
         if not os.path.isfile(self.config_path):
-            config_template = self.__get_config_file()
+            config_template = self.__get_template()
+            os.makedirs(self.__server_files_path, exist_ok=True)
 
             with open(self.config_path, "w") as config_file:
                 self.__logger.log(f"Creating mcsm.config file at {self.config_path}")
-                config_file.write(config_template)
\ No newline at end of file
+                config_file.write(config_template)
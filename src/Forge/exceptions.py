@@ -19,4 +19,32 @@ class ImpossibleDownload(BaseException):
 class FatalException(BaseException):
     """
     This exception is invoked whenenver a fatal error happens.
-    """
\ No newline at end of file
+    """
+
+
+class CorruptBackup(BaseException):
+    """
+    This exception is invoked whenever a backup can't be
+    read, or its contents don't match their saved hashes.
+    """
+
+
+class ArchiveWorkerError(Exception):
+    """
+    This exception is invoked whenever the process archiving a
+    backup fails, carrying the traceback it failed with.
+    """
+
+
+class InvalidConfig(BaseException):
+    """
+    This exception is invoked whenever the config file has
+    settings with values they can't take.
+    """
+
+
+class NoSuitableJava(BaseException):
+    """
+    This exception is invoked whenever no Java runtime
+    found can run the version of the server.
+    """
@@ -0,0 +1,415 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from datetime import datetime
+import atexit
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+if sys.platform != "win32":
+    import fcntl
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+from MCSMSettings import MCSMSettings
+
+
+# The registry of the MCSMs running on this machine, and the cores each one took, shared between all of them.
+REGISTRY_PATH = os.path.join(tempfile.gettempdir(), "MCSM-instances.json")
+
+# The fewest cores a server is pinned to in auto mode. With less, it is left to use every core.
+MINIMUM_SERVER_CPUS = 2
+
+# The amount of cores there are for every core the MCSM gets in auto mode, always getting at least one.
+CPUS_PER_MCSM_CPU = 16
+
+# The most times the threads of a launched server are gone through, moving the ones on other cores.
+PIN_ATTEMPTS = 10
+
+
+class MCSMAffinity:
+    """
+    This class implements the CPU layout of the server and the MCSM, keeping the server on its own cores,
+    and the MCSM (its console, the backups and their worker processes) on others, so the backups don't
+    take CPU time from the server's ticks. Every MCSM running on the machine takes its cores from a shared
+    registry, so servers started in auto mode don't end up on the cores of one another. Only works on Linux.
+    """
+
+    def __init__(self, logger: MCSMLogger, settings: MCSMSettings):
+        self.__logger = logger
+        self._settings = settings
+        self.__server_files_path = os.path.join(os.getcwd(), "server_files")
+        self.__available = sorted(os.sched_getaffinity(0)) if self.is_supported() else list()
+        self.server_cpus = None
+        self.mcsm_cpus = None
+        self.__registered = False
+
+
+    @staticmethod
+    def is_supported():
+        """
+        Checks if the cores of a process can be set on this system.
+        :return: Boolean, True if they can.
+        """
+        return hasattr(os, "sched_setaffinity")
+
+
+    def apply(self):
+        """
+        Picks the cores of the server and of the MCSM, registering them for the other MCSMs to see, and moves
+        the MCSM onto its cores. Should be called before the MCSM starts its threads, since they keep the cores
+        of the thread that started them. The server is moved onto its cores once launched, through pin_process.
+        :return: Boolean, True if the server or the MCSM were given cores.
+        """
+        wanted = self._settings["server-cpus"] or self._settings["mcsm-cpus"] not in (None, "auto")
+        if not wanted: return False
+
+        if not self.is_supported():
+            self.__logger.log("SERVER-CPUS and MCSM-CPUS only work on Linux, so every core is used.", level="WARN")
+            return False
+
+        with self.__lock_registry():
+            registry = [instance for instance in self.__load_registry() if instance["pid"] != os.getpid()]
+            self.__allocate(registry)
+            self.__save_registry(registry + [self.__get_entry()])
+
+        self.__registered = True
+        atexit.register(self.__unregister)
+
+        if self.mcsm_cpus:
+            # Every thread running so far is moved, along with the main thread, since each has its own cores.
+            for thread_id in self.__get_threads(os.getpid()):
+                with contextlib.suppress(OSError):
+                    os.sched_setaffinity(thread_id, self.mcsm_cpus)
+
+        if self.server_cpus is None and self.mcsm_cpus is None: return False
+
+        describe = lambda cpus: f"the cores {self.format_cpus(cpus)}" if cpus else "every core"
+        self.__logger.log(f"The server runs on {describe(self.server_cpus)}, and the MCSM with the backups "
+                          f"on {describe(self.mcsm_cpus)}.", level="INFO")
+        return True
+
+
+    def pin_process(self, pid: int):
+        """
+        Moves a launched server process onto the cores of the server. Every thread of the process has its own
+        cores, so they are all moved, until no thread is found on other cores. (The JVM keeps starting threads
+        while it loads, and they start on the cores of the thread that started them)
+        The process isn't moved from inside Popen (preexec_fn), since that can deadlock while the MCSM runs threads.
+        :param pid: The process id of the server.
+        :return:
+        """
+        if not self.server_cpus and not self.mcsm_cpus: return
+
+        # Without cores of its own, the server is still taken off the cores the MCSM was moved onto.
+        cpus = set(self.server_cpus or self.__available)
+        for _ in range(PIN_ATTEMPTS):
+            moved = False
+
+            for thread_id in self.__get_threads(pid):
+                # Threads may exit while they are moved.
+                with contextlib.suppress(OSError):
+                    if os.sched_getaffinity(thread_id) == cpus: continue
+                    os.sched_setaffinity(thread_id, cpus)
+                    moved = True
+
+            if not moved: return
+
+
+    def register_server(self, pid: int):
+        """
+        Keeps the process id of the server in the registry, so its usage can be shown by the status command.
+        :param pid: The process id of the server.
+        :return:
+        """
+        if not self.__registered: return
+
+        with self.__lock_registry():
+            registry = self.__load_registry()
+            for instance in registry:
+                if instance["pid"] == os.getpid(): instance["server_pid"] = pid
+            self.__save_registry(registry)
+
+
+    @classmethod
+    def get_instances(cls):
+        """
+        Gets the MCSMs running on this machine, from the registry.
+        :return: List, containing a dictionary with the process ids, cores and name of the server of every MCSM.
+        """
+        if not cls.is_supported(): return list()
+
+        with cls.__lock_registry():
+            return cls.__load_registry()
+
+
+    @classmethod
+    def measure(cls, pids: list, interval: float = 1.0):
+        """
+        Measures the usage of every core of the machine, and of every process given, over some time.
+        :param pids: The process ids to measure.
+        :param interval: The amount of seconds to measure for.
+        :return: Tuple, containing a dictionary with the usage of every core, and one with the usage of every
+        process still running, both as percentages of a single core.
+        """
+        cores_before, processes_before = cls.__read_cores(), {pid: cls.__read_process(pid) for pid in pids}
+        time.sleep(interval)
+        cores_after, processes_after = cls.__read_cores(), {pid: cls.__read_process(pid) for pid in pids}
+
+        cores = dict()
+        for cpu, (busy, total) in cores_after.items():
+            if cpu not in cores_before or total <= cores_before[cpu][1]: continue
+            cores[cpu] = round((busy - cores_before[cpu][0]) / (total - cores_before[cpu][1]) * 100, 1)
+
+        # Process times are counted in clock ticks.
+        ticks = os.sysconf("SC_CLK_TCK") * interval
+        processes = {pid: round((processes_after[pid] - processes_before[pid]) / ticks * 100, 1) for pid in pids
+                     if processes_before[pid] is not None and processes_after[pid] is not None}
+        return cores, processes
+
+
+    @staticmethod
+    def parse_cpus(value: str):
+        """
+        Parses a list of cores, as written in the settings and by Linux. (e.g. "0-3,8")
+        :param value: The list of cores.
+        :return: Tuple, containing every core, sorted.
+        :raises ValueError: If the text isn't a list of cores.
+        """
+        cpus = set()
+        for part in value.replace(" ", "").split(","):
+            first, _, last = part.partition("-")
+            if not first.isdigit() or (last and not last.isdigit()) or int(last or first) < int(first):
+                raise ValueError(f"\"{part}\" isn't a core, or a range of cores")
+            cpus.update(range(int(first), int(last or first) + 1))
+
+        return tuple(sorted(cpus))
+
+
+    @staticmethod
+    def format_cpus(cpus):
+        """
+        Formats a list of cores the way they are written in the settings, joining the consecutive ones.
+        :param cpus: The cores, or None if there are none.
+        :return: String, the formatted cores, or "-" if there are none.
+        """
+        if not cpus: return "-"
+
+        ranges = list()
+        for cpu in sorted(cpus):
+            if ranges and ranges[-1][1] == cpu - 1: ranges[-1][1] = cpu
+            else: ranges.append([cpu, cpu])
+
+        return ",".join(f"{first}-{last}" if last > first else str(first) for first, last in ranges)
+
+
+    def __allocate(self, registry: list):
+        """
+        Picks the cores of the server and of the MCSM from the settings, leaving out the cores the servers
+        of the other MCSMs run on. The MCSMs share their cores, since the backups run with a lower priority.
+        :param registry: The other MCSMs running.
+        :return:
+        """
+        taken = {cpu for instance in registry for cpu in instance["server_cpus"] or ()}
+        shared = [cpu for instance in registry for cpu in instance["mcsm_cpus"] or () if cpu in self.__available]
+        server_setting, mcsm_setting = self._settings["server-cpus"], self._settings["mcsm-cpus"]
+
+        mcsm = self.__check(mcsm_setting, "MCSM-CPUS") if isinstance(mcsm_setting, tuple) else None
+        server = None
+
+        if server_setting == "auto":
+            free = [cpu for cpu in self.__available if cpu not in taken and cpu not in (mcsm or ())]
+
+            # The MCSM keeps to the cores of the other MCSMs, if any, or the last ones otherwise.
+            reserved = list()
+            if mcsm_setting == "auto":
+                reserved = sorted(set(shared)) or free[-max(len(self.__available) // CPUS_PER_MCSM_CPU, 1):]
+            free = [cpu for cpu in free if cpu not in reserved]
+
+            if len(free) < MINIMUM_SERVER_CPUS:
+                self.__logger.log(f"Only {len(free)} cores are left for the server, after the other servers and "
+                                  f"the MCSM, so it wasn't given cores of its own. Set SERVER-CPU-COUNT on the "
+                                  f"other servers to leave cores for this one.", level="WARN")
+            else:
+                server = tuple(free[:self._settings["server-cpu-count"] or len(free)])
+
+        elif isinstance(server_setting, tuple):
+            server = self.__check(server_setting, "SERVER-CPUS")
+            overlap = set(server or ()) & taken
+            if overlap:
+                self.__logger.log(f"The cores {self.format_cpus(overlap)} in SERVER-CPUS are already used by another "
+                                  f"server, so both will be slower.", level="WARN")
+
+        if mcsm_setting == "auto" and server:
+            spare = [cpu for cpu in self.__available if cpu not in server and cpu not in taken]
+            preferred = [cpu for cpu in spare if cpu in shared]
+            mcsm = tuple(preferred or spare[-max(len(self.__available) // CPUS_PER_MCSM_CPU, 1):]) or None
+            if not mcsm:
+                self.__logger.log("There are no cores left for the MCSM after the servers, so it runs on every core.",
+                                  level="WARN")
+
+        elif mcsm and server and set(mcsm) & set(server):
+            self.__logger.log("MCSM-CPUS and SERVER-CPUS share cores, so the backups will still slow down the server.",
+                              level="WARN")
+
+        self.server_cpus, self.mcsm_cpus = server, mcsm
+
+
+    def __check(self, cpus: tuple, setting: str):
+        """
+        Leaves out the cores of a setting the MCSM can't run on. (e.g. cores the machine doesn't have)
+        :param cpus: The cores.
+        :param setting: The name of the setting, for the warnings.
+        :return: Tuple, containing the cores left, or None if none are.
+        """
+        missing = [cpu for cpu in cpus if cpu not in self.__available]
+        if missing:
+            self.__logger.log(f"The cores {self.format_cpus(missing)} in {setting} can't be used, since they aren't "
+                              f"available to the MCSM. (available: {self.format_cpus(self.__available)})", level="WARN")
+
+        return tuple(cpu for cpu in cpus if cpu in self.__available) or None
+
+
+    def __get_entry(self):
+        """
+        Gets how this MCSM appears in the registry.
+        :return: Dictionary, containing its process id, the folder and name of its server, and their cores.
+        """
+        return {"pid": os.getpid(), "server_pid": None, "folder": self.__server_files_path,
+                "name": self._settings["server_name"], "started": datetime.now().isoformat(timespec="seconds"),
+                "server_cpus": list(self.server_cpus) if self.server_cpus else None,
+                "mcsm_cpus": list(self.mcsm_cpus) if self.mcsm_cpus else None}
+
+
+    def __unregister(self):
+        """
+        Takes this MCSM out of the registry, freeing its cores for the other MCSMs.
+        :return:
+        """
+        with self.__lock_registry():
+            self.__save_registry([instance for instance in self.__load_registry() if instance["pid"] != os.getpid()])
+
+
+    @staticmethod
+    @contextlib.contextmanager
+    def __lock_registry():
+        """
+        Holds the lock of the registry, so two MCSMs starting at once don't pick the same cores.
+        The lock is released by the system if the MCSM holding it dies.
+        :return:
+        """
+        with open(REGISTRY_PATH + ".lock", "a") as lock_file:
+            fcntl.lockf(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+    @classmethod
+    def __load_registry(cls):
+        """
+        Loads the registry, leaving out the MCSMs that stopped without taking themselves out of it.
+        Must be called while holding the lock.
+        :return: List, containing every MCSM running.
+        """
+        try:
+            with open(REGISTRY_PATH, "r") as registry_file:
+                registry = json.load(registry_file)
+        except (OSError, ValueError):
+            return list()
+
+        return [instance for instance in registry if cls.__is_running(instance["pid"])]
+
+
+    @staticmethod
+    def __save_registry(registry: list):
+        """
+        Saves the registry. Must be called while holding the lock.
+        :param registry: Every MCSM running.
+        :return:
+        """
+        temporary_path = f"{REGISTRY_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w") as registry_file:
+            json.dump(registry, registry_file, indent=4)
+
+        os.replace(temporary_path, REGISTRY_PATH)
+
+
+    @staticmethod
+    def __is_running(pid: int):
+        """
+        Checks if a process is running.
+        :param pid: The process id.
+        :return: Boolean, True if it is running.
+        """
+        try:
+            os.kill(pid, 0)
+        except PermissionError:
+            return True
+        except OSError:
+            return False
+
+        return True
+
+
+    @staticmethod
+    def __get_threads(pid: int):
+        """
+        Gets the threads of a process, from /proc.
+        :param pid: The process id.
+        :return: List, containing the id of every thread, or only the process id if they can't be read.
+        """
+        try:
+            return [int(thread_id) for thread_id in os.listdir(f"/proc/{pid}/task")]
+        except (OSError, ValueError):
+            return [pid]
+
+
+    @staticmethod
+    def __read_cores():
+        """
+        Reads the time every core spent busy and in total, from /proc/stat.
+        :return: Dictionary, mapping every core to a tuple containing its busy and total time, in clock ticks.
+        """
+        cores = dict()
+        try:
+            with open("/proc/stat", "r") as stat_file:
+                lines = [line.split() for line in stat_file if line.startswith("cpu") and line[3].isdigit()]
+        except OSError:
+            return cores
+
+        # The fourth and fifth times are the idle time and the time waiting on the disk.
+        for line in lines:
+            times = [int(value) for value in line[1:9]]
+            cores[int(line[0][3:])] = (sum(times) - times[3] - times[4], sum(times))
+
+        return cores
+
+
+    @staticmethod
+    def __read_process(pid: int):
+        """
+        Reads the CPU time a process spent, along with all its threads, from /proc.
+        :param pid: The process id.
+        :return: Integer, the user and system time in clock ticks, or None if the process isn't running.
+        """
+        try:
+            with open(f"/proc/{pid}/stat", "r") as stat_file:
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            return None
+
+        # The fields after the name start from the third, so utime and stime (the 14th and 15th) are 11th and 12th.
+        return int(fields[11]) + int(fields[12])
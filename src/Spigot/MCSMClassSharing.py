@@ -0,0 +1,139 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import contextlib
+import hashlib
+import json
+import os
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+
+
+# The oldest Java that can write a class sharing archive of the classes the server loaded, when it stops.
+DYNAMIC_ARCHIVE_JAVA = 13
+
+
+class MCSMClassSharing:
+    """
+    This class implements the class data sharing archive of the server, which keeps the classes loaded
+    and verified by a run of the server, so the next ones start without loading them again.
+    The archive is written when the server stops the first time, and used by every run after it, until
+    the server jar, its libraries, the Java runtime or the JVM flags change, when it is written again.
+    """
+
+    def __init__(self, logger: MCSMLogger, runtime: dict, jar_path: str, library_folders: list):
+        self.__logger = logger
+        self.__runtime = runtime
+        self.__jar_path = jar_path
+        self.__library_folders = library_folders
+        self.archive_path = os.path.join(os.path.dirname(jar_path), "MCSM-Runtime", "classes.jsa")
+        self.__fingerprint_path = self.archive_path + ".json"
+        self.__fingerprint = None
+
+        # "on" when the archive is used, "dumping" when it is being written, and "off" when it can't be.
+        self.mode = "off"
+
+
+    def get_flags(self, jvm_flags: list):
+        """
+        Gets the flags that use the archive, or write it if there is no archive for this server yet.
+        :param jvm_flags: The other JVM flags the server is launched with, since the archive only fits them.
+        :return: List, containing the flags.
+        """
+        if self.__runtime["major"] < DYNAMIC_ARCHIVE_JAVA:
+            self.mode = "off"
+            return []
+
+        self.__fingerprint = self.get_fingerprint(jvm_flags)
+        archive_path = os.path.relpath(self.archive_path, os.path.dirname(self.__jar_path))
+
+        if os.path.isfile(self.archive_path) and self.__load_fingerprint() == self.__fingerprint:
+            self.mode = "on"
+            return [f"-XX:SharedArchiveFile={archive_path}"]
+
+        # An archive of another jar, runtime or flags would be refused by the JVM anyway.
+        if os.path.isfile(self.archive_path):
+            self.__logger.log("The server jar, its libraries, Java or the JVM flags changed since the class sharing "
+                              "archive was written, so it will be written again when the server stops.", console=False)
+        self.__remove()
+
+        os.makedirs(os.path.dirname(self.archive_path), exist_ok=True)
+        self.mode = "dumping"
+        return [f"-XX:ArchiveClassesAtExit={archive_path}"]
+
+
+    def finish(self):
+        """
+        Keeps the archive written by the run that just stopped, so the next runs use it.
+        :return: Boolean, True if an archive was written.
+        """
+        if self.mode != "dumping": return False
+
+        # The JVM only writes the archive when it stops normally. (e.g. through the "stop" command)
+        if not os.path.isfile(self.archive_path):
+            self.__logger.log("The server didn't stop normally, so the class sharing archive wasn't written. "
+                              "It will be written the next time it is stopped.", console=False)
+            return False
+
+        with open(self.__fingerprint_path, "w") as fingerprint_file:
+            json.dump({"fingerprint": self.__fingerprint, "java": self.__runtime["version"]}, fingerprint_file)
+
+        self.__logger.log(f"Written the class sharing archive at '{self.archive_path}' "
+                          f"({round(os.path.getsize(self.archive_path) / (1024 * 1024), 1)} MB), "
+                          f"the next starts will load the server's classes from it.")
+        return True
+
+
+    def get_fingerprint(self, jvm_flags: list):
+        """
+        Gets a fingerprint of everything the archive depends on: the Java runtime, the server jar,
+        the files in the library folders, and the JVM flags. Files are told apart by their size and
+        modification time, so the libraries aren't read every time the server starts.
+        :param jvm_flags: The JVM flags the server is launched with.
+        :return: String, the fingerprint.
+        """
+        files = [self.__jar_path]
+        for library_folder in self.__library_folders:
+            for folder, folders, names in os.walk(os.path.join(os.path.dirname(self.__jar_path), library_folder)):
+                folders.sort()
+                files += [os.path.join(folder, name) for name in sorted(names)]
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self.__runtime["path"], self.__runtime["version"], self.__runtime["vm"],
+                                  sorted(jvm_flags)]).encode())
+        for path in files:
+            with contextlib.suppress(OSError):
+                stat = os.stat(path)
+                digest.update(f"{os.path.relpath(path, os.path.dirname(self.__jar_path))}"
+                              f"\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+
+        return digest.hexdigest()
+
+
+    def __load_fingerprint(self):
+        """
+        Loads the fingerprint of the archive.
+        :return: String, the fingerprint, or None if there is none.
+        """
+        try:
+            with open(self.__fingerprint_path, "r") as fingerprint_file:
+                return json.load(fingerprint_file)["fingerprint"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+    def __remove(self):
+        """
+        Deletes the archive, and its fingerprint.
+        :return:
+        """
+        for path in [self.archive_path, self.__fingerprint_path]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
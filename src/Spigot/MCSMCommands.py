@@ -0,0 +1,478 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from datetime import datetime
+import argparse
+import json
+import os
+import shutil
+import time
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+from MCSMSettings import MCSMSettings
+from MCSMCatalog import MCSMCatalog
+from MCSMArchive import MCSMArchive
+from MCSMVerifier import MCSMVerifier
+from MCSMPlayerPack import MCSMPlayerPack
+from MCSMPathRules import MCSMPathRules
+from MCSMRestorer import MCSMRestorer
+from MCSMAffinity import MCSMAffinity
+
+
+class MCSMCommands:
+    """
+    This class implements the commands that can be run instead of starting the server,
+    such as listing the backups or restoring the world from them.
+    (e.g. "MCSM.exe restore --time '19/10/2026 12:00:00'")
+    The settings are given as the snapshot loaded by MCSMConfig.
+    """
+
+    def __init__(self, logger: MCSMLogger, settings: MCSMSettings):
+        self.__logger = logger
+        self._server_files_path = os.path.join(os.getcwd(), "server_files")
+        self._settings = settings
+        self.__catalog = MCSMCatalog(self._server_files_path)
+        self.__parser = self.__build_parser()
+
+
+    def run(self, arguments: list):
+        """
+        Parses the command line arguments and runs the command they ask for.
+        :param arguments: The command line arguments, without the program name.
+        :return:
+        """
+        arguments = self.__parser.parse_args(arguments)
+        commands = {
+            "list": self.__list,
+            "restore": self.__restore,
+            "verify": self.__verify,
+            "restore-player": self.__restore_player,
+            "dry-run": self.__dry_run,
+            "status": self.__status,
+        }
+
+        commands[arguments.command](arguments)
+
+
+    def __build_parser(self):
+        """
+        Builds the parser for the command line arguments.
+        :return: argparse.ArgumentParser
+        """
+        parser = argparse.ArgumentParser(prog="MCSM", description="Runs a command instead of starting the server.")
+        subparsers = parser.add_subparsers(dest="command", required=True)
+
+        list_parser = subparsers.add_parser("list", help="Lists the backups, or the files inside a backup.")
+        list_parser.add_argument("--backup", help="The backup to list the files of.")
+        list_parser.add_argument("--kind", choices=MCSMCatalog.ROOTS.keys(), help="Only list backups of this type.")
+        list_parser.add_argument("--history", action="store_true", help="Also list the backups that were removed.")
+        list_parser.add_argument("--stats", action="store_true", help="Summarizes the backups of the last days instead, "
+                                                                     "to plan the disk space they need.")
+        list_parser.add_argument("--days", type=float, default=30, help="The amount of days summarized by --stats.")
+
+        restore_parser = subparsers.add_parser("restore", help="Restores the whole world, or a single file, from the "
+                                                               "backups. The server should be stopped while restoring.")
+        restore_parser.add_argument("--path", help="The file to restore, relative to the server files. "
+                                                   "(e.g. world/level.dat) Defaults to the whole world.")
+        restore_parser.add_argument("--time", type=self.__parse_time,
+                                    help="Restores to how things were at this time, as DD/MM/YYYY HH:MM:SS. "
+                                         "Defaults to the newest backup.")
+        restore_parser.add_argument("--backup", help="The backup to restore from. Defaults to the newest one "
+                                                     "containing the file, or made before --time.")
+        restore_parser.add_argument("--destination", default=self._server_files_path,
+                                    help="The folder to restore into. Defaults to the server files.")
+        restore_parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 8),
+                                    help="The amount of files extracted at the same time, for .zip backups "
+                                         "and snapshots.")
+        restore_parser.add_argument("--discard-current", action="store_true",
+                                    help="Deletes the replaced world, instead of keeping it next to the restored one.")
+
+        verify_parser = subparsers.add_parser("verify", help="Checks that the backups can be read and match "
+                                                             "the hashes they were saved with.")
+        verify_parser.add_argument("--backup", help="The backup to verify. Defaults to every backup.")
+        verify_parser.add_argument("--kind", choices=MCSMCatalog.ROOTS.keys(), help="Only verify backups of this type.")
+        verify_parser.add_argument("--workers", type=int, default=self._settings["verify-workers"],
+                                   help="The amount of backups verified at the same time.")
+        verify_parser.add_argument("--rate-limit", type=float,
+                                   default=self._settings["verify-rate-limit"] / (1024 * 1024),
+                                   help="The maximum amount of megabytes read per second. (0 for no limit)")
+
+        player_parser = subparsers.add_parser("restore-player", help="Restores the files of a single player from the "
+                                                                     "playerdata pack. The player should be offline.")
+        player_parser.add_argument("--player", required=True, help="The name or UUID of the player.")
+        player_parser.add_argument("--time", type=self.__parse_time,
+                                   help="Restores the player to how they were at this time, "
+                                        "as DD/MM/YYYY HH:MM:SS. Defaults to the newest backup.")
+        player_parser.add_argument("--history", action="store_true", help="Lists the saved versions instead.")
+        player_parser.add_argument("--destination", default=os.path.join(self._server_files_path, "world"),
+                                   help="The world folder to restore into. Defaults to the server world.")
+
+        subparsers.add_parser("dry-run", help="Shows which files the include and exclude rules leave out of "
+                                              "the backups, and how many bytes every rule saves.")
+
+        status_parser = subparsers.add_parser("status", help="Shows the cores every server and MCSM on this machine "
+                                                             "runs on, and how much every core is used.")
+        status_parser.add_argument("--interval", type=self.__parse_interval, default=1.0,
+                                   help="The amount of seconds the usage is measured for.")
+        return parser
+
+
+    def __list(self, arguments: argparse.Namespace):
+        """
+        Lists the backups in the catalog or, if a backup is given, the files inside it.
+        :param arguments: The parsed command line arguments.
+        :return:
+        """
+        if arguments.backup:
+            started = time.perf_counter()
+            members = self.__get_archive(arguments.backup).list_members()
+
+            for member in members:
+                print(f"{member['size']:>14,} B  {member['path']}")
+
+            print(f"{len(members)} files, {sum(member['size'] for member in members):,} bytes. "
+                  f"Listed in {round((time.perf_counter() - started) * 1000, 1)}ms.")
+            return
+
+        kinds = [arguments.kind] if arguments.kind else MCSMCatalog.ROOTS.keys()
+        if arguments.stats:
+            self.__list_stats(kinds, arguments.days)
+            return
+
+        print(f"{'TYPE':<12}{'CREATED':<21}{'TOOK':>8}{'STORED':>12}{'SOURCE':>12}{'RATIO':>7}{'FILES':>8}"
+              f"{'MB/S':>8}{'THROTTLED':>11}  {'VERIFIED':<10}PATH")
+
+        for kind in kinds:
+            for backup in self.__catalog.get_backups(kind, arguments.history):
+                created = datetime.fromtimestamp(backup["created"]).strftime("%d/%m/%Y %H:%M:%S")
+                ratio = backup["source_bytes"] / backup["size"] if backup["source_bytes"] and backup["size"] else None
+                throughput = backup["throughput"] / (1024 * 1024) if backup["throughput"] is not None else None
+                status = "removed" if backup["removed"] else backup["verification"] or "-"
+
+                print(f"{kind:<12}{created:<21}{self.__format(backup['duration'], 's'):>8}"
+                      f"{self.__format_bytes(backup['size']):>12}{self.__format_bytes(backup['source_bytes']):>12}"
+                      f"{self.__format(ratio, 'x'):>7}{self.__format(backup['file_count']):>8}"
+                      f"{self.__format(throughput):>8}{self.__format(backup['throttled_time'], 's'):>11}  "
+                      f"{status:<10}{backup['path']}")
+
+
+    def __list_stats(self, kinds: list, days: float):
+        """
+        Summarizes the backups made in the last days, and estimates how long the free disk space lasts.
+        :param kinds: The types of backups to summarize.
+        :param days: The amount of days to summarize.
+        :return:
+        """
+        since = time.time() - days * 24 * 60 * 60
+        daily_bytes = 0
+
+        for kind in kinds:
+            trends = self.__catalog.get_trends(kind, since)
+            if not trends["backups"]: continue
+
+            ratio = trends["average_source_bytes"] / trends["average_size"] \
+                if trends["average_source_bytes"] and trends["average_size"] else None
+            throughput = trends["average_throughput"] / (1024 * 1024) if trends["average_throughput"] else None
+            daily_bytes += trends["stored_bytes"] / days
+
+            print(f"[{kind}] {trends['backups']} backups in {days:g} days, "
+                  f"{self.__format_bytes(trends['stored_bytes'] / days)} written per day.")
+            print(f"    Average: {self.__format_bytes(trends['average_size'])} stored from "
+                  f"{self.__format_bytes(trends['average_source_bytes'])} ({self.__format(ratio, 'x')}), "
+                  f"{self.__format(trends['average_duration'], 's')} at {self.__format(throughput)} MB/s, "
+                  f"{self.__format(trends['average_throttled_time'], 's')} throttled.")
+            print(f"    Kept on disk: {self.__format_bytes(trends['kept_bytes'])}.")
+
+        # Without pruning, the free space runs out at the rate backups were written.
+        free_bytes = shutil.disk_usage(os.path.dirname(self.__catalog.catalog_path)).free
+        lasts = f"{free_bytes / daily_bytes:,.0f} days" if daily_bytes else "indefinitely"
+        print(f"{self.__format_bytes(free_bytes)} free on the backups disk, lasting {lasts} without pruning.")
+
+
+    def __restore(self, arguments: argparse.Namespace):
+        """
+        Restores a single file from the given backup, or from the newest backup containing it.
+        Without a file, the whole world is restored instead.
+        :param arguments: The parsed command line arguments.
+        :return:
+        """
+        moment = arguments.time
+        if not arguments.path: return self.__restore_world(arguments, moment)
+
+        member_path = arguments.path.replace("\\", "/").strip("/")
+
+        if arguments.backup:
+            candidates = [self.__get_archive(arguments.backup)]
+        else:
+            # Every backup whose folder contains the file, from newest to oldest.
+            backups = [backup for kind, root in MCSMCatalog.ROOTS.items() if member_path.startswith(f"{root}/")
+                       for backup in self.__catalog.get_backups(kind) if moment is None or backup["created"] <= moment]
+            candidates = [MCSMArchive(backup["path"], MCSMCatalog.ROOTS[backup["kind"]])
+                          for backup in sorted(backups, key=lambda backup: backup["created"], reverse=True)]
+
+        for archive in candidates:
+            if not os.path.exists(archive.path): continue
+
+            started = time.perf_counter()
+            restored_path = archive.extract_member(member_path, arguments.destination)
+            if restored_path is None: continue
+
+            self.__logger.log(f"Restored '{member_path}' from '{archive.path}' into '{restored_path}' "
+                              f"in {round((time.perf_counter() - started) * 1000, 1)}ms.", level="COMMANDS/INFO")
+            return
+
+        self.__logger.log(f"No backup contains '{member_path}'.", level="COMMANDS/ERROR")
+
+
+    def __restore_world(self, arguments: argparse.Namespace, moment: float = None):
+        """
+        Restores the whole world to how it was at the given time, or to the newest backups.
+        :param arguments: The parsed command line arguments.
+        :param moment: The point in time to restore the world to.
+        :return:
+        """
+        pack = self.__get_pack()
+        restorer = MCSMRestorer(self.__logger, self.__catalog, pack if os.path.exists(pack.pack_path) else None)
+        plan = restorer.compose(moment, arguments.backup)
+
+        if plan is None:
+            self.__logger.log(f"No world backup was made before "
+                              f"{datetime.fromtimestamp(moment).strftime('%d/%m/%Y %H:%M:%S')}." if moment
+                              else "There are no world backups to restore from.", level="COMMANDS/ERROR")
+            return
+
+        restorer.restore(os.path.join(arguments.destination, "world"), plan, moment, max(arguments.workers, 1),
+                         arguments.discard_current)
+
+
+    def __verify(self, arguments: argparse.Namespace):
+        """
+        Verifies the given backup, or every backup in the catalog.
+        :param arguments: The parsed command line arguments.
+        :return:
+        """
+        if arguments.backup:
+            backup = self.__catalog.get_backup(os.path.abspath(arguments.backup))
+            backups = [backup or {"kind": "server", "path": os.path.abspath(arguments.backup)}]
+        else:
+            backups = [backup for kind in ([arguments.kind] if arguments.kind else MCSMCatalog.ROOTS.keys())
+                       for backup in self.__catalog.get_backups(kind)]
+
+        results = MCSMVerifier(self.__logger, self.__catalog).verify(backups, arguments.workers,
+                                                                     arguments.rate_limit * 1024 * 1024)
+
+        corrupt = [result for result in results if result["status"] == "corrupt"]
+        self.__logger.log(f"Verified {len(results)} backups, {len(corrupt)} of them are corrupt.",
+                          level="VERIFY/ERROR" if corrupt else "VERIFY/INFO")
+
+
+    def __dry_run(self, arguments: argparse.Namespace):
+        """
+        Walks the whole world, counting the files and bytes each exclude rule leaves out of the backups.
+        :param arguments: The parsed command line arguments.
+        :return:
+        """
+        rules = MCSMPathRules.load(self._settings, "backups")
+        world_folder = os.path.join(self._server_files_path, "world")
+        saved = {rule: [0, 0] for rule in rules.exclude}
+        kept, pruned_folders = [0, 0], 0
+
+        for dirpath, dirnames, filenames in os.walk(world_folder):
+            relative_dir = os.path.relpath(dirpath, world_folder)
+            archive_dir = "world" if relative_dir == "." else "world/" + relative_dir.replace(os.sep, "/")
+            # Only the outermost skipped folders are counted, the backups never see what's inside them.
+            if not rules.can_prune(archive_dir):
+                pruned_folders += sum(1 for dirname in dirnames if rules.can_prune(f"{archive_dir}/{dirname}"))
+
+            # Everything is walked, even the folders the backups skip, so every rule is measured.
+            for filename in filenames:
+                try:
+                    size = os.path.getsize(os.path.join(dirpath, filename))
+                except FileNotFoundError:
+                    continue
+
+                rule = rules.excluded_by(f"{archive_dir}/{filename}")
+                counter = saved[rule] if rule is not None else kept
+                counter[0] += 1
+                counter[1] += size
+
+        for rule, (files, size) in saved.items():
+            print(f"{self.__format_bytes(size):>12}  {files:>8,} files  excluded by '{rule}'")
+
+        print(f"{self.__format_bytes(kept[1]):>12}  {kept[0]:>8,} files  backed up, "
+              f"{pruned_folders:,} folders skipped without being walked.")
+        if rules.include: print(f"Include rules: {', '.join(rules.include)}")
+
+
+    def __status(self, arguments: argparse.Namespace):
+        """
+        Shows the cores the servers and MCSMs running on this machine were given, the cores they actually
+        run on, and the usage of every core and process, measured over the interval.
+        :param arguments: The parsed command line arguments.
+        :return:
+        """
+        if not MCSMAffinity.is_supported():
+            print("The cores of the server can only be set on Linux.")
+            return
+
+        instances = MCSMAffinity.get_instances()
+        pids = [pid for instance in instances for pid in (instance["pid"], instance["server_pid"]) if pid]
+        cores, processes = MCSMAffinity.measure(pids, arguments.interval)
+
+        print(f"{'NAME':<24}{'PROCESS':<8}{'PID':>8}{'GIVEN':>12}{'RUNNING ON':>14}{'CPU':>9}  FOLDER")
+        owners = dict()
+
+        for instance in instances:
+            for process, pid, given in [("server", instance["server_pid"], instance["server_cpus"]),
+                                        ("mcsm", instance["pid"], instance["mcsm_cpus"])]:
+                for cpu in given or ():
+                    owners.setdefault(cpu, list()).append(f"{instance['name']} ({process})")
+
+                try:
+                    running_on = MCSMAffinity.format_cpus(os.sched_getaffinity(pid)) if pid else "-"
+                except OSError:
+                    running_on = "-"
+
+                usage = f"{processes[pid]:.1f}%" if pid in processes else "-"
+                print(f"{instance['name'][:23]:<24}{process:<8}{pid or '-':>8}{MCSMAffinity.format_cpus(given):>12}"
+                      f"{running_on:>14}{usage:>9}  {instance['folder']}")
+
+        if not instances:
+            print("No MCSM on this machine has set the cores of its server. (see SERVER-CPUS and MCSM-CPUS)")
+
+        print(f"\n{'CORE':<6}{'USAGE':>7}  USED BY")
+        for cpu, usage in sorted(cores.items()):
+            print(f"{cpu:<6}{usage:>6.1f}%  {', '.join(owners.get(cpu, ['-']))}")
+
+
+    def __restore_player(self, arguments: argparse.Namespace):
+        """
+        Restores the files of a single player from the playerdata pack, to a given point in time.
+        :param arguments: The parsed command line arguments.
+        :return:
+        """
+        pack = self.__get_pack()
+        uuid = self.__get_uuid(arguments.player)
+
+        if uuid not in pack.get_players():
+            self.__logger.log(f"The playerdata pack has no backups of '{arguments.player}'.", level="COMMANDS/ERROR")
+            return
+
+        if arguments.history:
+            for moment in pack.get_history(uuid):
+                print(datetime.fromtimestamp(moment).strftime("%d/%m/%Y %H:%M:%S"))
+            return
+
+        started = time.perf_counter()
+        restored_paths = pack.restore(uuid, arguments.destination, arguments.time)
+
+        if not restored_paths:
+            before = f" from before {datetime.fromtimestamp(arguments.time).strftime('%d/%m/%Y %H:%M:%S')}" \
+                if arguments.time else ""
+            self.__logger.log(f"The playerdata pack has no backups of '{arguments.player}'{before}.",
+                              level="COMMANDS/ERROR")
+            return
+
+        self.__logger.log(f"Restored {len(restored_paths)} files of '{arguments.player}' "
+                          f"in {round((time.perf_counter() - started) * 1000, 1)}ms.", level="COMMANDS/INFO")
+
+
+    def __get_pack(self):
+        """
+        Opens the playerdata pack, inside the playerdata backups path.
+        :return: MCSMPlayerPack
+        """
+        pack_folder = self._settings["playerdata-backups-path"] or \
+            os.path.join(self._server_files_path, "MCSM-Backups", "Playerdata")
+        return MCSMPlayerPack(pack_folder)
+
+
+    def __get_uuid(self, player: str):
+        """
+        Finds the UUID of a player through the usercache.json file of the server.
+        :param player: The name or UUID of the player.
+        :return: String, the UUID of the player, or the given value if it isn't a known name.
+        """
+        usercache_path = os.path.join(self._server_files_path, "usercache.json")
+        if not os.path.exists(usercache_path): return player
+
+        with open(usercache_path, "r", encoding="utf-8") as usercache:
+            names = {user["name"].lower(): user["uuid"] for user in json.load(usercache)}
+
+        return names.get(player.lower(), player)
+
+
+    @staticmethod
+    def __format(value, unit: str = ""):
+        """
+        Formats a number from the catalog for the listings.
+        :param value: The number, or None if it isn't known.
+        :param unit: The unit to show after the number.
+        :return: String, the formatted number, or "-" if it isn't known.
+        """
+        if value is None: return "-"
+        return f"{value:,}{unit}" if isinstance(value, int) else f"{value:,.1f}{unit}"
+
+
+    @staticmethod
+    def __format_bytes(value):
+        """
+        Formats an amount of bytes for the listings, in the biggest unit that fits.
+        :param value: The amount of bytes, or None if it isn't known.
+        :return: String, the formatted amount, or "-" if it isn't known.
+        """
+        if value is None: return "-"
+
+        for unit in ["B", "KB", "MB", "GB"]:
+            if abs(value) < 1024: return f"{value:.1f} {unit}"
+            value /= 1024
+
+        return f"{value:.1f} TB"
+
+
+    @staticmethod
+    def __parse_time(value: str):
+        """
+        Parses the time the restore commands restore to.
+        :param value: The time, as given in the command line. (e.g. "19/10/2026 12:00:00")
+        :return: Float, the time as a timestamp.
+        :raises argparse.ArgumentTypeError: If it isn't written as DD/MM/YYYY HH:MM:SS.
+        """
+        try:
+            return datetime.strptime(value, "%d/%m/%Y %H:%M:%S").timestamp()
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"\"{value}\" isn't a time written as DD/MM/YYYY HH:MM:SS")
+
+
+    @staticmethod
+    def __parse_interval(value: str):
+        """
+        Parses the amount of seconds the status command measures the usage for.
+        :param value: The amount of seconds, as given in the command line.
+        :return: Float, the amount of seconds.
+        :raises argparse.ArgumentTypeError: If it isn't a positive number.
+        """
+        try:
+            interval = float(value)
+            if 0 < interval < float("inf"): return interval
+        except ValueError:
+            pass
+
+        raise argparse.ArgumentTypeError(f"\"{value}\" isn't a positive amount of seconds")
+
+
+    def __get_archive(self, path: str):
+        """
+        Opens a backup, finding out which folder it contains through the catalog.
+        :param path: The path of the backup.
+        :return: MCSMArchive
+        """
+        backup = self.__catalog.get_backup(os.path.abspath(path))
+        return MCSMArchive(path, MCSMCatalog.ROOTS[backup["kind"]] if backup else "world")
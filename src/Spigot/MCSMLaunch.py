@@ -0,0 +1,158 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import re
+import shlex
+import subprocess
+import sys
+
+# Third Party Imports
+# Local Application Imports
+from MCSMSettings import MCSMSettings
+from MCSMGCLog import GC_LOG_DECORATORS
+
+
+# The flags of every launch profile, picked with JVM-PROFILE. The flags that depend on the size of the heap
+# are added by MCSMLaunch, and "auto" picks "small-heap" or "aikar" by the allocated RAM.
+JVM_PROFILES = {
+    "none": [],
+
+    # G1, tuned the way Aikar's flags do, for short and steady pauses with the way Minecraft allocates.
+    "aikar": ["-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=200",
+              "-XX:+UnlockExperimentalVMOptions", "-XX:+DisableExplicitGC", "-XX:+AlwaysPreTouch",
+              "-XX:G1HeapWastePercent=5", "-XX:G1MixedGCCountTarget=4", "-XX:G1MixedGCLiveThresholdPercent=90",
+              "-XX:G1RSetUpdatingPauseTimePercent=5", "-XX:SurvivorRatio=32", "-XX:+PerfDisableSharedMem",
+              "-XX:MaxTenuringThreshold=1", "-Dusing.aikars.flags=https://mcflags.emc.gs", "-Daikars.new.flags=true"],
+
+    # Concurrent collectors, with pauses that don't grow with the heap, for heaps of many gigabytes.
+    "zgc": ["-XX:+UseZGC", "-XX:+DisableExplicitGC", "-XX:+AlwaysPreTouch", "-XX:+PerfDisableSharedMem"],
+    "shenandoah": ["-XX:+UseShenandoahGC", "-XX:+DisableExplicitGC", "-XX:+AlwaysPreTouch",
+                   "-XX:+PerfDisableSharedMem"],
+
+    # G1 keeping the heap as small as it can, without touching all of it upfront, for servers with little RAM.
+    "small-heap": ["-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=200",
+                   "-XX:+DisableExplicitGC", "-XX:+UseStringDeduplication", "-XX:+PerfDisableSharedMem"],
+}
+
+# The allocated RAM, in megabytes, from which Aikar's flags give the young generation a bigger share.
+LARGE_HEAP = 12 * 1024
+
+# The allocated RAM, in megabytes, under which "auto" picks the small-heap profile.
+SMALL_HEAP = 2 * 1024
+
+
+class MCSMLaunch:
+    """
+    This class implements the command line the server is launched with. The JVM flags come from
+    the chosen launch profile, scaled to the allocated RAM, followed by the flags of the server type
+    (e.g. Spigot's) and the flags written in JVM-FLAGS, so the later ones win when they repeat a flag.
+    """
+
+    def __init__(self, settings: MCSMSettings, variant_flags: list = None, heap: int = None):
+        self._settings = settings
+        self.heap = heap or settings["allocated_ram"]
+        self.__variant_flags = list(variant_flags or ())
+        self.profile = self.resolve_profile()
+        self.unsupported_flags = list()
+
+
+    def resolve_profile(self):
+        """
+        Picks the launch profile from the settings.
+        :return: String, the name of the profile.
+        """
+        if self._settings["jvm-profile"] != "auto": return self._settings["jvm-profile"]
+        return "small-heap" if self.heap < SMALL_HEAP else "aikar"
+
+
+    def get_jvm_flags(self):
+        """
+        Gets the JVM flags of the launch profile, with the ones depending on the heap scaled to its size.
+        :return: List, containing the flags.
+        """
+        ram = self.heap
+        flags = [f"-Xmx{ram}M", f"-Xms{ram}M"] + JVM_PROFILES[self.profile]
+
+        # Bigger heaps give the young generation a bigger share, and keep less of the heap in reserve.
+        if self.profile == "aikar" and ram < LARGE_HEAP:
+            flags += ["-XX:G1NewSizePercent=30", "-XX:G1MaxNewSizePercent=40", "-XX:G1HeapRegionSize=8M",
+                      "-XX:G1ReservePercent=20", "-XX:InitiatingHeapOccupancyPercent=15"]
+        elif self.profile == "aikar":
+            flags += ["-XX:G1NewSizePercent=40", "-XX:G1MaxNewSizePercent=50", "-XX:G1HeapRegionSize=16M",
+                      "-XX:G1ReservePercent=15", "-XX:InitiatingHeapOccupancyPercent=20"]
+
+        # The concurrent collectors start collecting early enough to stay under the heap, leaving a tenth to spare.
+        elif self.profile in ("zgc", "shenandoah"):
+            flags.append(f"-XX:SoftMaxHeapSize={ram * 9 // 10}M")
+
+        # Small heaps start at half their size, and grow only if the server needs it.
+        elif self.profile == "small-heap":
+            flags[1] = f"-Xms{max(ram // 2, 256)}M"
+
+        # Transparent huge pages need no setup on Linux, while other systems need the large pages allowed first.
+        if self._settings["jvm-large-pages"]:
+            flags.append("-XX:+UseTransparentHugePages" if sys.platform.startswith("linux") else "-XX:+UseLargePages")
+
+        return flags
+
+
+    def build_command(self, jar_path: str, java: str = "java", supported_flags: list = None, gc_log: str = None,
+                      class_sharing=None):
+        """
+        Builds the command line that launches the server.
+        The flags of the profile the runtime doesn't have are left out, and kept in unsupported_flags.
+        :param jar_path: The path of the server jar.
+        :param java: The java executable to launch the server with.
+        :param supported_flags: The names of the -XX flags the runtime has, or None to keep every flag.
+        :param gc_log: The path to write the GC log into, relative to the server files, or None to not write it.
+        :param class_sharing: The MCSMClassSharing giving the flags of the class sharing archive, or None for none.
+        :return: List, containing the arguments of the command.
+        """
+        flags = self.get_jvm_flags()
+        self.unsupported_flags = list()
+
+        # The flags set by hand, and the ones the server type needs, are always kept.
+        if supported_flags is not None:
+            supported_flags = set(supported_flags)
+            self.unsupported_flags = [flag for flag in flags if flag.startswith("-XX:")
+                                      and re.sub(r"^-XX:[+-]?|=.*$", "", flag) not in supported_flags]
+            flags = [flag for flag in flags if flag not in self.unsupported_flags]
+
+        # The GC log is rotated by the JVM, keeping a few of the latest ones.
+        if gc_log:
+            flags.append(f"-Xlog:gc*:file={gc_log}:{GC_LOG_DECORATORS}:filecount=5,filesize=20m")
+
+        flags += [*self.__variant_flags, *self.split_flags(self._settings["jvm-flags"])]
+
+        # The class sharing archive only fits the flags it was written with, so it gets every other flag.
+        if class_sharing is not None:
+            flags += class_sharing.get_flags(flags)
+
+        return [java, *flags, "-jar", jar_path, "nogui"]
+
+
+    @staticmethod
+    def split_flags(text: str):
+        """
+        Splits the flags set by hand into arguments, the way the shell of the system would.
+        On Windows, backslashes are kept, since they separate the folders of paths. (e.g. -Djava.io.tmpdir=C:\\Temp)
+        :param text: The flags, separated by spaces. Quotes keep the spaces inside an argument.
+        :return: List, containing every argument, without the quotes.
+        """
+        if sys.platform != "win32": return shlex.split(text)
+        return [argument.replace('"', "") for argument in re.findall(r'(?:[^\s"]|"[^"]*"?)+', text)]
+
+
+    @staticmethod
+    def format_command(command: list):
+        """
+        Formats a command line the way it would be typed into the shell of the system.
+        :param command: The arguments of the command.
+        :return: String, the command line.
+        """
+        return subprocess.list2cmdline(command) if sys.platform == "win32" else shlex.join(command)
@@ -21,12 +21,13 @@ class MCSMLogger:
     the MCSMs.
     """
 
-    def __init__(self):
+    def __init__(self, log_name: str = "latest.log"):
         now = datetime.now()
         self.__server_files_path = os.path.join(os.getcwd(), "server_files")
         self.__logs_folder = os.path.join(self.__server_files_path, "mcsm_logs")
         self._logging_session = f"{now.year}.{now.month}.{now.day}.{now.hour}.{now.minute}.{now.second}"
-        self._latest_log = os.path.join(self.__logs_folder, "latest.log")
+        # Commands log into their own file, so they don't archive the log of a running server.
+        self._latest_log = os.path.join(self.__logs_folder, log_name)
         self.__lock = threading.Lock()
         self._initialize_logging()
 
@@ -53,6 +54,7 @@ class MCSMLogger:
     def _initialize_logging(self):
         """
         Archives any dangling "latest.log" files, and creates a new latest.log file.
+        (Or the log file with the given name)
         :return:
         """
         os.makedirs(os.path.dirname(self._latest_log), exist_ok=True)
@@ -63,7 +65,9 @@ class MCSMLogger:
             with open(self._latest_log, "r") as latestlog:
                 session = latestlog.readlines()[0].split()[2][1:]
 
-            # Make a .zip folder with the latest.log file
+            # Make a .zip folder with the latest.log file. Other logs get their name in the .zip name.
+            log_name = os.path.splitext(os.path.basename(self._latest_log))[0]
+            if log_name != "latest": session += f".{log_name}"
             zipped_log = os.path.join(self.__logs_folder, session + ".zip")
             zipfile.ZipFile(zipped_log, mode='w').write(self._latest_log)
             os.remove(self._latest_log)
@@ -0,0 +1,209 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import os
+import threading
+import time
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+
+
+# The megabytes the JVM uses besides the heap, whatever its size. (metaspace, code cache, thread stacks, buffers)
+JVM_OFF_HEAP = 512
+
+# The share of the heap the JVM uses on top of it, for the structures of the garbage collector.
+JVM_HEAP_OVERHEAD = 0.10
+
+# The megabytes kept for the MCSM itself, and the worker process archiving the backups.
+MCSM_RESERVE = 256
+
+# The smallest heap auto-sizing picks, in megabytes, and the largest one, which still fits compressed pointers.
+MINIMUM_HEAP = 512
+MAXIMUM_HEAP = 31 * 1024
+
+# The heap, in megabytes, used when ALLOCATED_RAM is "auto" but the memory of the system can't be read.
+FALLBACK_HEAP = 2048
+
+# Cgroup v1 reports no limit as a number this large or larger.
+UNLIMITED = 1 << 60
+
+# The amount of seconds between every check of the swap used by the server.
+SWAP_CHECK_INTERVAL = 30
+
+# The megabytes of swap from which the server is reported to be swapping.
+SWAP_WARNING = 64
+
+
+class MCSMMemory:
+    """
+    This class implements the sizing of the server's heap from the memory it can use, which is the memory
+    of the system, or the memory limit of its cgroup (e.g. inside a container) if lower. The JVM needs
+    memory besides the heap, and so does the MCSM, so both are kept out of it, keeping the server from
+    being killed for going over the limit. The swap used by the server is followed while it runs.
+    """
+
+    def __init__(self, logger: MCSMLogger):
+        self.__logger = logger
+
+
+    def get_heap_size(self, allocated_ram):
+        """
+        Gets the heap size of the server, picking it from the memory it can use in auto mode,
+        and warning if the one set needs more memory than the server can use.
+        :param allocated_ram: The ALLOCATED_RAM setting, in megabytes, or "auto".
+        :return: Integer, the heap size in megabytes.
+        """
+        total, available = self.get_system_memory()
+        limit = self.get_cgroup_limit()
+
+        if allocated_ram == "auto":
+            # Inside a cgroup limit, the memory is taken to be meant for the server, otherwise only what is free is.
+            budget = limit if limit is not None else available
+            if budget is None:
+                self.__logger.log(f"Couldn't read the memory of the system, so the heap was set to {FALLBACK_HEAP}MB. "
+                                  f"Set ALLOCATED_RAM to an amount of megabytes instead.", level="WARN")
+                return FALLBACK_HEAP
+
+            heap = int((budget - JVM_OFF_HEAP - MCSM_RESERVE) / (1 + JVM_HEAP_OVERHEAD))
+            heap = min(max(heap, MINIMUM_HEAP), MAXIMUM_HEAP)
+            self.__logger.log(f"Picked a heap of {heap}MB, from {budget}MB of "
+                              f"{'memory allowed by the cgroup' if limit is not None else 'free memory'}, keeping "
+                              f"{self.get_needed_memory(heap) - heap}MB for the JVM and the MCSM.")
+            return heap
+
+        needed = self.get_needed_memory(allocated_ram)
+        if limit is not None and needed > limit:
+            self.__logger.log(f"ALLOCATED_RAM is {allocated_ram}MB, which takes about {needed}MB with the JVM and the "
+                              f"MCSM, but the cgroup only allows {limit}MB. The server will likely be killed once it "
+                              f"uses it all. Lower ALLOCATED_RAM, or set it to \"auto\".", level="WARN")
+        elif total is not None and needed > total:
+            self.__logger.log(f"ALLOCATED_RAM is {allocated_ram}MB, which takes about {needed}MB with the JVM and the "
+                              f"MCSM, but the system only has {total}MB. Lower ALLOCATED_RAM, or set it to \"auto\".",
+                              level="WARN")
+        elif available is not None and needed > available:
+            self.__logger.log(f"ALLOCATED_RAM is {allocated_ram}MB, which takes about {needed}MB with the JVM and the "
+                              f"MCSM, but only {available}MB are free, so the server might be swapped out and lag.",
+                              level="WARN")
+
+        return allocated_ram
+
+
+    @staticmethod
+    def get_needed_memory(heap: int):
+        """
+        Gets the memory a server takes, along with the MCSM, for a given heap.
+        :param heap: The heap size, in megabytes.
+        :return: Integer, the memory in megabytes.
+        """
+        return int(heap * (1 + JVM_HEAP_OVERHEAD)) + JVM_OFF_HEAP + MCSM_RESERVE
+
+
+    @staticmethod
+    def get_system_memory():
+        """
+        Gets the memory of the system, from /proc/meminfo on Linux, or from the amount of pages elsewhere.
+        :return: Tuple, containing the total and available memory in megabytes, either None if it can't be read.
+        """
+        try:
+            with open("/proc/meminfo", "r") as meminfo:
+                values = {line.split(":")[0]: int(line.split()[1]) // 1024 for line in meminfo if line.count(":") == 1}
+            return values.get("MemTotal"), values.get("MemAvailable", values.get("MemFree"))
+        except (OSError, ValueError, IndexError):
+            pass
+
+        try:
+            total = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+        except (AttributeError, ValueError, OSError):
+            return None, None
+
+        try:
+            available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+        except (ValueError, OSError):
+            available = None
+        return total, available
+
+
+    @staticmethod
+    def get_cgroup_limit():
+        """
+        Gets the memory limit of the cgroup the MCSM runs in, and so the server, (e.g. the limit of a container)
+        through cgroup v2 if it is mounted, or cgroup v1 otherwise. The lowest limit of its parents counts too.
+        :return: Integer, the limit in megabytes, or None if there is no limit.
+        """
+        try:
+            with open("/proc/self/cgroup", "r") as cgroup_file:
+                cgroups = [line.strip().split(":", 2) for line in cgroup_file if line.count(":") >= 2]
+        except OSError:
+            return None
+
+        candidates = list()
+        for hierarchy, controllers, path in cgroups:
+            if hierarchy == "0" and controllers == "":
+                root, limit_name = "/sys/fs/cgroup", "memory.max"
+            elif "memory" in controllers.split(","):
+                root, limit_name = "/sys/fs/cgroup/memory", "memory.limit_in_bytes"
+            else:
+                continue
+
+            # Inside a container, the cgroup of the MCSM is usually mounted as the root.
+            parts = path.strip("/").split("/") if path.strip("/") else []
+            folders = [os.path.join(root, *parts[:depth]) for depth in range(len(parts), -1, -1)]
+            for folder in folders:
+                try:
+                    with open(os.path.join(folder, limit_name), "r") as limit_file:
+                        value = limit_file.read().strip()
+                except OSError:
+                    continue
+
+                if value.isdigit() and int(value) < UNLIMITED: candidates.append(int(value) // (1024 * 1024))
+
+        return min(candidates) if candidates else None
+
+
+    def monitor_swap(self, pid: int):
+        """
+        Follows the swap used by a process in the background, warning whenever it doubles,
+        since a server swapped out lags every time it touches that memory. Only works on Linux.
+        :param pid: The process id of the server.
+        :return: Boolean, True if the swap is followed.
+        """
+        status_path = f"/proc/{pid}/status"
+        if not os.path.isfile(status_path): return False
+
+        threading.Thread(target=self.__monitor_swap, args=(status_path,), daemon=True).start()
+        return True
+
+
+    def __monitor_swap(self, status_path: str):
+        """
+        Checks the swap used by a process every so often, until it stops.
+        :param status_path: The path of the status file of the process.
+        :return:
+        """
+        warned = 0
+
+        while True:
+            time.sleep(SWAP_CHECK_INTERVAL)
+            try:
+                with open(status_path, "r") as status_file:
+                    values = {line.split(":")[0]: line.split()[1] for line in status_file if line.startswith("Vm")}
+            except OSError:
+                return
+
+            swap, resident = int(values.get("VmSwap", 0)) // 1024, int(values.get("VmRSS", 0)) // 1024
+
+            if swap >= max(SWAP_WARNING, warned * 2):
+                warned = swap
+                self.__logger.log(f"The server has {swap}MB swapped out, and {resident}MB in memory, so it lags "
+                                  f"whenever it uses the swapped memory. Free some memory, or lower ALLOCATED_RAM.",
+                                  level="WARN")
+            elif warned and swap < SWAP_WARNING:
+                warned = 0
+                self.__logger.log(f"The server is back to {swap}MB swapped out.", console=False)
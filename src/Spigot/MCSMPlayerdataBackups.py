@@ -6,89 +6,281 @@ __copyright__ = "
 __license__ = "GNU GENERAL PUBLIC LICENSE v3"
 
 # Built-in Imports
-from datetime import datetime
 import os
-import tarfile
+import threading
 
 # Third Party Imports
 # Local Application Imports
 import time
 
 from MCSMLogger import MCSMLogger
-from MCSMConfig import MCSMConfig
+from MCSMSettings import MCSMSettings
+from MCSMCatalog import MCSMCatalog
+from MCSMRetention import MCSMRetention
+from MCSMArchive import MANIFEST_SUFFIX
+from MCSMArchiveWorker import MCSMArchiveWorker
+from MCSMPlayerPack import MCSMPlayerPack, PLAYER_FILES
+from MCSMChangeDetector import MCSMChangeDetector
+from MCSMThrottle import MCSMThrottle
+from MCSMScheduler import MCSMScheduler
 
 
-class MCSMPlayerdataBackups(MCSMConfig):
+class MCSMPlayerdataBackups:
     """
     This class implements a periodical playerdata backups system which will
     be built-in the server.
-    This class inherits from MCSMConfig to access the settings.
+    The settings are given as the snapshot loaded by MCSMConfig.
     """
 
-    def __init__(self, logger: MCSMLogger):
-        super().__init__(logger)
-
+    def __init__(self, logger: MCSMLogger, settings: MCSMSettings):
         self.__logger = logger
         self._server_files_path = os.path.join(os.getcwd(), "server_files")
-        self._config_path = os.path.join(self._server_files_path, "config.mcsm")
-        self._settings = self.load_settings()
+        self._settings = settings
+        self.__scheduler = None
+        self.__backups_path = self.__get_backups_path()
+        self.__archive_format = self._settings["playerdata-backups-format"]
 
-        if not self._settings["playerdata-backups-path"] or not os.path.exists(self._settings["playerdata-backups-path"]):
-            self.__backups_path = os.path.join(self._server_files_path, "MCSM-Backups", "Playerdata")
-            self.__logger.log(f"Playerdata Backups path is unspecified or does not exist. "
-                              f"Defaulted to {self.__backups_path}.", level="BACKUPS/WARN")
-        else:
-            self.__backups_path = self._settings["playerdata-backups-path"]
+        # In pack mode, only the player files that changed are appended into a single pack.
+        self.__pack = None
+        if self._settings["playerdata-backups-mode"] == "pack":
+            self.__pack = MCSMPlayerPack(self.__backups_path, writable=True)
 
-        os.makedirs(self.__backups_path, exist_ok=True)
+        # When combined, the world backups also write the playerdata backups that are due, from the same reads.
+        self.combined = self._settings["playerdata-backups-combine"] and self.__pack is None \
+            and self._settings["playerdata-backups"] and self._settings["backups"] \
+            and self._settings["backups-mode"] != "snapshot"
 
+        # Limits the rate the playerdata backups use the disk at, slowing them down further if the server lags.
+        self.__throttle = MCSMThrottle.load(self._settings)
 
-    def start(self):
+        # Playerdata backups where no player file changed are skipped, unless too many were skipped in a row.
+        self.__detector = None
+        if self._settings["playerdata-backups-skip-unchanged"]:
+            world_folder = os.path.join(self._server_files_path, "world")
+            self.__detector = MCSMChangeDetector(logger, [os.path.join(world_folder, folder)
+                                                          for folder, extension in PLAYER_FILES.values()],
+                                                 self._settings["playerdata-backups-force-after-skips"])
+
+        self.__catalog = MCSMCatalog(self._server_files_path)
+        self.__retention = MCSMRetention(logger, self.__catalog)
+        self.__import_existing_backups()
+
+
+    def schedule(self, scheduler: MCSMScheduler):
         """
-        Starts the playerdata backups system taking into account the
+        Adds the playerdata backups to the scheduler taking into account the
         defined settings for conditioning the system.
+        :param scheduler: The scheduler that runs the playerdata backups.
         :return:
         """
+        self.__scheduler = scheduler
 
         # If the playerdata backups are set to False in the configs, don't do any backups.
-        if self._settings["playerdata-backups"] == "False":
+        if not self._settings["playerdata-backups"]:
             self.__logger.log("The playerdata backups setting is set to False, so no backups will be made. "
                               "You can change this by going to settings and "
                               "changing the \"PLAYERDATA-BACKUPS\" setting to True.", level="BACKUPS/INFO")
             return
 
-        while True:
-            # Create a playerdata backup and wait for a configured amount of time.
-            saved_path = self.__do_backup()
+        if self.__detector:
+            scheduler.add_console_listener(self.__detector.process_console)
+            self.__detector.start_watching()
+
+        scheduler.add_console_listener(self.__throttle.process_console)
+
+        # Playerdata backups are quick, so they go first when both are due, unless
+        # they are combined, where the world backups go first so they can write both at once.
+        cooldown = self._settings["playerdata-backups-cooldown"]
+        scheduler.add_job("playerdata-backups", self.backup, interval=cooldown, priority=-1 if self.combined else 1,
+                          jitter=min(cooldown * 0.05, 60))
+
+
+    def apply_settings(self, settings: MCSMSettings, changed: set):
+        """
+        Applies new settings to the running playerdata backups, when config.mcsm is changed.
+        :param settings: The new settings.
+        :param changed: The names of the settings that changed.
+        :return: Set, containing the changed settings that only apply after a restart.
+        """
+        self._settings = settings
+
+        # The pack stays where it was opened, since moving it would start a new history.
+        if "playerdata-backups-path" in changed and self.__pack is None:
+            self.__backups_path = self.__get_backups_path()
+            self.__import_existing_backups()
+
+        self.__archive_format = settings["playerdata-backups-format"]
+
+        if changed & {"backups-rate-limit", "backups-adaptive-throttle"}:
+            self.__throttle.set_rate(settings["backups-rate-limit"], settings["backups-adaptive-throttle"])
 
-            # Check if the user wants to be notified about the backup.
-            if self._settings["playerdata-backups-notify"] == "True":
-                self.__logger.log(f"Playerdata Backup created. Saved at '{saved_path}'.",
-                                  level="BACKUPS/INFO")
+        if "playerdata-backups-cooldown" in changed and self.__scheduler:
+            cooldown = settings["playerdata-backups-cooldown"]
+            self.__scheduler.update_job("playerdata-backups", cooldown, min(cooldown * 0.05, 60))
 
-            time.sleep(float(self._settings["playerdata-backups-cooldown"]))
+        # Turning the backups on or off, their mode, and the change detection, are only set up when the MCSM starts.
+        deferred = {"playerdata-backups", "playerdata-backups-mode", "playerdata-backups-combine",
+                    "playerdata-backups-skip-unchanged", "playerdata-backups-force-after-skips"}
+        if self.__pack is not None: deferred.add("playerdata-backups-path")
+        return changed & deferred
 
 
-    def __do_backup(self):
+    def backup(self):
         """
-        Zips the world/playerdata folder and puts the .zip into
-        the playerdata backups path.
+        Creates a playerdata backup, and prunes the old ones in the background.
+        The backup is skipped if no player file changed since the last one.
+        :return: String, describing what was done.
+        """
+        changed, reason = self.check_changes()
+        if not changed: return f"skipped, {reason}"
+
+        # The backups run in their own thread, so only the backups are affected by the lower priority.
+        MCSMThrottle.lower_priority(*MCSMThrottle.load_priority(self._settings))
+
+        if self.__pack is not None:
+            self.__do_pack_backup()
+            if self.__detector: self.__detector.commit()
+            return f"saved, {reason}"
+
+        # The size of the backup is estimated from the previous ones, so a full disk is found before writing it.
+        policy = MCSMRetention.load_policy(self._settings, "playerdata-backups")
+        expected_size = self.__catalog.estimate_size("playerdata") or 0
+        fits, free_bytes = self.__retention.make_room("playerdata", policy, self.__backups_path, expected_size)
+        if not fits:
+            self.__logger.log(f"Playerdata Backup skipped, it needs about {expected_size:,} bytes, but only "
+                              f"{free_bytes:,} bytes are free and {policy['reserved']:,} are kept free for the "
+                              f"server. Free some space or keep less backups.", level="BACKUPS/WARN")
+            return "skipped, not enough disk space"
+
+        started = time.perf_counter()
+        consumed_bytes, throttled_time = self.__throttle.consumed_bytes, self.__throttle.throttled_time
+
+        # The archiving runs in a worker process, so it never holds up the server output.
+        output_path, archive_format, created = self.start_archive()
+        worker = MCSMArchiveWorker(self.__logger, self.__throttle, MCSMThrottle.load_priority(self._settings),
+                                   self._settings["backups-worker-process"])
+        worker.add_output(output_path, archive_format, "world/playerdata", expected_size=expected_size)
+
+        # If it fails, nothing is left behind, since a backup outside the catalog is never pruned.
+        try:
+            index = worker.run(os.path.join(self._server_files_path, "world", "playerdata"), "world/playerdata")[0]
+        except BaseException:
+            self.abort_archive(output_path)
+            raise
+
+        self.finish_archive(output_path, index, created)
+
+        # Keeps how fast the backup was, and how long it waited on the rate limit.
+        duration = time.perf_counter() - started
+        self.__catalog.set_performance(output_path, duration,
+                                       (self.__throttle.consumed_bytes - consumed_bytes) / duration if duration > 0 else 0,
+                                       self.__throttle.throttled_time - throttled_time)
+        return f"saved, {reason}"
+
+
+    def check_changes(self):
+        """
+        Checks if any player file changed since the last playerdata backup, logging why it is skipped if not.
+        :return: Tuple, containing a boolean, True if a backup should be made, and the reason why.
+        """
+        changed, reason = self.__detector.check() if self.__detector else (True, "skipping is disabled")
+        if not changed:
+            self.__logger.log(f"Playerdata Backup skipped, {reason}.", level="BACKUPS/INFO", console=False)
+
+        return changed, reason
+
+
+    def start_archive(self):
+        """
+        Picks the path of a new playerdata backup archive inside the playerdata backups path.
+        The world backups use this to write it while they archive the world.
+        :return: Tuple, containing the path of the archive, its format and the time of the backup.
+        """
+        created = time.time()
+        output_path = self.__catalog.new_backup_path(self.__backups_path, f".{self.__archive_format}")
+        return output_path, self.__archive_format, created
+
+
+    def abort_archive(self, output_path: str):
+        """
+        Deletes a playerdata backup archive that couldn't be written completely, along with its manifest.
+        The player files are still taken as changed, so the next check backs them up again.
+        :param output_path: The path of the archive.
+        :return:
+        """
+        for path in [output_path, output_path + MANIFEST_SUFFIX]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+    def finish_archive(self, output_path: str, index: list, created: float):
+        """
+        Registers a written playerdata backup archive, and prunes the old ones in the background.
+        The player files it holds become the base of the next check for changes.
+        :param output_path: The path of the archive.
+        :param index: The index of the files inside the archive.
+        :param created: The time of the backup.
+        :return:
+        """
+        self.__catalog.add_backup("playerdata", output_path, created, os.path.getsize(output_path),
+                                  sum(member["size"] for member in index), len(index))
+
+        # Only a saved backup becomes the base of the next check, so a failed one is tried again.
+        if self.__detector: self.__detector.commit()
+
+        # Deletes the playerdata backups that aren't kept by the retention policy in the background.
+        policy = MCSMRetention.load_policy(self._settings, "playerdata-backups")
+        threading.Thread(target=self.__retention.prune, args=("playerdata", policy), daemon=True).start()
+
+        # Check if the user wants to be notified about the backup.
+        if self._settings["playerdata-backups-notify"]:
+            self.__logger.log(f"Playerdata Backup created. Saved at '{output_path}'.",
+                              level="BACKUPS/INFO")
+
+
+    def __get_backups_path(self):
+        """
+        Picks the folder the playerdata backups are saved into from the settings, creating it if needed.
+        :return: String, the path of the folder.
+        """
+        if not self._settings["playerdata-backups-path"] or not os.path.exists(self._settings["playerdata-backups-path"]):
+            backups_path = os.path.join(self._server_files_path, "MCSM-Backups", "Playerdata")
+            self.__logger.log(f"Playerdata Backups path is unspecified or does not exist. "
+                              f"Defaulted to {backups_path}.", level="BACKUPS/WARN")
+        else:
+            backups_path = self._settings["playerdata-backups-path"]
+
+        os.makedirs(backups_path, exist_ok=True)
+        return backups_path
+
+
+    def __import_existing_backups(self):
+        """
+        Registers the playerdata backups made before the catalog existed into it.
         :return:
         """
-        world_folder = os.path.join(self._server_files_path, "world", "playerdata")
-        now = datetime.now()
-        backup_filename = f"{now.year}-{now.month}-{now.day}.{now.hour}.{now.minute}.tar.gz"
-        output_path = os.path.join(self.__backups_path, backup_filename)
+        self.__catalog.import_existing("playerdata", [os.path.join(self.__backups_path, item)
+                                                      for item in os.listdir(self.__backups_path)
+                                                      if item.endswith((".tar.gz", ".zip"))])
 
-        # Prevents two playerdata backups with the same name
-        if os.path.isfile(output_path):
-            os.remove(output_path)
 
-        # Makes the playerdata backup, filtering out the session.lock file.
-        with tarfile.open(output_path, "w:gz") as tar:
-            tar.add(world_folder, arcname="")
+    def __do_pack_backup(self):
+        """
+        Appends the player files that changed since the last backup into the playerdata pack.
+        The pack keeps every version, so the retention policy doesn't apply to it.
+        :return:
+        """
+        started = time.time()
+        appended_files, appended_bytes = self.__pack.append(os.path.join(self._server_files_path, "world"), started,
+                                                            self.__throttle)
 
-        return output_path
+        # Check if the user wants to be notified about the backup.
+        if self._settings["playerdata-backups-notify"]:
+            self.__logger.log(f"Playerdata Backup created. Saved {appended_files} changed files "
+                              f"({appended_bytes:,} bytes) into '{self.__pack.pack_path}' in "
+                              f"{round(time.time() - started, 2)}s.", level="BACKUPS/INFO")
 
 
 
@@ -0,0 +1,195 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from datetime import datetime
+import os
+import shutil
+import sys
+import time
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# Third Party Imports
+# Local Application Imports
+from exceptions import CorruptBackup
+from MCSMLogger import MCSMLogger
+from MCSMCatalog import MCSMCatalog
+from MCSMArchive import MCSMArchive
+from MCSMPlayerPack import MCSMPlayerPack
+
+
+class MCSMRestorer:
+    """
+    This class implements the restoring of the whole world to a point in time. The newest world backup
+    made before that time is the base, and the newer playerdata backups bring the players closer to it.
+    Everything is extracted into a staging folder next to the world and checked against the saved hashes,
+    and only then swapped into place, so a failed restore never touches the current world.
+    """
+
+    def __init__(self, logger: MCSMLogger, catalog: MCSMCatalog, pack: MCSMPlayerPack = None):
+        self.__logger = logger
+        self.__catalog = catalog
+        self.__pack = pack
+
+
+    def compose(self, moment: float = None, backup_path: str = None):
+        """
+        Picks the backups the world is restored from, in the order they are extracted.
+        :param moment: The point in time to restore the world to, or None for the newest backups.
+        :param backup_path: The world backup to restore from, instead of picking one by time.
+        :return: List, containing a (backup, folder inside the world) tuple for every backup, or None if there is none.
+        """
+        if backup_path:
+            backup_path = os.path.abspath(backup_path)
+            base = self.__catalog.get_backup(backup_path) or \
+                {"kind": "server", "path": backup_path, "created": os.path.getmtime(backup_path), "source_bytes": None}
+        else:
+            candidates = [backup for kind in ("server", "snapshot") for backup in self.__catalog.get_backups(kind)
+                          if os.path.exists(backup["path"]) and (moment is None or backup["created"] <= moment)]
+            if not candidates: return None
+            base = max(candidates, key=lambda backup: backup["created"])
+
+        # A playerdata backup made after the world backup, and before the time, has newer players.
+        overlays = [backup for backup in self.__catalog.get_backups("playerdata")
+                    if os.path.exists(backup["path"]) and base["created"] < backup["created"]
+                    and (moment is None or backup["created"] <= moment)]
+
+        plan = [(base, "")]
+        if overlays: plan.append((max(overlays, key=lambda backup: backup["created"]), "playerdata"))
+        return plan
+
+
+    def restore(self, world_folder: str, plan: list, moment: float = None, workers: int = 4,
+                discard_current: bool = False):
+        """
+        Restores the world from the given backups, replacing the current world. The server must be stopped.
+        :param world_folder: The world folder to restore.
+        :param plan: The backups to restore from, as returned by compose.
+        :param moment: The point in time the world is restored to, used for the playerdata pack.
+        :param workers: The amount of files extracted at the same time.
+        :param discard_current: If set to True, the current world is deleted once replaced, instead of kept aside.
+        :return: Dictionary, containing the amount of files and bytes restored, the duration and the throughput,
+        or None if the world couldn't be restored.
+        """
+        if self.is_server_running(world_folder):
+            self.__logger.log("The server is running, stop it before restoring the world.", level="COMMANDS/ERROR")
+            return None
+
+        # The staging folder sits next to the world, so it can be renamed into place at once.
+        staging_folder = world_folder + ".restoring"
+        shutil.rmtree(staging_folder, ignore_errors=True)
+
+        needed_bytes = plan[0][0].get("source_bytes") or 0
+        free_bytes = shutil.disk_usage(os.path.dirname(world_folder)).free
+        if needed_bytes > free_bytes:
+            self.__logger.log(f"The world takes {needed_bytes:,} bytes, but only {free_bytes:,} bytes are free.",
+                              level="COMMANDS/ERROR")
+            return None
+
+        started = time.perf_counter()
+        files, size = 0, 0
+
+        try:
+            for backup, folder in plan:
+                archive = MCSMArchive(backup["path"], MCSMCatalog.ROOTS[backup["kind"]])
+                backup_files, backup_size = archive.extract_all(os.path.join(staging_folder, folder), workers)
+                files, size = files + backup_files, size + backup_size
+                self.__logger.log(f"Extracted {backup_files:,} files from '{backup['path']}', from "
+                                  f"{datetime.fromtimestamp(backup['created']).strftime('%d/%m/%Y %H:%M:%S')}.",
+                                  level="COMMANDS/INFO")
+
+            # The playerdata pack can bring the players even closer to the time than the backups.
+            if self.__pack is not None:
+                since = plan[-1][0]["created"]
+                restored_paths = [path for uuid in self.__pack.get_players()
+                                  for path in self.__pack.restore(uuid, staging_folder, moment, since)]
+                files, size = files + len(restored_paths), size + sum(os.path.getsize(path) for path in restored_paths)
+                if restored_paths:
+                    self.__logger.log(f"Restored {len(restored_paths):,} newer player files from the playerdata pack.",
+                                      level="COMMANDS/INFO")
+
+            extract_duration = time.perf_counter() - started
+            swap_started = time.perf_counter()
+            replaced_folder = self.__swap(world_folder, staging_folder)
+            swap_duration = time.perf_counter() - swap_started
+
+        except CorruptBackup as error:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            self.__logger.log(f"The world wasn't restored, the current world was left as it was. {error}",
+                              level="COMMANDS/ERROR")
+            return None
+
+        except BaseException:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            raise
+
+        if replaced_folder and discard_current:
+            shutil.rmtree(replaced_folder, ignore_errors=True)
+        elif replaced_folder:
+            self.__logger.log(f"The replaced world was kept at '{replaced_folder}'.", level="COMMANDS/INFO")
+
+        throughput = size / extract_duration if extract_duration > 0 else 0
+        self.__logger.log(f"Restored {files:,} files ({round(size / (1024 * 1024), 1)} MB) in "
+                          f"{round(extract_duration, 2)}s at {round(throughput / (1024 * 1024), 1)} MB/s "
+                          f"with {workers} workers, swapped into place in {round(swap_duration * 1000, 1)}ms.",
+                          level="COMMANDS/INFO")
+
+        return {"files": files, "bytes": size, "duration": extract_duration, "throughput": throughput,
+                "swap_duration": swap_duration}
+
+
+    @staticmethod
+    def is_server_running(world_folder: str):
+        """
+        Checks if a server is running the world, through the lock it holds on the session.lock file.
+        :param world_folder: The world folder.
+        :return: Boolean, True if the world is in use.
+        """
+        session_lock = os.path.join(world_folder, "session.lock")
+        if not os.path.exists(session_lock): return False
+
+        try:
+            with open(session_lock, "r+b") as lock_file:
+                if sys.platform == "win32":
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.lockf(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    fcntl.lockf(lock_file.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            return True
+
+        return False
+
+
+    @staticmethod
+    def __swap(world_folder: str, staging_folder: str):
+        """
+        Moves the restored world into place. Both moves are renames inside the same folder,
+        so the world is never left half-replaced, and is moved back if the second one fails.
+        :param world_folder: The world folder.
+        :param staging_folder: The folder holding the restored world.
+        :return: String, the path the replaced world was moved to, or None if there was no world.
+        """
+        if not os.path.exists(world_folder):
+            os.rename(staging_folder, world_folder)
+            return None
+
+        replaced_folder = f"{world_folder}.replaced-{datetime.now().strftime('%Y.%m.%d.%H.%M.%S.%f')}"
+        os.rename(world_folder, replaced_folder)
+
+        try:
+            os.rename(staging_folder, world_folder)
+        except OSError:
+            os.rename(replaced_folder, world_folder)
+            raise
+
+        return replaced_folder
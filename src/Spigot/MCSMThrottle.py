@@ -0,0 +1,237 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from collections import deque
+import ctypes
+import os
+import platform
+import sys
+import threading
+import time
+
+# Third Party Imports
+# Local Application Imports
+from MCSMSettings import MCSMSettings
+
+
+# The message the server logs when its ticks fall behind.
+LAG_MESSAGE = "Can't keep up!"
+
+# The lowest rate the adaptive throttling slows down to, so the backups always finish.
+MINIMUM_RATE = 1024 * 1024
+
+# The amount of seconds without lag after which the adaptive rate is doubled back up.
+RECOVERY_SECONDS = 30
+
+# The amount of recent seconds the rate is measured over, when the adaptive throttling starts without a limit.
+RATE_WINDOW = 10
+
+# The I/O scheduling classes of Linux, as used by ioprio_set. ("none" leaves the priority as it is)
+IO_CLASSES = {"none": 0, "best-effort": 2, "idle": 3}
+
+# The number of the ioprio_set syscall in each architecture, since Python has no wrapper for it.
+IOPRIO_SET_SYSCALLS = {"x86_64": 251, "amd64": 251, "aarch64": 30, "arm64": 30, "i386": 289, "i686": 289}
+
+
+class MCSMThrottle:
+    """
+    This class implements a byte rate limiter, which can be shared between threads
+    to keep the disk usage of the backups system from hurting the running server.
+    A limit of 0 bytes per second means no limit. In adaptive mode, the limit is
+    halved whenever the server lags behind during a backup, and slowly raised back.
+    """
+
+    def __init__(self, bytes_per_second: float = 0, adaptive: bool = False):
+        self.bytes_per_second = bytes_per_second
+        self.base_rate = bytes_per_second
+        self.adaptive = adaptive
+        self.throttled_time = 0.0
+        self.consumed_bytes = 0
+        self.lag_events = 0
+        self.__lock = threading.Lock()
+        self.__next_slot = time.monotonic()
+        self.__last_consume = None
+        self.__last_lag = None
+        self.__ceiling = bytes_per_second
+        self.__recent_bytes = deque()  # [second, bytes], for the last RATE_WINDOW seconds
+
+
+    def consume(self, amount: int):
+        """
+        Accounts for a given amount of bytes that were read or written,
+        sleeping for as long as needed to stay under the rate limit.
+        :param amount: The amount of bytes.
+        :return:
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.__account(amount, now)
+            if self.bytes_per_second <= 0: return
+
+            # Every caller gets the next free time slot, sized by the amount of bytes it used.
+            slot = max(self.__next_slot, now)
+            self.__next_slot = slot + amount / self.bytes_per_second
+
+        delay = slot - now
+        if delay <= 0: return
+
+        time.sleep(delay)
+        with self.__lock:
+            self.throttled_time += delay
+
+
+    def record(self, amount: int, throttled_time: float = 0.0):
+        """
+        Accounts for an amount of bytes that were already rate limited somewhere else, (e.g. by the
+        worker process of a backup, which follows this limit) so the adaptive throttling still sees them.
+        :param amount: The amount of bytes.
+        :param throttled_time: The amount of seconds spent waiting on the limit to use them.
+        :return:
+        """
+        with self.__lock:
+            self.__account(amount, time.monotonic())
+            self.throttled_time += throttled_time
+
+
+    def set_rate(self, bytes_per_second: float, adaptive: bool):
+        """
+        Changes the rate limit, (e.g. when the settings are reloaded) dropping any slowdown in place.
+        :param bytes_per_second: The new limit, 0 for no limit.
+        :param adaptive: If set to True, the limit is lowered while the server lags.
+        :return:
+        """
+        with self.__lock:
+            self.bytes_per_second = self.base_rate = self.__ceiling = bytes_per_second
+            self.adaptive = adaptive
+            self.__last_lag = None
+
+
+    def process_console(self, message: str):
+        """
+        Slows down the backups when the server reports it can't keep up while they are running.
+        :param message: The message logged by the server.
+        :return:
+        """
+        if not self.adaptive or not message.startswith(LAG_MESSAGE): return
+
+        with self.__lock:
+            now = time.monotonic()
+
+            # The lag has nothing to do with the backups if no bytes went through in the last seconds.
+            if self.__last_consume is None or now - self.__last_consume > 5: return
+
+            # Without a limit, the slowdown starts from the rate measured over the last seconds only,
+            # so the time between backups, where nothing went through, doesn't drag it down.
+            if self.bytes_per_second <= 0:
+                self.__drop_old_bytes(now)
+                measured_time = max(now - self.__recent_bytes[0][0], 1) if self.__recent_bytes else 1
+                self.__ceiling = sum(amount for second, amount in self.__recent_bytes) / measured_time
+                self.bytes_per_second = self.__ceiling
+
+            self.bytes_per_second = max(self.bytes_per_second / 2, MINIMUM_RATE)
+            self.lag_events += 1
+            self.__last_lag = now
+
+
+    def __account(self, amount: int, now: float):
+        """
+        Adds an amount of bytes into the totals, and raises the adaptive rate back if it is time to.
+        Must be called while holding the lock.
+        :param amount: The amount of bytes.
+        :param now: The current monotonic time.
+        :return:
+        """
+        self.consumed_bytes += amount
+        self.__last_consume = now
+
+        if self.__recent_bytes and self.__recent_bytes[-1][0] == int(now):
+            self.__recent_bytes[-1][1] += amount
+        else:
+            self.__recent_bytes.append([int(now), amount])
+
+        self.__drop_old_bytes(now)
+        self.__recover(now)
+
+
+    def __drop_old_bytes(self, now: float):
+        """
+        Forgets the bytes that went through before the last RATE_WINDOW seconds.
+        Must be called while holding the lock.
+        :param now: The current monotonic time.
+        :return:
+        """
+        while self.__recent_bytes and self.__recent_bytes[0][0] <= now - RATE_WINDOW:
+            self.__recent_bytes.popleft()
+
+
+    def __recover(self, now: float):
+        """
+        Doubles the adaptive rate back up after a while without lag, until it reaches the original limit.
+        Must be called while holding the lock.
+        :param now: The current monotonic time.
+        :return:
+        """
+        if self.__last_lag is None or now - self.__last_lag < RECOVERY_SECONDS: return
+
+        self.bytes_per_second *= 2
+        self.__last_lag = now
+
+        if self.bytes_per_second >= self.__ceiling:
+            self.bytes_per_second = self.base_rate
+            self.__last_lag = None
+
+
+    @staticmethod
+    def lower_priority(io_class: str = "idle", io_level: int = 7, niceness: int = 10):
+        """
+        Lowers the CPU and I/O priority of the calling thread, so the server gets the disk first.
+        Both only apply to the calling thread on Linux, (elsewhere, they would pile up on the whole MCSM
+        every run, so nothing is done) and can't be raised back without permissions, so this should be
+        called from a thread that only runs the backups.
+        :param io_class: The I/O scheduling class. ("none", "best-effort" or "idle")
+        :param io_level: The priority inside the best-effort class, from 0 (highest) to 7 (lowest).
+        :param niceness: The amount of niceness to add to the thread. (0 leaves the CPU priority as it is)
+        :return: Boolean, True if any priority was lowered.
+        """
+        if not sys.platform.startswith("linux"): return False
+        lowered = False
+
+        if niceness > 0:
+            try:
+                os.nice(niceness)
+                lowered = True
+            except OSError:
+                pass
+
+        syscall = IOPRIO_SET_SYSCALLS.get(platform.machine().lower())
+        if not IO_CLASSES.get(io_class) or syscall is None: return lowered
+
+        # ioprio_set(IOPRIO_WHO_PROCESS, 0, priority), where 0 is the calling thread.
+        level = min(max(io_level, 0), 7) if io_class == "best-effort" else 0
+        return ctypes.CDLL(None, use_errno=True).syscall(syscall, 1, 0, IO_CLASSES[io_class] << 13 | level) == 0 \
+            or lowered
+
+
+    @staticmethod
+    def load(settings: MCSMSettings):
+        """
+        Creates the rate limiter of the backups from the settings.
+        :param settings: The loaded settings.
+        :return: MCSMThrottle
+        """
+        return MCSMThrottle(settings["backups-rate-limit"], settings["backups-adaptive-throttle"])
+
+
+    @staticmethod
+    def load_priority(settings: MCSMSettings):
+        """
+        Loads the priority the backups should run with from the settings.
+        :param settings: The loaded settings.
+        :return: Tuple, containing the I/O class, the I/O level and the niceness, as taken by lower_priority.
+        """
+        return settings["backups-io-class"], settings["backups-io-level"], settings["backups-niceness"]
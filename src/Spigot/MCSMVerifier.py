@@ -0,0 +1,72 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+# Third Party Imports
+# Local Application Imports
+from MCSMLogger import MCSMLogger
+from MCSMCatalog import MCSMCatalog
+from MCSMArchive import MCSMArchive
+from MCSMThrottle import MCSMThrottle
+
+
+class MCSMVerifier:
+    """
+    This class implements the verification of existing backups. The backups are read in
+    parallel by a pool of workers sharing a single rate limit, so verifying doesn't hurt the
+    running server, and the results are saved into the catalog.
+    """
+
+    def __init__(self, logger: MCSMLogger, catalog: MCSMCatalog):
+        self.__logger = logger
+        self.__catalog = catalog
+
+
+    def verify(self, backups: list, workers: int = 2, rate_limit: float = 0):
+        """
+        Verifies a list of backups.
+        :param backups: The backups to verify, as returned by the catalog.
+        :param workers: The amount of backups verified at the same time.
+        :param rate_limit: The maximum amount of bytes per second read between all the workers. (0 for no limit)
+        :return: List, containing the result of every verification.
+        """
+        throttle = MCSMThrottle(rate_limit)
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            return list(pool.map(lambda backup: self.__verify_backup(backup, throttle), backups))
+
+
+    def __verify_backup(self, backup: dict, throttle: MCSMThrottle):
+        """
+        Verifies a single backup, saving the result into the catalog.
+        :param backup: The backup to verify.
+        :param throttle: The rate limiter shared by the workers.
+        :return: Dictionary, containing the path, status, problems, duration and throughput of the verification.
+        """
+        started = time.perf_counter()
+
+        if os.path.exists(backup["path"]):
+            result = MCSMArchive(backup["path"], MCSMCatalog.ROOTS[backup["kind"]]).verify(throttle)
+        else:
+            result = {"status": "corrupt", "problems": ["The backup doesn't exist."], "bytes": 0}
+
+        duration = time.perf_counter() - started
+        throughput = result["bytes"] / duration if duration > 0 else 0
+        self.__catalog.set_verification(backup["path"], result["status"], duration, throughput)
+
+        level = "VERIFY/ERROR" if result["status"] == "corrupt" else "VERIFY/INFO"
+        self.__logger.log(f"{backup['path']}: {result['status']} in {round(duration, 2)}s "
+                          f"({round(throughput / (1024 * 1024), 1)} MB/s).", level=level)
+
+        for problem in result["problems"]:
+            self.__logger.log(problem, level=level)
+
+        return {"path": backup["path"], "duration": duration, "throughput": throughput, **result}
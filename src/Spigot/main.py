@@ -6,28 +6,58 @@ __copyright__ = "
 __license__ = "GNU GENERAL PUBLIC LICENSE v3"
 
 # Built-in Imports
+import multiprocessing
 import threading
 import traceback
 import os
+import sys
 
 # Third Party Imports
 # Local Application Imports
 import exceptions
+from MCSMConfig import MCSMConfig
 from MCSMServer import MCSMServer
 from MCSMBackups import MCSMBackups
 from MCSMPlayerdataBackups import MCSMPlayerdataBackups
 from MCSMLogger import MCSMLogger
+from MCSMScheduler import MCSMScheduler
+from MCSMCommands import MCSMCommands
+from MCSMAffinity import MCSMAffinity
 
 if __name__ == "__main__":
 
+    # Lets the frozen executable start the backup worker processes, instead of running the MCSM again.
+    multiprocessing.freeze_support()
+
+    # Runs a command instead of the server if one was given. (e.g. "MCSM.exe list")
+    if len(sys.argv) > 1:
+        commands_logger = MCSMLogger("commands.log")
+        MCSMCommands(commands_logger, MCSMConfig(commands_logger).settings).run(sys.argv[1:])
+        sys.exit()
+
     try:
         print("-"*125)
         logger = MCSMLogger()
-        backups_thread = threading.Thread(target=MCSMBackups(logger).start, daemon=True)
-        playerdata_backups_thread = threading.Thread(target=MCSMPlayerdataBackups(logger).start, daemon=True)
-        playerdata_backups_thread.start()
-        backups_thread.start()
-        MCSMServer(logger).start()
+
+        # The config file is parsed once, and every component gets the same snapshot of the settings.
+        config = MCSMConfig(logger)
+        settings = config.settings
+
+        # The MCSM is moved onto its cores before starting any thread, so every thread and worker process keeps them.
+        affinity = MCSMAffinity(logger, settings)
+        affinity.apply()
+        scheduler = MCSMScheduler(logger)
+        playerdata_backups = MCSMPlayerdataBackups(logger, settings)
+        playerdata_backups.schedule(scheduler)
+        backups = MCSMBackups(logger, settings)
+        backups.schedule(scheduler, playerdata_backups)
+
+        # Changes to the config file are applied to the backups without restarting the server.
+        config.subscribe(playerdata_backups.apply_settings)
+        config.subscribe(backups.apply_settings)
+        config.watch()
+        threading.Thread(target=scheduler.start, daemon=True).start()
+        MCSMServer(logger, scheduler, settings, affinity).start()
 
     except:
         # Resorts to directly writing a crude fatal traceback log into the
@@ -0,0 +1,227 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import multiprocessing
+import threading
+import time
+import traceback
+
+# Third Party Imports
+# Local Application Imports
+from exceptions import ArchiveWorkerError
+from MCSMLogger import MCSMLogger
+from MCSMThrottle import MCSMThrottle
+from MCSMPathRules import MCSMPathRules
+from MCSMArchive import MCSMArchiveWriter, MCSMArchivePipeline
+
+
+# The amount of seconds between every progress report of the worker process.
+PROGRESS_INTERVAL = 0.5
+
+# The amount of seconds between every progress line written into the logs.
+PROGRESS_LOG_INTERVAL = 60
+
+
+class MCSMArchiveWorker:
+    """
+    This class implements the archiving of a folder in a separate process, so walking, reading,
+    compressing and writing the backups never competes with the server output for the interpreter.
+    The worker reports its progress back over a pipe, and follows the rate limit of the given throttle,
+    which keeps seeing every byte the worker uses, so the adaptive throttling still works.
+    """
+
+    def __init__(self, logger: MCSMLogger, throttle: MCSMThrottle = None, priority: tuple = None,
+                 separate_process: bool = True):
+        self.__logger = logger
+        self.__throttle = throttle
+        self.__priority = priority
+        self.__separate_process = separate_process
+        self.__outputs = list()
+        self.read_bytes = 0
+        self.shared_bytes = 0
+        self.files = 0
+
+
+    def add_output(self, output_path: str, archive_format: str, prefix: str, rules: MCSMPathRules = None,
+                   expected_size: int = 0):
+        """
+        Adds an archive to be written by the worker, the same way as MCSMArchivePipeline.add_output.
+        :param output_path: The path of the archive.
+        :param archive_format: The format of the archive. (tar.gz or zip)
+        :param prefix: The folder that goes into this archive, by its name inside the archives.
+        :param rules: The rules choosing which files are left out of this archive.
+        :param expected_size: The size the archive is expected to reach, reserved on the disk before writing it.
+        :return:
+        """
+        self.__outputs.append((output_path, archive_format, prefix, rules, expected_size))
+
+
+    def run(self, folder: str, arcname: str):
+        """
+        Archives the folder into every output inside a worker process, waiting for it to finish.
+        :param folder: The folder to archive.
+        :param arcname: The name of the folder inside the archives. (e.g. "world")
+        :return: List, containing the index of every output, in the order they were added.
+        """
+        if not self.__separate_process: return self.__run_here(folder, arcname)
+
+        # A fresh interpreter is spawned instead of forked, since forking a process running threads isn't safe.
+        context = multiprocessing.get_context("spawn")
+        connection, worker_connection = context.Pipe()
+        rate = self.__throttle.bytes_per_second if self.__throttle else 0
+        process = context.Process(target=_archive, name="MCSM-Archive-Worker", daemon=True,
+                                  args=(worker_connection, self.__outputs, folder, arcname, rate, self.__priority))
+
+        try:
+            process.start()
+        except OSError:
+            connection.close()
+            self.__logger.log(f"Couldn't start the archive worker, archiving in the MCSM instead.\n"
+                              f"{traceback.format_exc()}", level="BACKUPS/WARN", console=False)
+            return self.__run_here(folder, arcname)
+        finally:
+            worker_connection.close()
+
+        try:
+            return self.__follow(connection, process)
+        finally:
+            connection.close()
+            process.join(5)
+            if process.is_alive(): process.kill()
+
+
+    def __run_here(self, folder: str, arcname: str):
+        """
+        Archives the folder into every output from the calling thread.
+        :param folder: The folder to archive.
+        :param arcname: The name of the folder inside the archives.
+        :return: List, containing the index of every output.
+        """
+        pipeline = MCSMArchivePipeline(self.__throttle)
+        writers = list()
+        completed = False
+
+        try:
+            for output_path, archive_format, prefix, rules, expected_size in self.__outputs:
+                writers.append(MCSMArchiveWriter(output_path, archive_format, self.__throttle, expected_size))
+                pipeline.add_output(writers[-1], prefix, rules)
+
+            pipeline.run(folder, arcname)
+            completed = True
+        finally:
+            for writer in writers:
+                writer.close(completed)
+
+        self.read_bytes, self.shared_bytes = pipeline.read_bytes, pipeline.shared_bytes
+        self.files = sum(len(writer.index) for writer in writers)
+        return [writer.index for writer in writers]
+
+
+    def __follow(self, connection, process):
+        """
+        Follows the worker process until it finishes, accounting for the bytes it uses and
+        passing it any change of the rate limit.
+        :param connection: The end of the pipe to the worker.
+        :param process: The worker process.
+        :return: List, containing the index of every output.
+        """
+        rate = self.__throttle.bytes_per_second if self.__throttle else 0
+        last_log = time.monotonic()
+
+        while True:
+            try:
+                if not connection.poll(PROGRESS_INTERVAL * 2): continue
+                message = connection.recv()
+            except EOFError:
+                process.join(5)
+                raise ArchiveWorkerError(f"The archive worker stopped without finishing. (exit code {process.exitcode})")
+
+            if message[0] == "error":
+                raise ArchiveWorkerError(f"The archive worker failed.\n{message[1]}")
+
+            consumed_bytes, throttled_time, self.files = message[1:4]
+            if self.__throttle: self.__throttle.record(consumed_bytes, throttled_time)
+
+            if message[0] == "done":
+                self.read_bytes, self.shared_bytes = message[4:6]
+                return message[6]
+
+            # The adaptive throttling slows down the backups from here, so the worker is told the new rate.
+            if self.__throttle and self.__throttle.bytes_per_second != rate:
+                rate = self.__throttle.bytes_per_second
+                connection.send(("rate", rate))
+
+            if time.monotonic() - last_log >= PROGRESS_LOG_INTERVAL:
+                last_log = time.monotonic()
+                self.__logger.log(f"Backup in progress, {self.files:,} files archived so far.",
+                                  level="BACKUPS/INFO", console=False)
+
+
+def _archive(connection, outputs: list, folder: str, arcname: str, rate: float, priority: tuple):
+    """
+    Archives a folder into the given outputs. This is the entry point of the worker process.
+    Reports are sent as ("progress", consumed bytes, throttled time, files) every so often,
+    and a final ("done", ..., read bytes, shared bytes, indexes) or ("error", traceback).
+    :param connection: The end of the pipe to the MCSM.
+    :param outputs: The outputs, as given to MCSMArchiveWorker.add_output.
+    :param folder: The folder to archive.
+    :param arcname: The name of the folder inside the archives.
+    :param rate: The rate limit to start with, in bytes per second.
+    :param priority: The I/O and CPU priority to run with, as taken by MCSMThrottle.lower_priority.
+    :return:
+    """
+    # The priority is lowered before the reporter starts, so every thread of the worker runs with it.
+    if priority: MCSMThrottle.lower_priority(*priority)
+
+    throttle = MCSMThrottle(rate)
+    writers = list()
+    finished = threading.Event()
+    reported = [0, 0.0]
+
+    def report(kind: str, *extra):
+        consumed_bytes, throttled_time = throttle.consumed_bytes, throttle.throttled_time
+        connection.send((kind, consumed_bytes - reported[0], throttled_time - reported[1],
+                         sum(len(writer.index) for writer in writers), *extra))
+        reported[:] = consumed_bytes, throttled_time
+
+    def reporter():
+        while not finished.wait(PROGRESS_INTERVAL):
+            report("progress")
+
+            # Picks up the changes of the rate limit, the last one sent is the current one.
+            while connection.poll():
+                throttle.bytes_per_second = connection.recv()[1]
+
+    thread = threading.Thread(target=reporter, daemon=True)
+
+    try:
+        pipeline = MCSMArchivePipeline(throttle)
+        for output_path, archive_format, prefix, rules, expected_size in outputs:
+            writers.append(MCSMArchiveWriter(output_path, archive_format, throttle, expected_size))
+            pipeline.add_output(writers[-1], prefix, rules)
+
+        thread.start()
+        completed = False
+        try:
+            pipeline.run(folder, arcname)
+            completed = True
+        finally:
+            for writer in writers:
+                writer.close(completed)
+
+        finished.set()
+        thread.join()
+        report("done", pipeline.read_bytes, pipeline.shared_bytes, [writer.index for writer in writers])
+
+    except BaseException:
+        finished.set()
+        if thread.is_alive(): thread.join()
+        connection.send(("error", traceback.format_exc()))
+
+    finally:
+        connection.close()
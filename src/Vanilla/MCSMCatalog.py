@@ -0,0 +1,276 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import os
+import sqlite3
+import threading
+import time
+
+# Third Party Imports
+# Local Application Imports
+
+
+class MCSMCatalog:
+    """
+    This class implements a catalog of every backup made by the MCSMs, kept in an
+    SQLite database inside the MCSM-Backups folder. The backups systems and the retention
+    policy use it instead of listing the backups folders and parsing the file names.
+    Removed backups keep their rows, so their sizes and speeds stay as history.
+    """
+
+    # Columns of the backups table. New columns are added to existing catalogs automatically.
+    COLUMNS = {
+        "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "kind": "TEXT NOT NULL",
+        "path": "TEXT NOT NULL UNIQUE",
+        "created": "REAL NOT NULL",
+        "size": "INTEGER NOT NULL DEFAULT 0",
+        "finished": "REAL",
+        "source_bytes": "INTEGER",
+        "file_count": "INTEGER",
+        "removed": "REAL",
+        "verification": "TEXT",
+        "verified_at": "REAL",
+        "verify_duration": "REAL",
+        "verify_throughput": "REAL",
+        "duration": "REAL",
+        "throughput": "REAL",
+        "throttled_time": "REAL",
+    }
+
+    # The folder, relative to the server files, that each type of backup contains.
+    ROOTS = {
+        "server": "world",
+        "snapshot": "world",
+        "playerdata": "world/playerdata",
+    }
+
+    def __init__(self, server_files_path: str):
+        self.catalog_path = os.path.join(server_files_path, "MCSM-Backups", "catalog.db")
+        self.__lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+        self.__ensure_schema()
+
+
+    def add_backup(self, kind: str, path: str, created: float, size: int, source_bytes: int = None,
+                   file_count: int = None, finished: float = None):
+        """
+        Registers a new backup in the catalog.
+        :param kind: The type of the backup. ("server", "snapshot", "playerdata")
+        :param path: The path of the backup file or folder.
+        :param created: Timestamp of when the backup was started.
+        :param size: The amount of bytes the backup takes on disk.
+        :param source_bytes: The amount of bytes of the files that were backed up.
+        :param file_count: The amount of files that were backed up.
+        :param finished: Timestamp of when the backup was done. Defaults to now.
+        :return: Integer, the id of the backup in the catalog.
+        """
+        with self.__connection() as connection:
+            cursor = connection.execute("INSERT OR REPLACE INTO backups (kind, path, created, size, source_bytes, "
+                                        "file_count, finished) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                        (kind, path, created, size, source_bytes, file_count, finished or time.time()))
+            return cursor.lastrowid
+
+
+    def get_backups(self, kind: str, include_removed: bool = False):
+        """
+        Gets all the backups of a given type, from oldest to newest.
+        :param kind: The type of the backups.
+        :param include_removed: If set to True, the backups that were already removed are included.
+        :return: List, containing a dictionary for every backup.
+        """
+        removed_filter = "" if include_removed else " AND removed IS NULL"
+        with self.__connection() as connection:
+            rows = connection.execute(f"SELECT * FROM backups WHERE kind = ?{removed_filter} ORDER BY created, id",
+                                      (kind,))
+            return [dict(row) for row in rows]
+
+
+    def get_backup(self, path: str):
+        """
+        Gets a single backup from the catalog.
+        :param path: The path of the backup file or folder.
+        :return: Dictionary, containing the backup, or None if it isn't in the catalog.
+        """
+        with self.__connection() as connection:
+            row = connection.execute("SELECT * FROM backups WHERE path = ? AND removed IS NULL", (path,)).fetchone()
+            return dict(row) if row else None
+
+
+    def set_verification(self, path: str, status: str, duration: float, throughput: float):
+        """
+        Saves the result of verifying a backup.
+        :param path: The path of the backup file or folder.
+        :param status: The result of the verification. ("verified", "readable" or "corrupt")
+        :param duration: The amount of seconds the verification took.
+        :param throughput: The amount of bytes per second that were verified.
+        :return:
+        """
+        with self.__connection() as connection:
+            connection.execute("UPDATE backups SET verification = ?, verified_at = ?, verify_duration = ?, "
+                               "verify_throughput = ? WHERE path = ?",
+                               (status, time.time(), duration, throughput, path))
+
+
+    def set_performance(self, path: str, duration: float, throughput: float, throttled_time: float):
+        """
+        Saves how long making a backup took, and how much of it was spent being throttled.
+        :param path: The path of the backup file or folder.
+        :param duration: The amount of seconds the backup took.
+        :param throughput: The amount of bytes per second that were read and written.
+        :param throttled_time: The amount of seconds spent waiting on the rate limit.
+        :return:
+        """
+        with self.__connection() as connection:
+            connection.execute("UPDATE backups SET duration = ?, throughput = ?, throttled_time = ? WHERE path = ?",
+                               (duration, throughput, throttled_time, path))
+
+
+    def get_trends(self, kind: str, since: float):
+        """
+        Summarizes the backups of a given type made since a point in time, removed or not,
+        to follow how big and how fast they are over time.
+        :param kind: The type of the backups.
+        :param since: Timestamp of the oldest backup to summarize.
+        :return: Dictionary, containing the amount of backups, the bytes they stored, their average
+        size, source bytes, duration, throughput and throttled time, and the bytes kept on disk right now.
+        """
+        with self.__connection() as connection:
+            trends = dict(connection.execute(
+                "SELECT COUNT(*) AS backups, SUM(size) AS stored_bytes, AVG(size) AS average_size, "
+                "AVG(source_bytes) AS average_source_bytes, AVG(duration) AS average_duration, "
+                "AVG(throughput) AS average_throughput, AVG(throttled_time) AS average_throttled_time "
+                "FROM backups WHERE kind = ? AND created >= ?", (kind, since)).fetchone())
+
+            trends["kept_bytes"] = connection.execute("SELECT COALESCE(SUM(size), 0) FROM backups "
+                                                      "WHERE kind = ? AND removed IS NULL", (kind,)).fetchone()[0]
+            return trends
+
+
+    def estimate_size(self, kind: str, samples: int = 5):
+        """
+        Estimates how big the next backup of a given type will be, from the latest ones, removed or not.
+        Archives are estimated from the latest source bytes and the worst compression ratio among them,
+        and snapshots, which only store the changed bytes, from the biggest among them. A tenth is
+        added on top, since the world keeps growing between backups.
+        :param kind: The type of the backups.
+        :param samples: The amount of latest backups to estimate from.
+        :return: Integer, the estimated size in bytes, or None if there are no backups to estimate from.
+        """
+        with self.__connection() as connection:
+            rows = connection.execute("SELECT size, source_bytes FROM backups WHERE kind = ? AND size IS NOT NULL "
+                                      "ORDER BY created DESC, id DESC LIMIT ?", (kind, samples)).fetchall()
+
+        if not rows: return None
+        ratios = [row["size"] / row["source_bytes"] for row in rows if row["source_bytes"]]
+
+        if kind == "snapshot" or not ratios:
+            estimate = max(row["size"] for row in rows)
+        else:
+            estimate = next(row["source_bytes"] for row in rows if row["source_bytes"]) * max(ratios)
+
+        return int(estimate * 1.1)
+
+
+    def remove_backup(self, path: str):
+        """
+        Marks a backup as removed from the catalog. This doesn't touch the backup itself.
+        The row is kept, so the backup still counts for the trends.
+        :param path: The path of the backup file or folder.
+        :return:
+        """
+        with self.__connection() as connection:
+            connection.execute("UPDATE backups SET removed = ? WHERE path = ?", (time.time(), path))
+
+
+    def import_existing(self, kind: str, paths: list):
+        """
+        Registers backups made before the catalog existed, using their
+        modification time as the creation time. Only runs if the catalog
+        has no backups of the given type yet.
+        :param kind: The type of the backups.
+        :param paths: The paths of the existing backups.
+        :return:
+        """
+        if self.get_backups(kind): return
+
+        for path in paths:
+            self.add_backup(kind, path, os.path.getmtime(path), self.get_size(path), finished=os.path.getmtime(path))
+
+
+    def new_backup_path(self, folder: str, extension: str = ""):
+        """
+        Builds a sortable path for a new backup inside a folder, which doesn't collide
+        with any existing backup, even if two backups are made in the same second.
+        :param folder: The folder where the backup will be saved.
+        :param extension: The extension of the backup file, if any. (e.g. ".tar.gz")
+        :return: String, the path for the new backup.
+        """
+        with self.__connection() as connection:
+            moment = datetime.now()
+
+            while True:
+                path = os.path.join(folder, moment.strftime("%Y-%m-%d.%H.%M.%S.%f") + extension)
+                taken = connection.execute("SELECT 1 FROM backups WHERE path = ?", (path,)).fetchone()
+                if not taken and not os.path.exists(path) and not os.path.exists(path + ".partial"):
+                    return path
+
+                moment += timedelta(microseconds=1)
+
+
+    @staticmethod
+    def get_size(path: str):
+        """
+        Calculates the amount of bytes a backup file or folder takes.
+        :param path: The path of the backup.
+        :return: Integer, the size in bytes.
+        """
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+
+        size = 0
+        for dirpath, dirnames, filenames in os.walk(path):
+            size += sum(os.path.getsize(os.path.join(dirpath, filename)) for filename in filenames)
+        return size
+
+
+    @contextmanager
+    def __connection(self):
+        """
+        Opens a connection to the catalog, committing and closing it once done.
+        :return: sqlite3.Connection
+        """
+        with self.__lock:
+            connection = sqlite3.connect(self.catalog_path, timeout=30)
+            connection.row_factory = sqlite3.Row
+
+            try:
+                yield connection
+                connection.commit()
+            finally:
+                connection.close()
+
+
+    def __ensure_schema(self):
+        """
+        Creates the backups table, and adds any columns missing from it.
+        :return:
+        """
+        with self.__connection() as connection:
+            columns = ", ".join(f"{name} {definition}" for name, definition in self.COLUMNS.items())
+            connection.execute(f"CREATE TABLE IF NOT EXISTS backups ({columns})")
+
+            existing_columns = [row["name"] for row in connection.execute("PRAGMA table_info(backups)")]
+            for name, definition in self.COLUMNS.items():
+                if name not in existing_columns:
+                    connection.execute(f"ALTER TABLE backups ADD COLUMN {name} {definition}")
+
+            # Every query filters by the type and removal, and sorts by the creation time.
+            connection.execute("CREATE INDEX IF NOT EXISTS backups_by_kind ON backups (kind, removed, created)")
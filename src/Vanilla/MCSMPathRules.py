@@ -0,0 +1,123 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import re
+
+# Third Party Imports
+# Local Application Imports
+from MCSMSettings import MCSMSettings
+
+
+# Files that are never backed up. The session.lock is held by the running server.
+ALWAYS_EXCLUDED = ["world/session.lock"]
+
+
+class MCSMPathRules:
+    """
+    This class implements the include and exclude rules of the backups. Rules are glob patterns
+    relative to the server files, (e.g. "world/DIM1" or "world/data/*.dat") where "*" and "?" stay
+    inside a folder and "**" crosses any amount of folders. A rule matching a folder matches
+    everything inside it. Include rules win over exclude rules, to keep a few files of an excluded folder.
+    Every set of rules is compiled into a single regular expression, so matching a path is one lookup.
+    """
+
+    def __init__(self, include: list = (), exclude: list = ()):
+        self.include = [self.__normalize(rule) for rule in include if rule.strip()]
+        self.exclude = [self.__normalize(rule) for rule in exclude if rule.strip()]
+        self.__include_matcher = self.__compile(self.include)
+        self.__exclude_matcher = self.__compile(self.exclude)
+
+        # The folders the include rules can match files in, up to their first wildcard.
+        self.__include_prefixes = [re.split(r"[*?]", rule, maxsplit=1)[0].rsplit("/", 1)[0]
+                                   if re.search(r"[*?]", rule) else rule for rule in self.include]
+
+
+    def excluded_by(self, path: str):
+        """
+        Finds the rule that leaves a path out of the backups.
+        :param path: The path, relative to the server files. (e.g. "world/DIM1/region/r.0.0.mca")
+        :return: String, the exclude rule matching the path, or None if the path is kept.
+        """
+        match = self.__exclude_matcher.match(path) if self.__exclude_matcher else None
+        if match is None: return None
+        if self.__include_matcher and self.__include_matcher.match(path): return None
+
+        return self.exclude[int(match.lastgroup[len("rule"):])]
+
+
+    def can_prune(self, folder: str):
+        """
+        Checks if a whole folder can be skipped, without looking at anything inside it.
+        :param folder: The folder, relative to the server files.
+        :return: Boolean, True if the folder is excluded and no include rule can match anything inside it.
+        """
+        if self.excluded_by(folder) is None: return False
+
+        return not any(prefix == "" or prefix == folder or prefix.startswith(folder + "/")
+                       or folder.startswith(prefix + "/") for prefix in self.__include_prefixes)
+
+
+    @staticmethod
+    def load(settings: MCSMSettings, prefix: str):
+        """
+        Loads the rules of a backups system from the settings, given as comma separated patterns.
+        :param settings: The loaded settings.
+        :param prefix: The prefix of the settings. (e.g. "backups" for "BACKUPS-EXCLUDE")
+        :return: MCSMPathRules
+        """
+        include = settings.get(f"{prefix}-include", ())
+        exclude = ALWAYS_EXCLUDED + list(settings.get(f"{prefix}-exclude", ()))
+        return MCSMPathRules(include, exclude)
+
+
+    @staticmethod
+    def __normalize(rule: str):
+        """
+        Normalizes a rule, so it's written the same way as the paths it's matched against.
+        :param rule: The rule.
+        :return: String, the normalized rule.
+        """
+        rule = rule.strip().replace("\\", "/").strip("/")
+
+        # Matching a folder already matches everything inside it.
+        while rule.endswith("/**"):
+            rule = rule[:-len("/**")]
+
+        return rule
+
+
+    @staticmethod
+    def __compile(rules: list):
+        """
+        Compiles a list of rules into a single regular expression, with a named group
+        for every rule, so the rule that matched can be told apart.
+        :param rules: The normalized rules.
+        :return: re.Pattern, or None if there are no rules.
+        """
+        if not rules: return None
+
+        groups = list()
+        for index, rule in enumerate(rules):
+            expression, position = "", 0
+
+            while position < len(rule):
+                if rule.startswith("**/", position):
+                    expression, position = expression + "(?:.*/)?", position + 3
+                elif rule.startswith("**", position):
+                    expression, position = expression + ".*", position + 2
+                elif rule[position] == "*":
+                    expression, position = expression + "[^/]*", position + 1
+                elif rule[position] == "?":
+                    expression, position = expression + "[^/]", position + 1
+                else:
+                    expression, position = expression + re.escape(rule[position]), position + 1
+
+            groups.append(f"(?P<rule{index}>{expression})")
+
+        # Anything inside a matched folder matches as well.
+        return re.compile(f"(?:{'|'.join(groups)})(?:/.*)?$", re.DOTALL)
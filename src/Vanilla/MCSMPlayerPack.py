@@ -0,0 +1,257 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+import bisect
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+# Third Party Imports
+# Local Application Imports
+from exceptions import CorruptBackup
+from MCSMThrottle import MCSMThrottle
+
+
+# The files saved for every player, as the folder (inside the world) and extension of each kind.
+PLAYER_FILES = {
+    "playerdata": ("playerdata", ".dat"),
+    "stats": ("stats", ".json"),
+    "advancements": ("advancements", ".json"),
+}
+
+
+class MCSMPlayerPack:
+    """
+    This class implements an append-only pack of playerdata backups. Every backup only appends
+    the player files whose contents changed since they were last saved, and an index keeps track
+    of where every version of a file is, by player UUID and time, so a single player can be
+    restored to any point in time by reading just their own files.
+    Only the MCSM backing up the playerdata opens the pack for writing. Everything else (e.g. the commands)
+    opens it read-only, so it never touches the data a running backup is still appending.
+    """
+
+    def __init__(self, pack_folder: str, writable: bool = False):
+        self.pack_path = os.path.join(pack_folder, "players.pack")
+        self.index_path = os.path.join(pack_folder, "players.index")
+        self.writable = writable
+        self.__lock = threading.Lock()
+        self.__entries = dict()  # {uuid: {kind: [entries, oldest first]}}
+
+        if writable: os.makedirs(pack_folder, exist_ok=True)
+        entries, indexed_size, damaged = self.__load_index()
+
+        if writable:
+            with self.__lock:
+                self.__repair(entries, indexed_size, damaged)
+
+
+    def append(self, world_folder: str, created: float, throttle: MCSMThrottle = None):
+        """
+        Appends every player file that changed since it was last saved into the pack.
+        :param world_folder: The world folder holding the player files.
+        :param created: The time of the backup.
+        :param throttle: Limits the rate at which the player files are read.
+        :return: Tuple, containing the amount of files appended and the amount of bytes they take in the pack.
+        """
+        if not self.writable: raise PermissionError(f"The pack at '{self.pack_path}' was opened read-only.")
+        appended_files, appended_bytes = 0, 0
+
+        with self.__lock, open(self.pack_path, "ab") as pack, open(self.index_path, "a") as index:
+            new_entries = list()
+
+            for kind, (folder, extension) in PLAYER_FILES.items():
+                for uuid, path, stat in self.__scan(os.path.join(world_folder, folder), extension):
+                    latest = self.get_entry(uuid, kind)
+
+                    # Files with the same size and modification time weren't touched, so they aren't even read.
+                    if latest and latest["size"] == stat.st_size and latest["mtime"] == stat.st_mtime_ns: continue
+
+                    # The file may be removed by the server while scanning, skip it if so.
+                    try:
+                        with open(path, "rb") as player_file:
+                            data = player_file.read()
+                    except FileNotFoundError:
+                        continue
+
+                    if throttle: throttle.consume(len(data))
+                    sha256 = hashlib.sha256(data).hexdigest()
+                    entry = {"uuid": uuid, "kind": kind, "created": created, "size": len(data),
+                             "mtime": stat.st_mtime_ns, "sha256": sha256}
+
+                    # The server rewrites the files of online players even if nothing changed,
+                    # so the contents of the last version are reused when they are the same.
+                    if latest and latest["sha256"] == sha256:
+                        entry.update(offset=latest["offset"], length=latest["length"])
+                    else:
+                        compressed = zlib.compress(data)
+                        entry.update(offset=pack.tell(), length=len(compressed))
+                        pack.write(compressed)
+                        appended_files += 1
+                        appended_bytes += len(compressed)
+
+                    new_entries.append(entry)
+
+            # The data is made durable before the index points to it, so a crash never leaves the index dangling.
+            pack.flush()
+            os.fsync(pack.fileno())
+
+            for entry in new_entries:
+                index.write(json.dumps(entry) + "\n")
+                self.__add_entry(entry)
+
+            index.flush()
+            os.fsync(index.fileno())
+
+        return appended_files, appended_bytes
+
+
+    def get_entry(self, uuid: str, kind: str, moment: float = None):
+        """
+        Gets the version of a player file that was current at the given time.
+        :param uuid: The UUID of the player.
+        :param kind: The kind of file. (playerdata, stats or advancements)
+        :param moment: The point in time, or None for the newest version.
+        :return: Dictionary, the index entry of the file, or None if there was no version at that time.
+        """
+        entries = self.__entries.get(uuid, dict()).get(kind, list())
+        if moment is None: return entries[-1] if entries else None
+
+        position = bisect.bisect_right([entry["created"] for entry in entries], moment)
+        return entries[position - 1] if position else None
+
+
+    def get_players(self):
+        """
+        Gets the UUIDs of every player in the pack.
+        :return: List, containing the UUIDs.
+        """
+        return sorted(self.__entries.keys())
+
+
+    def get_history(self, uuid: str):
+        """
+        Gets every time at which a file of the given player was saved.
+        :param uuid: The UUID of the player.
+        :return: List, containing the times of every saved version, oldest first.
+        """
+        return sorted({entry["created"] for entries in self.__entries.get(uuid, dict()).values() for entry in entries})
+
+
+    def restore(self, uuid: str, world_folder: str, moment: float = None, since: float = None):
+        """
+        Restores the files of a player to how they were at the given time.
+        :param uuid: The UUID of the player.
+        :param world_folder: The world folder to restore the files into.
+        :param moment: The point in time, or None for the newest version.
+        :param since: Only restores the versions saved after this time, (e.g. over a restored world backup)
+        or None for any version.
+        :return: List, containing the paths of the restored files.
+        """
+        restored_paths = list()
+
+        with open(self.pack_path, "rb") as pack:
+            for kind, (folder, extension) in PLAYER_FILES.items():
+                entry = self.get_entry(uuid, kind, moment)
+                if entry is None or (since is not None and entry["created"] <= since): continue
+
+                pack.seek(entry["offset"])
+                data = zlib.decompress(pack.read(entry["length"]))
+                if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+                    raise CorruptBackup(f"The {kind} of '{uuid}' in '{self.pack_path}' "
+                                        f"doesn't match the hash it was saved with.")
+
+                # Writes into a temporary file first, so a failed restore never leaves a half-written file behind.
+                destination_path = os.path.join(world_folder, folder, uuid + extension)
+                os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+                with open(destination_path + ".restoring", "wb") as destination:
+                    destination.write(data)
+
+                os.replace(destination_path + ".restoring", destination_path)
+                restored_paths.append(destination_path)
+
+        return restored_paths
+
+
+    def __load_index(self):
+        """
+        Loads the index into memory, leaving out the entries whose data isn't in the pack,
+        and the last line if it is still being written. Nothing is changed on disk.
+        :return: Tuple, containing the entries loaded, the size of the pack they cover, and True if any was left out.
+        """
+        pack_size = os.path.getsize(self.pack_path) if os.path.exists(self.pack_path) else 0
+        indexed_size, entries, damaged = 0, list(), False
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as index:
+                for line in index:
+                    # A line cut off by a crash can only be the last one, and its data isn't durable either.
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        damaged = True
+                        break
+
+                    if entry["offset"] + entry["length"] > pack_size:
+                        damaged = True
+                        break
+
+                    entries.append(entry)
+                    self.__add_entry(entry)
+                    indexed_size = max(indexed_size, entry["offset"] + entry["length"])
+
+        return entries, indexed_size, damaged
+
+
+    def __repair(self, entries: list, indexed_size: int, damaged: bool):
+        """
+        Cuts off the data appended to the pack after the last indexed entry, which belongs to an interrupted
+        backup, and rewrites the index without the entries that were left out. Must be called while holding
+        the lock, and only when the pack was opened for writing.
+        :param entries: The entries loaded from the index.
+        :param indexed_size: The size of the pack they cover.
+        :param damaged: If set to True, some entries were left out, so the index is rewritten.
+        :return:
+        """
+        pack_size = os.path.getsize(self.pack_path) if os.path.exists(self.pack_path) else 0
+        if pack_size > indexed_size:
+            with open(self.pack_path, "r+b") as pack:
+                pack.truncate(indexed_size)
+
+        if not damaged: return
+
+        # Rewrites the index without the entries that were left out.
+        with open(self.index_path + ".tmp", "w") as index:
+            index.writelines(json.dumps(entry) + "\n" for entry in entries)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+
+    def __add_entry(self, entry: dict):
+        """
+        Adds an entry into the in-memory index.
+        :param entry: The entry to add.
+        :return:
+        """
+        self.__entries.setdefault(entry["uuid"], dict()).setdefault(entry["kind"], list()).append(entry)
+
+
+    @staticmethod
+    def __scan(folder: str, extension: str):
+        """
+        Lists the player files inside a folder.
+        :param folder: The folder to scan.
+        :param extension: The extension of the player files.
+        :return: Generator, yielding the UUID, path and stat result of every player file.
+        """
+        if not os.path.isdir(folder): return
+
+        with os.scandir(folder) as scanner:
+            for item in scanner:
+                if not item.name.endswith(extension) or not item.is_file(): continue
+                yield item.name[:-len(extension)], item.path, item.stat()
@@ -0,0 +1,292 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Built-in Imports
+from datetime import datetime
+import json
+import os
+import random
+import threading
+import time
+import traceback
+
+# Third Party Imports
+# Local Application Imports
+from exceptions import CorruptBackup
+from MCSMLogger import MCSMLogger
+
+
+class MCSMScheduler:
+    """
+    This class implements a scheduler that owns every periodical job of the MCSMs, such
+    as the backups. Jobs only start running once the server reports it is done loading,
+    at most one I/O heavy job runs at a time, and runs that were missed while waiting
+    are coalesced into a single one.
+    """
+
+    def __init__(self, logger: MCSMLogger):
+        self.__logger = logger
+        self.__jobs = list()
+        self.__condition = threading.Condition()
+        self.__io_busy = False
+        self.__claims = dict()
+        self.__server_ready = threading.Event()
+        self.__console_listeners = list()
+        self.__status_lock = threading.Lock()
+        self.__status_path = os.path.join(os.getcwd(), "server_files", "MCSM-Backups", "schedule.json")
+
+
+    def add_job(self, name: str, function, interval: float, priority: int = 0,
+                jitter: float = 0, io_heavy: bool = True):
+        """
+        Adds a job to the scheduler.
+        :param name: The name of the job, used in the logs and in the status.
+        :param function: The function to call every time the job runs.
+        :param interval: The amount of seconds between the end of a run and the start of the next one.
+        :param priority: Jobs with a higher priority run first when more than one is due.
+        :param jitter: Maximum amount of random seconds added to every wait, so jobs don't line up.
+        :param io_heavy: If set to True, the job never runs alongside another I/O heavy job.
+        :return:
+        """
+        with self.__condition:
+            self.__jobs.append({
+                "name": name,
+                "function": function,
+                "interval": interval,
+                "priority": priority,
+                "jitter": jitter,
+                "io_heavy": io_heavy,
+                "next_run": time.time() + random.uniform(0, jitter) if self.__server_ready.is_set() else None,
+                "last_run": None,
+                "last_duration": None,
+                "last_result": None,
+                "running": False,
+            })
+            self.__condition.notify_all()
+
+
+    def update_job(self, name: str, interval: float, jitter: float = None):
+        """
+        Changes how often a job runs. If it already ran, its next run is moved by the difference.
+        :param name: The name of the job.
+        :param interval: The new amount of seconds between the end of a run and the start of the next one.
+        :param jitter: The new maximum amount of random seconds added to every wait, or None to keep it.
+        :return: Boolean, True if the job exists.
+        """
+        with self.__condition:
+            job = next((job for job in self.__jobs if job["name"] == name), None)
+            if job is None: return False
+
+            # The first run isn't counted from a previous one, so only the later runs move.
+            if not job["running"] and job["last_run"] is not None and job["next_run"] is not None:
+                job["next_run"] += interval - job["interval"]
+
+            job["interval"] = interval
+            if jitter is not None: job["jitter"] = jitter
+
+            self.__condition.notify_all()
+
+        self.__logger.log(f"The '{name}' job now runs every {round(interval / 60, 1)} minutes.",
+                          level="SCHEDULER/INFO", console=False)
+        self.__save_status()
+        return True
+
+
+    def notify_server_ready(self):
+        """
+        Lets the scheduler know that the server finished loading, so the jobs can start running.
+        :return:
+        """
+        if self.__server_ready.is_set(): return
+
+        with self.__condition:
+            self.__server_ready.set()
+            for job in self.__jobs:
+                job["next_run"] = time.time() + random.uniform(0, job["jitter"])
+
+            self.__condition.notify_all()
+
+        self.__logger.log("The server is ready, starting the scheduled jobs.", level="SCHEDULER/INFO", console=False)
+        self.__save_status()
+
+
+    def add_console_listener(self, listener):
+        """
+        Adds a function to be called with every message the server logs, so
+        the jobs can react to what happens in the server. (e.g. players joining)
+        :param listener: The function to call, taking the message as its only argument.
+        :return:
+        """
+        self.__console_listeners.append(listener)
+
+
+    def notify_console(self, message: str):
+        """
+        Passes a message logged by the server into the console listeners.
+        :param message: The message, without the date and thread information.
+        :return:
+        """
+        for listener in self.__console_listeners:
+            listener(message)
+
+
+    def claim_job(self, name: str, tolerance: float = 0.1):
+        """
+        Lets a running job do the work of another job that is due soon, so both can share their
+        I/O. (e.g. the world backups also writing the playerdata backup from the same reads)
+        If claimed, the other job is rescheduled as if it had just run.
+        :param name: The name of the job to claim.
+        :param tolerance: How early the job can be claimed, as a fraction of its interval.
+        :return: Boolean, True if the job was claimed and its work should be done by the caller.
+        """
+        with self.__condition:
+            job = next((job for job in self.__jobs if job["name"] == name), None)
+            if job is None or job["running"] or job["next_run"] is None: return False
+            if job["next_run"] > time.time() + job["interval"] * tolerance: return False
+
+            # Keeps when the job was going to run, so the claim can be released if the caller fails.
+            self.__claims[name] = (job["last_run"], job["next_run"])
+            job["last_run"] = time.time()
+            job["next_run"] = time.time() + job["interval"] + random.uniform(0, job["jitter"])
+            self.__condition.notify_all()
+
+        self.__logger.log(f"The '{name}' job was claimed by another job.", level="SCHEDULER/INFO", console=False)
+        self.__save_status()
+        return True
+
+
+    def release_job(self, name: str):
+        """
+        Gives back a job claimed with claim_job whose work couldn't be done, so it runs when it was going to.
+        :param name: The name of the claimed job.
+        :return: Boolean, True if the job was claimed and got released.
+        """
+        with self.__condition:
+            job = next((job for job in self.__jobs if job["name"] == name), None)
+            claim = self.__claims.pop(name, None)
+            if job is None or claim is None: return False
+
+            job["last_run"], job["next_run"] = claim
+            self.__condition.notify_all()
+
+        self.__logger.log(f"The '{name}' job was released by the job that claimed it.",
+                          level="SCHEDULER/INFO", console=False)
+        self.__save_status()
+        return True
+
+
+    def start(self):
+        """
+        Runs the scheduler loop, starting every job once it is due.
+        This method never returns, so it should be run in a daemon thread.
+        :return:
+        """
+        self.__server_ready.wait()
+
+        while True:
+            with self.__condition:
+                job = self.__get_due_job()
+
+                # Sleeps until the next job is due, or until a job finishes.
+                if job is None:
+                    self.__condition.wait(timeout=self.__get_seconds_until_next_run())
+                    continue
+
+                job["running"] = True
+                if job["io_heavy"]: self.__io_busy = True
+
+            threading.Thread(target=self.__run_job, args=(job,), daemon=True).start()
+
+
+    def status(self):
+        """
+        Gets the current state of every job.
+        :return: List, containing a dictionary with the name, priority, next run, last run,
+        last duration (in seconds), last result and running state of every job.
+        """
+        with self.__condition:
+            return [{key: value for key, value in job.items() if key != "function"} for job in self.__jobs]
+
+
+    def __run_job(self, job: dict):
+        """
+        Runs a job, logging any error it raises, and schedules its next run.
+        :param job: The job to run.
+        :return:
+        """
+        started = time.time()
+        result = "failed"
+
+        # Jobs can return a short description of what they did, (e.g. why a backup was skipped) kept in the status.
+        # The errors of the MCSM derive from BaseException, so the ones jobs can raise are caught as well.
+        try:
+            result = job["function"]()
+        except (Exception, CorruptBackup):
+            self.__logger.log(f"The '{job['name']}' job failed.\n{traceback.format_exc()}", level="SCHEDULER/ERROR")
+
+        # Whatever the job raised, it is marked as done, so it doesn't keep the I/O slot forever.
+        # The next run is counted from the end of this one, so missed runs are coalesced.
+        finally:
+            with self.__condition:
+                job["running"] = False
+                job["last_run"] = started
+                job["last_duration"] = time.time() - started
+                job["last_result"] = result
+                job["next_run"] = time.time() + job["interval"] + random.uniform(0, job["jitter"])
+                self.__claims.pop(job["name"], None)
+                if job["io_heavy"]: self.__io_busy = False
+                self.__condition.notify_all()
+
+        self.__logger.log(f"The '{job['name']}' job took {round(job['last_duration'], 1)}s. Next run at "
+                          f"{datetime.fromtimestamp(job['next_run']).strftime('%d/%m/%Y %H:%M:%S')}.",
+                          level="SCHEDULER/INFO", console=False)
+        self.__save_status()
+
+
+    def __get_due_job(self):
+        """
+        Picks the due job with the highest priority that is allowed to run right now.
+        Must be called while holding the condition.
+        :return: Dictionary, the job to run, or None if no job can run.
+        """
+        now = time.time()
+        due_jobs = [job for job in self.__jobs
+                    if not job["running"] and job["next_run"] is not None and job["next_run"] <= now
+                    and not (job["io_heavy"] and self.__io_busy)]
+
+        if not due_jobs: return None
+        return max(due_jobs, key=lambda job: (job["priority"], -job["next_run"]))
+
+
+    def __get_seconds_until_next_run(self):
+        """
+        Calculates the amount of seconds until the next job that is allowed to run is due.
+        Jobs waiting for the I/O slot are left out, the job holding it wakes the loop when done.
+        Must be called while holding the condition.
+        :return: Float, the seconds until the next run, or None if no job is waiting.
+        """
+        next_runs = [job["next_run"] for job in self.__jobs
+                     if not job["running"] and job["next_run"] is not None
+                     and not (job["io_heavy"] and self.__io_busy)]
+        if not next_runs: return None
+        return max(min(next_runs) - time.time(), 0)
+
+
+    def __save_status(self):
+        """
+        Saves the state of the jobs into the schedule.json file, so
+        it can be checked from outside the MCSM.
+        :return:
+        """
+        status = self.status()
+        for job in status:
+            for key in ["next_run", "last_run"]:
+                if job[key] is not None: job[key] = datetime.fromtimestamp(job[key]).isoformat(timespec="seconds")
+
+        os.makedirs(os.path.dirname(self.__status_path), exist_ok=True)
+        with self.__status_lock, open(self.__status_path, "w") as status_file:
+            json.dump(status, status_file, indent=4)
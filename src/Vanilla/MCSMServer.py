@@ -6,8 +6,10 @@ __copyright__ = "
 __license__ = "GNU GENERAL PUBLIC LICENSE v3"
 
 # Built-in Imports
+from datetime import datetime
 import contextlib
 import os
+import shutil
 import sys
 import subprocess
 import socket
@@ -19,32 +21,78 @@ from bs4 import BeautifulSoup
 # Local Application Imports
 from exceptions import ImpossibleDownload
 from MCSMLogger import MCSMLogger
-from MCSMConfig import MCSMConfig
-
-
-class MCSMServer(MCSMConfig):
+from MCSMSettings import MCSMSettings
+from MCSMProperties import MCSMProperties, PROFILES
+from MCSMLaunch import MCSMLaunch
+from MCSMJava import MCSMJava
+from MCSMGCLog import MCSMGCLog
+from MCSMClassSharing import MCSMClassSharing
+from MCSMStartup import MCSMStartup
+from MCSMMemory import MCSMMemory
+from MCSMAffinity import MCSMAffinity
+from MCSMScheduler import MCSMScheduler
+
+
+class MCSMServer:
     """
     This class implements the main operations of the program,
     such as starting the server, managing downloads, etc...
-    This class inherits from MCSMConfig to access the settings.
+    The settings are given as the snapshot loaded by MCSMConfig.
     """
 
-    def __init__(self, logger: MCSMLogger):
-        super().__init__(logger)
-
+    def __init__(self, logger: MCSMLogger, scheduler: MCSMScheduler, settings: MCSMSettings,
+                 affinity: MCSMAffinity = None):
         # Essential properties to define the server "identity"
         self.version = "1.17.1"
         self.resources_url = self.__build_resources_url()
 
+        # The JVM flags this type of server needs, added after the ones of the launch profile.
+        self.jvm_flags = []
+
+        # The Java versions this server runs on. (None for no newest version)
+        self.java_versions = (MCSMJava.get_required_version(self.version), None)
+
+        # The folders, inside the server files, holding the classes the server loads besides its jar.
+        self.library_folders = ["libraries", "versions"]
+
         # Properties to be used during execution
         self._server_files_path = os.path.join(os.getcwd(), "server_files")
         self._server_path = os.path.join(self._server_files_path, f"minecraft_server.{self.version}.jar")
         self.__logger = logger
+        self.__scheduler = scheduler
+        self._settings = settings
+
+        # The cores the server runs on, picked by main.py before any thread started. (None to leave them as they are)
+        self.__affinity = affinity
+
+        # The heap is picked from the memory the server can use in auto mode, or checked against it otherwise.
+        self.__memory = MCSMMemory(logger)
+        self.__heap = self.__memory.get_heap_size(self._settings["allocated_ram"])
+        self.__launch = MCSMLaunch(settings, self.jvm_flags, self.__heap)
+
+        # Fails before downloading anything if no Java installed can run the server.
+        self.__java = MCSMJava(logger, settings).select(*self.java_versions)
+
+        # Follows the GC pauses of the server, to tell if they are behind the lag. Java 8 has no unified logging.
+        self.__gc_log = None
+        if self._settings["gc-logging"] and self.__java["major"] >= 9:
+            self.__gc_log = MCSMGCLog(logger, os.path.join(self._server_files_path, "mcsm_logs", "gc.log"),
+                                      self._settings["gc-long-pause"])
+            self.__scheduler.add_console_listener(self.__gc_log.process_console)
+        elif self._settings["gc-logging"]:
+            self.__logger.log(f"Java {self.__java['version']} can't write the GC log in the format the MCSM reads, "
+                              f"so the GC pauses won't be followed.", level="WARN", console=False)
+
+        # Keeps the classes the server loads in an archive, so the next starts don't load them again.
+        self.__class_sharing = None
+        if self._settings["class-sharing"]:
+            self.__class_sharing = MCSMClassSharing(logger, self.__java, self._server_path, self.library_folders)
+        self.__startup = MCSMStartup(logger, os.path.join(self._server_files_path, "MCSM-Runtime", "startup.json"))
         self.__ensure_file_integrity()
-        self._settings = self.load_settings()
 
-        if not self._settings["server-ip"]:
-            self._settings["server-ip"] = socket.gethostbyname(socket.gethostname())
+        # The settings can't be changed, so the address the server ends up on is kept apart.
+        self.__server_ip = self._settings["server-ip"] or socket.gethostbyname(socket.gethostname())
+        self.__server_port = self._settings["server-port"]
 
         self.__verify_port()
 
@@ -56,23 +104,27 @@ class MCSMServer(MCSMConfig):
         :return:
         """
 
-        # Checks if the eula.txt file doesn't exist.
-        # If it doesn't exist, run the server once ignoring the output
-        # and then agree to the eula.
+        # On a fresh install, the eula and the default server.properties are written here, so the server
+        # doesn't have to be started twice to create them. Versions without a bundled template still are.
+        has_properties = self.__write_default_properties()
         if not self.__agree_to_eula():
 
-            self.add_separator()
-            # Performs an initialization run to create the eula
-            self.__logger.log("Initializing Server... (Phase 1)")
-            proc = self.__start_server()
-            self.__process_output(proc, output=False)
-            self.__agree_to_eula()
-            self.__logger.log("Agreed to Mojang's EULA.")
+            if has_properties:
+                self.__write_eula()
+                self.__logger.log("Agreed to Mojang's EULA.")
+            else:
+                self.add_separator()
+                # Performs an initialization run to create the eula
+                self.__logger.log("Initializing Server... (Phase 1)")
+                proc = self.__start_server()
+                self.__process_output(proc, output=False)
+                self.__agree_to_eula()
+                self.__logger.log("Agreed to Mojang's EULA.")
 
-            # Performs an initialization run to create the properties
-            self.__logger.log("Initializing Server... (Phase 2)")
-            proc = self.__start_server()
-            self.__process_output(proc, output=False, exit_at="Preparing level")
+                # Performs an initialization run to create the properties
+                self.__logger.log("Initializing Server... (Phase 2)")
+                proc = self.__start_server()
+                self.__process_output(proc, output=False, exit_at="Preparing level")
 
 
         # Print the server information, and start it.
@@ -81,9 +133,11 @@ class MCSMServer(MCSMConfig):
         print(f"""
 Minecraft Server Makers - {__copyright__}
 Running {self._settings["server_name"]}
-IP Address: {self._settings["server-ip"]}:{self._settings["server-port"]}
+IP Address: {self.__server_ip}:{self.__server_port}
 Version: Vanilla {self.version}
-Allocated RAM: {self._settings["allocated_ram"]}MB ({int(self._settings["allocated_ram"])/1024} GB)
+Allocated RAM: {self.__heap}MB ({self.__heap/1024} GB){" (auto)" if self._settings["allocated_ram"] == "auto" else ""}
+JVM Profile: {self.__launch.profile}
+Java: {self.__java["version"]} ({self.__java["vendor"]})
 > REQUIRES LAN CONNECTION <
 Recommended: https://www.radmin-vpn.com/
         """.strip())
@@ -91,13 +145,25 @@ Recommended: https://www.radmin-vpn.com/
         self.__load_configs()  # Load the configurations from the config.mcsm file into the server.properties file.
 
         # Warns the user that running a server with less than 3GB might cause issues.
-        if int(self._settings["allocated_ram"]) < 3072:
-            self.__logger.log(f"The allocated ram is set to {self._settings['allocated_ram']}MB. "
+        if self.__heap < 3072:
+            self.__logger.log(f"The allocated ram is set to {self.__heap}MB. "
                               f"Running a server with less than 3GB of memory might cause performance "
                               f"issues.", level="WARN")
 
-        proc = self.__start_server()
-        self.__process_output(proc)
+        if self.__gc_log: self.__gc_log.start()
+        proc = self.__start_server(share_classes=True)
+        self.__memory.monitor_swap(proc.pid)
+        if self.__affinity: self.__affinity.register_server(proc.pid)
+
+        try:
+            self.__process_output(proc)
+        finally:
+            if self.__gc_log: self.__gc_log.stop()
+
+            # The archive is written while the server stops, so it is only there once the process ended.
+            if self.__class_sharing:
+                proc.wait()
+                self.__class_sharing.finish()
 
 
     def __build_resources_url(self):
@@ -190,19 +256,19 @@ Recommended: https://www.radmin-vpn.com/
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
 
             while True:
-                self.__logger.log(f'Testing PORT "{self._settings["server-port"]}" with HOST "{self._settings["server-ip"]}"', console=False)
+                self.__logger.log(f'Testing PORT "{self.__server_port}" with HOST "{self.__server_ip}"', console=False)
 
                 # Tests a connection to a given server:port.
                 # If it works and returns a code 0, it's being used.
                 try:
-                    sock.bind((self._settings["server-ip"], self._settings["server-port"]))
-                    self.__logger.log(f'PORT "{self._settings["server-port"]}" is open, Server IP is now set to {self._settings["server-ip"]}:{self._settings["server-port"]}', console=False)
+                    sock.bind((self.__server_ip, self.__server_port))
+                    self.__logger.log(f'PORT "{self.__server_port}" is open, Server IP is now set to {self.__server_ip}:{self.__server_port}', console=False)
                     break
                 except socket.error:
 
                     # Skips to the next port if the current port is being used
-                    self.__logger.log(f'PORT "{self._settings["server-port"]}" is being used, trying PORT {self._settings["server-port"] + 1}', console=False)
-                    self._settings["server-port"] += 1
+                    self.__logger.log(f'PORT "{self.__server_port}" is being used, trying PORT {self.__server_port + 1}', console=False)
+                    self.__server_port += 1
 
 
     def __agree_to_eula(self):
@@ -219,7 +285,7 @@ Recommended: https://www.radmin-vpn.com/
         # Checks if eula is already agreed to. If so, return True.
         with open(eula_path, "r") as eula:
             lines = eula.readlines()
-            if lines[-1] == "eula=true": return True
+            if lines[-1].strip() == "eula=true": return True
             lines.pop(-1)
 
         # Writes all the normal lines into the eula, but at last
@@ -231,18 +297,65 @@ Recommended: https://www.radmin-vpn.com/
         return True
 
 
-    def __start_server(self):
+    def __write_default_properties(self):
+        """
+        Writes the default server.properties of the server's version, if there is none yet.
+        :return: Boolean, True if there is a server.properties file, False if there is no template for the version.
+        """
+        properties_path = os.path.join(self._server_files_path, "server.properties")
+        if os.path.isfile(properties_path): return True
+
+        template_path = MCSMProperties.find_template(self.version)
+        if template_path is None: return False
+
+        shutil.copyfile(template_path, properties_path)
+        self.__logger.log(f"Created the default server.properties of Minecraft {self.version}.")
+        return True
+
+
+    def __write_eula(self):
+        """
+        Writes the eula.txt file, agreeing to Mojang's EULA, the way the server does.
+        :return:
+        """
+        with open(os.path.join(self._server_files_path, "eula.txt"), "w") as eula:
+            eula.write("#By changing the setting below to TRUE you are indicating your agreement to our EULA "
+                       "(https://account.mojang.com/documents/minecraft_eula).\n")
+            eula.write(f"#{datetime.now().strftime('%a %b %d %H:%M:%S %Y')}\n")
+            eula.write("eula=true\n")
+
+
+    def __start_server(self, share_classes: bool = False):
         """
         Runs the subprocess command to start the server,
         and returns the process for usage later on.
+        :param share_classes: If set to True, the server uses the class sharing archive, or writes it, and its
+        startup is timed. The initialization runs don't, since they are stopped halfway.
         :return: Subprocess.Popen
         """
 
+        gc_log = os.path.relpath(self.__gc_log.gc_log_path, self._server_files_path) if self.__gc_log else None
+        command = self.__launch.build_command(self._server_path, self.__java["path"], self.__java["flags"], gc_log,
+                                              self.__class_sharing if share_classes else None)
+        if self.__launch.unsupported_flags:
+            self.__logger.log(f"Java {self.__java['version']} doesn't have {', '.join(self.__launch.unsupported_flags)}, "
+                              f"so they were left out of the {self.__launch.profile} JVM profile.", level="WARN")
+
+        self.__logger.log(f"Launching the server with the {self.__launch.profile} JVM profile: "
+                          f"{MCSMLaunch.format_command(command)}", console=False)
+
         proc = subprocess.Popen(
-            ["java", f'-Xmx{self._settings["allocated_ram"]}M', f'-Xms{self._settings["allocated_ram"]}M', '-jar', f'{self._server_path}', 'nogui'],
+            command,
             cwd=self._server_files_path,
             stdout=subprocess.PIPE,
         )
+
+        # The server is moved onto its cores right after it is launched.
+        if self.__affinity: self.__affinity.pin_process(proc.pid)
+
+        if share_classes:
+            self.__startup.launched(class_sharing=self.__class_sharing.mode if self.__class_sharing else "off",
+                                    java=self.__java["version"], profile=self.__launch.profile)
         return proc
 
 
@@ -274,6 +387,15 @@ Recommended: https://www.radmin-vpn.com/
             parsed_decoded_log, level = self._parse_mc_logs(decoded_log)
             self.__logger.log(parsed_decoded_log, level=f"SERVER/{level}", console=output)
 
+            # Lets the scheduler start the backups once the server is done loading the world.
+            if not exit_at and parsed_decoded_log.startswith("Done ("):
+                self.__scheduler.notify_server_ready()
+
+            # Lets the jobs know about what happens in the server. (e.g. players joining)
+            if not exit_at:
+                self.__scheduler.notify_console(parsed_decoded_log)
+                self.__startup.process_output(parsed_decoded_log)
+
             # Checks if the subproccess has been terminated, if so, break.
             if proc.poll() is not None:
                 break
@@ -283,26 +405,33 @@ Recommended: https://www.radmin-vpn.com/
         """
         Loads the configurations from the settings file
         into the server.properties file. (At least the ones that apply.)
+        The properties of the chosen profile go first, then the server.properties settings written
+        in config.mcsm, and the address the server ended up on. Only the properties that changed are written.
         :return:
         """
-        mcsm_setting_keys = self._settings.keys()
-        properties_path = os.path.join(self._server_files_path, "server.properties")
-        with open(properties_path, "r") as properties_file:
-            properties = properties_file.readlines()
-
-        # This list comprehension changes all server.properties with the same names as
-        # any setting in the settings for their key=value equivalent in config.mcsm
-        updated_properties = list()
-        for line in properties:
-            property_key = line.split('=')[0]
-
-            if property_key in mcsm_setting_keys:
-                updated_properties.append(f"{property_key}={self._settings[property_key]}\n")
-            else:
-                updated_properties.append(line)
-
-        with open(properties_path, "w") as properties_file:
-            properties_file.writelines(updated_properties)
+        profile = self._settings["server-properties-profile"]
+        properties = MCSMProperties(os.path.join(self._server_files_path, "server.properties"))
+
+        values = dict(PROFILES[profile])
+        values.update({key: self._settings.raw(key) for key in self._settings if key in properties})
+        values.update({"server-ip": self.__server_ip, "server-port": self.__server_port})
+        changes, missing = properties.apply(values)
+
+        # The profiles are shared by every version, so this server may not have all of their properties.
+        missing = sorted(key for key in missing if key in PROFILES[profile])
+        if missing:
+            self.__logger.log(f"The {profile} profile sets {', '.join(missing)}, which Minecraft {self.version} "
+                              f"doesn't have, so they were left out.", level="CONFIG/INFO", console=False)
+
+        for key, (old_value, new_value) in changes.items():
+            self.__logger.log(f"server.properties: {key} changed from \"{old_value}\" to \"{new_value}\".",
+                              level="CONFIG/INFO", console=False)
+
+        if properties.save():
+            self.__logger.log(f"Changed {len(changes)} server.properties settings "
+                              f"({', '.join(changes)}), with the {profile} profile.", level="CONFIG/INFO")
+        else:
+            self.__logger.log("server.properties is up to date, it was left as it was.", console=False)
 
 
     @staticmethod
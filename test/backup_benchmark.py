@@ -0,0 +1,500 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = " Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Benchmarks every backup mode against a synthetic world, fully offline.
+# Every mode backs up a fresh copy of the same world twice: once as a first backup, and
+# once more after some chunks and player files were changed, like after a play session.
+# Each pass runs in its own process, so its CPU time and peak memory are its own.
+#
+#     python backup_benchmark.py --size 256 --players 2000 --output results.json
+#     python backup_benchmark.py --compare old_results.json new_results.json
+
+# Built-in Imports
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import zlib
+
+# Third Party Imports
+# Local Application Imports
+
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PATH = os.path.join(REPOSITORY_PATH, "resources", "CONFIG_TEMPLATE3.0.txt")
+
+# Region files hold 32x32 chunks, stored in 4KiB sectors after an 8KiB header.
+SECTOR_SIZE = 4096
+REGION_CHUNKS = 32 * 32
+
+# The block names repeated through the chunk sections, so chunks compress about as well as real ones.
+BLOCK_NAMES = [b"minecraft:stone", b"minecraft:deepslate", b"minecraft:dirt", b"minecraft:grass_block",
+               b"minecraft:water", b"minecraft:air", b"minecraft:netherrack", b"minecraft:end_stone"]
+
+# How the region bytes are shared between the dimensions, with their folders inside the world.
+DIMENSIONS = [("", 0.75), ("DIM-1", 0.15), ("DIM1", 0.10)]
+
+# The settings every mode runs with, so the backups run as fast as they can and nothing is deleted.
+BASE_SETTINGS = {
+    "BACKUPS": "True", "BACKUPS-NOTIFY": "False", "BACKUPS-SKIP-UNCHANGED": "False",
+    "BACKUPS-KEEP-LAST": "0", "BACKUPS-KEEP-HOURLY": "0", "BACKUPS-KEEP-DAILY": "0",
+    "BACKUPS-KEEP-WEEKLY": "0", "BACKUPS-KEEP-MONTHLY": "0", "BACKUPS-QUOTA": "0",
+    "PLAYERDATA-BACKUPS": "False", "PLAYERDATA-BACKUPS-NOTIFY": "False", "PLAYERDATA-BACKUPS-SKIP-UNCHANGED": "False",
+    "PLAYERDATA-BACKUPS-KEEP-LAST": "0", "PLAYERDATA-BACKUPS-KEEP-HOURLY": "0", "PLAYERDATA-BACKUPS-KEEP-DAILY": "0",
+    "PLAYERDATA-BACKUPS-KEEP-WEEKLY": "0", "PLAYERDATA-BACKUPS-KEEP-MONTHLY": "0", "PLAYERDATA-BACKUPS-QUOTA": "0",
+    "BACKUPS-IO-CLASS": "none", "BACKUPS-NICENESS": "0", "BACKUPS-RATE-LIMIT": "0",
+    "BACKUPS-ADAPTIVE-THROTTLE": "False",
+}
+
+# The benchmarked modes, as the settings they change and the backups system they run.
+MODES = {
+    "tarball": ({"BACKUPS-MODE": "tarball", "BACKUPS-FORMAT": "tar.gz"}, "backups"),
+    "zip": ({"BACKUPS-MODE": "tarball", "BACKUPS-FORMAT": "zip"}, "backups"),
+    "snapshot": ({"BACKUPS-MODE": "snapshot"}, "backups"),
+    "combined": ({"BACKUPS-MODE": "tarball", "PLAYERDATA-BACKUPS": "True",
+                  "PLAYERDATA-BACKUPS-MODE": "archive", "PLAYERDATA-BACKUPS-COMBINE": "True"}, "backups"),
+    "playerdata-archive": ({"PLAYERDATA-BACKUPS": "True", "PLAYERDATA-BACKUPS-MODE": "archive",
+                            "PLAYERDATA-BACKUPS-COMBINE": "False"}, "playerdata"),
+    "playerdata-pack": ({"PLAYERDATA-BACKUPS": "True", "PLAYERDATA-BACKUPS-MODE": "pack"}, "playerdata"),
+}
+
+# The folders each backups system reads, inside the world.
+SOURCES = {"backups": [""], "playerdata": ["playerdata", "stats", "advancements"]}
+
+
+def make_chunk(rng: random.Random):
+    """
+    Makes the data of a chunk as stored in a region file: its length, compression type and zlib compressed
+    sections, made of long runs of the same block with some noise in between, like real terrain.
+    :param rng: The random generator.
+    :return: Bytes, the chunk data, without its sector padding.
+    """
+    sections = list()
+    for _ in range(24):
+        sections.append(rng.choice(BLOCK_NAMES) * rng.randint(16, 160))
+        sections.append(rng.randbytes(rng.randint(32, 384)))
+
+    compressed = zlib.compress(b"".join(sections), 6)
+    return struct.pack(">IB", len(compressed) + 1, 2) + compressed
+
+
+def write_region(path: str, rng: random.Random, fill: float, limit: int):
+    """
+    Writes a region file with the given fraction of its chunks generated. Chunks are stored in a random
+    order, with a few free sectors left behind between them, like chunks that grew and were moved.
+    :param path: The path of the region file.
+    :param rng: The random generator.
+    :param fill: The fraction of the chunks that are generated.
+    :param limit: The size the region file stops growing at, in bytes.
+    :return: Integer, the size of the region file.
+    """
+    locations, timestamps = bytearray(SECTOR_SIZE), bytearray(SECTOR_SIZE)
+    slots = [slot for slot in range(REGION_CHUNKS) if rng.random() < fill]
+    rng.shuffle(slots)
+    sectors, sector = list(), 2
+
+    for slot in slots:
+        if sector * SECTOR_SIZE >= limit: break
+
+        data = make_chunk(rng)
+        count = -(-len(data) // SECTOR_SIZE)
+        struct.pack_into(">I", locations, slot * 4, sector << 8 | count)
+        struct.pack_into(">I", timestamps, slot * 4, 1792396800 - rng.randint(0, 86400 * 30))
+        sectors.append(data.ljust(count * SECTOR_SIZE, b"\0"))
+        sector += count
+
+        if rng.random() < 0.02:
+            sectors.append(rng.randbytes(SECTOR_SIZE))
+            sector += 1
+
+    with open(path, "wb") as region:
+        region.write(locations)
+        region.write(timestamps)
+        region.writelines(sectors)
+
+    return sector * SECTOR_SIZE
+
+
+def write_player(world_folder: str, player: str, rng: random.Random):
+    """
+    Writes the playerdata, stats and advancements files of a player.
+    :param world_folder: The world folder.
+    :param player: The UUID of the player.
+    :param rng: The random generator.
+    :return:
+    """
+    inventory = b"".join(rng.choice(BLOCK_NAMES) + rng.randbytes(12) for _ in range(rng.randint(10, 120)))
+    with open(os.path.join(world_folder, "playerdata", player + ".dat"), "wb") as playerdata:
+        playerdata.write(gzip.compress(b"\n\0\0" + inventory + rng.randbytes(rng.randint(200, 600))))
+
+    stats = {"stats": {"minecraft:mined": {name.decode(): rng.randint(0, 10 ** 5) for name in BLOCK_NAMES},
+                       "minecraft:custom": {f"minecraft:stat_{i}": rng.randint(0, 10 ** 6) for i in range(40)}},
+             "DataVersion": 3465}
+    with open(os.path.join(world_folder, "stats", player + ".json"), "w") as stats_file:
+        json.dump(stats, stats_file)
+
+    advancements = {f"minecraft:story/advancement_{i}": {"criteria": {"done": "2026-10-19 12:00:00 +0000"},
+                                                         "done": True} for i in range(rng.randint(5, 80))}
+    with open(os.path.join(world_folder, "advancements", player + ".json"), "w") as advancements_file:
+        json.dump(advancements, advancements_file, indent=2)
+
+
+def generate_world(world_folder: str, size: int, players: int, dimensions: int, seed: int):
+    """
+    Generates a synthetic world, with region files in every dimension (plus their entities and poi
+    folders), nested datapack dimensions, player files and the usual world files.
+    :param world_folder: The folder to generate the world in.
+    :param size: The target size of the region files, in bytes.
+    :param players: The amount of players.
+    :param dimensions: The amount of datapack dimensions, nested inside "dimensions".
+    :param seed: The seed of the random generator, so the same world is generated every time.
+    :return: List, containing the UUIDs of the players.
+    """
+    rng = random.Random(seed)
+    folders = [(dimension, share * 0.8 / (1 + dimensions * 0.05)) for dimension, share in DIMENSIONS]
+    folders += [(f"dimensions/benchmark/dimension_{i}", 0.8 * 0.05 / (1 + dimensions * 0.05)) for i in range(dimensions)]
+
+    for dimension, share in folders:
+        # Most of the bytes are in the region files, the entities and poi files are smaller and sparser.
+        for region_folder, fill, budget in (("region", 1.0, share * size), ("entities", 0.4, share * size / 8),
+                                            ("poi", 0.2, share * size / 16)):
+            folder = os.path.join(world_folder, dimension, region_folder)
+            os.makedirs(folder, exist_ok=True)
+            written, x = 0, 0
+
+            while written < budget:
+                written += write_region(os.path.join(folder, f"r.{x % 8 - 4}.{x // 8 - 4}.mca"), rng,
+                                        fill * rng.uniform(0.6, 1.0), budget - written)
+                x += 1
+
+    for folder in ("playerdata", "stats", "advancements", "data", "datapacks"):
+        os.makedirs(os.path.join(world_folder, folder), exist_ok=True)
+
+    player_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(players)]
+    for player in player_ids:
+        write_player(world_folder, player, rng)
+
+    for name in ("level.dat", "level.dat_old", "data/raids.dat", "data/random_sequences.dat", "data/scoreboard.dat"):
+        with open(os.path.join(world_folder, name), "wb") as world_file:
+            world_file.write(gzip.compress(rng.randbytes(512) + b"\0" * 4096))
+
+    for index in range(50):
+        with open(os.path.join(world_folder, "data", f"map_{index}.dat"), "wb") as map_file:
+            map_file.write(gzip.compress(rng.choice(BLOCK_NAMES) * 800 + rng.randbytes(1024)))
+
+    with open(os.path.join(world_folder, "session.lock"), "wb") as session_lock:
+        session_lock.write(b"\xe2\x98\x83")
+
+    return player_ids
+
+
+def play_session(world_folder: str, player_ids: list, seed: int, changed: float):
+    """
+    Changes the world like a play session would: some chunks of some region files are rewritten, some players
+    change their files, and the server rewrites the files of the online players even if they didn't change.
+    :param world_folder: The world folder.
+    :param player_ids: The UUIDs of the players.
+    :param seed: The seed of the random generator.
+    :param changed: The fraction of the region files and players that are changed.
+    :return:
+    """
+    rng = random.Random(seed + 1)
+    regions = sorted(os.path.join(dirpath, filename) for dirpath, dirnames, filenames in os.walk(world_folder)
+                     for filename in filenames if filename.endswith(".mca"))
+
+    for path in rng.sample(regions, max(1, int(len(regions) * changed))):
+        # Chunks are rewritten in place when they still fit their sectors, and appended at the end when they don't.
+        with open(path, "r+b") as region:
+            locations = bytearray(region.read(SECTOR_SIZE))
+            end = os.path.getsize(path) // SECTOR_SIZE
+
+            for slot in rng.sample(range(REGION_CHUNKS), 64):
+                location = struct.unpack_from(">I", locations, slot * 4)[0]
+                if not location: continue
+
+                data = make_chunk(rng)
+                count = -(-len(data) // SECTOR_SIZE)
+                sector = location >> 8 if count <= location & 0xFF else end
+                if sector == end: end += count
+
+                region.seek(sector * SECTOR_SIZE)
+                region.write(data.ljust(count * SECTOR_SIZE, b"\0"))
+                struct.pack_into(">I", locations, slot * 4, sector << 8 | count)
+
+            region.seek(0)
+            region.write(locations)
+
+    online = rng.sample(player_ids, int(len(player_ids) * changed * 2))
+    for index, player in enumerate(online):
+        if index % 2 == 0:
+            write_player(world_folder, player, rng)
+            continue
+
+        for folder, extension in (("playerdata", ".dat"), ("stats", ".json"), ("advancements", ".json")):
+            os.utime(os.path.join(world_folder, folder, player + extension))
+
+    os.utime(os.path.join(world_folder, "level.dat"))
+
+
+def write_config(server_folder: str, settings: dict):
+    """
+    Writes the config of a benchmarked server from the config template, so it never has to be downloaded.
+    :param server_folder: The server files folder.
+    :param settings: The settings to change from the template.
+    :return:
+    """
+    with open(TEMPLATE_PATH, "r", encoding="latin-1") as template:
+        lines = template.readlines()
+
+    for index, line in enumerate(lines):
+        key = line.split("=")[0].strip()
+        if "=" in line and not line.startswith(("#", "//")) and key in settings:
+            lines[index] = f"{key}={settings[key]}\n"
+
+    with open(os.path.join(server_folder, "config.mcsm"), "w", encoding="latin-1") as config_file:
+        config_file.writelines(lines)
+
+
+def get_folder_size(folder: str, unique: bool = True):
+    """
+    Gets the amount of bytes the files inside a folder take.
+    :param folder: The folder.
+    :param unique: If set to True, hardlinked files are only counted once, as they only take space once.
+    :return: Tuple, containing the amount of bytes and the amount of files.
+    """
+    seen, size, files = set(), 0, 0
+
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for filename in filenames:
+            stat = os.lstat(os.path.join(dirpath, filename))
+            if unique and (stat.st_dev, stat.st_ino) in seen: continue
+
+            seen.add((stat.st_dev, stat.st_ino))
+            size += stat.st_size
+            files += 1
+
+    return size, files
+
+
+def get_usage():
+    """
+    Gets the CPU time used by this process and the worker processes it waited for, and their peak memory usage.
+    :return: Tuple, containing the CPU time in seconds and the peak resident memory in bytes, or None if unknown.
+    """
+    try:
+        import resource
+    except ImportError:
+        return time.process_time(), None  # Windows has no resource module.
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    workers_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    peak_rss = max(usage.ru_maxrss, workers_usage.ru_maxrss) * (1 if sys.platform == "darwin" else 1024)
+    return usage.ru_utime + usage.ru_stime + workers_usage.ru_utime + workers_usage.ru_stime, peak_rss
+
+
+def run_pass(mode: str, variant: str, result_path: str):
+    """
+    Makes a single backup in the current folder, as a freshly started MCSM would, and saves how it went.
+    This runs in its own process, started by benchmark_mode.
+    :param mode: The benchmarked mode.
+    :param variant: The MCSM variant whose modules are used. (e.g. Fabric)
+    :param result_path: The path of the file to save the results into.
+    :return:
+    """
+    sys.path.insert(0, os.path.join(REPOSITORY_PATH, "src", variant))
+    from MCSMLogger import MCSMLogger
+    from MCSMConfig import MCSMConfig
+    from MCSMScheduler import MCSMScheduler
+    from MCSMBackups import MCSMBackups
+    from MCSMPlayerdataBackups import MCSMPlayerdataBackups
+
+    logger = MCSMLogger()
+    settings = MCSMConfig(logger).settings
+    scheduler = MCSMScheduler(logger)
+    playerdata_backups = MCSMPlayerdataBackups(logger, settings)
+    playerdata_backups.schedule(scheduler)
+    backups = MCSMBackups(logger, settings)
+    backups.schedule(scheduler, playerdata_backups)
+
+    # Makes the jobs due, so the combined mode writes the playerdata backup along with the world backup.
+    scheduler.notify_server_ready()
+
+    cpu_time, peak_rss = get_usage()
+    started = time.perf_counter()
+    result = (backups if MODES[mode][1] == "backups" else playerdata_backups).backup()
+    wall_time = time.perf_counter() - started
+    cpu_time = get_usage()[0] - cpu_time
+
+    with open(result_path, "w") as result_file:
+        json.dump({"result": result, "wall_time": wall_time, "cpu_time": cpu_time,
+                   "peak_rss": get_usage()[1]}, result_file)
+
+
+def benchmark_mode(mode: str, base_folder: str, work_folder: str, player_ids: list, arguments: argparse.Namespace):
+    """
+    Benchmarks a mode on its own copy of the world, making a first backup and another one after a play session.
+    :param mode: The benchmarked mode.
+    :param base_folder: The folder holding the generated world.
+    :param work_folder: The folder to run the mode in.
+    :param player_ids: The UUIDs of the players.
+    :param arguments: The parsed command line arguments.
+    :return: List, containing the results of both passes.
+    """
+    mode_folder = os.path.join(work_folder, mode)
+    server_folder = os.path.join(mode_folder, "server_files")
+    world_folder = os.path.join(server_folder, "world")
+    backups_folder = os.path.join(server_folder, "MCSM-Backups")
+
+    shutil.copytree(os.path.join(base_folder, "world"), world_folder)
+    write_config(server_folder, {**BASE_SETTINGS, **MODES[mode][0]})
+    results = list()
+
+    for backup_pass in ("first", "incremental"):
+        if backup_pass == "incremental":
+            play_session(world_folder, player_ids, arguments.seed, arguments.changed)
+
+        source_bytes, source_files = 0, 0
+        for folder in SOURCES[MODES[mode][1]]:
+            folder_size = get_folder_size(os.path.join(world_folder, folder))
+            source_bytes, source_files = source_bytes + folder_size[0], source_files + folder_size[1]
+
+        output_before = get_folder_size(backups_folder)[0] if os.path.isdir(backups_folder) else 0
+        result_path = os.path.join(mode_folder, "result.json")
+
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--run-pass", mode, "--variant", arguments.variant,
+                        "--result", result_path], cwd=mode_folder, check=True, stdout=subprocess.DEVNULL)
+
+        with open(result_path, "r") as result_file:
+            result = json.load(result_file)
+
+        # The catalog and schedule status aren't backups, and only take a few KB.
+        output_bytes = get_folder_size(backups_folder)[0] - output_before
+        results.append({"mode": mode, "pass": backup_pass, "source_bytes": source_bytes, "source_files": source_files,
+                        "output_bytes": output_bytes, "throughput": source_bytes / result["wall_time"], **result})
+
+    shutil.rmtree(mode_folder, ignore_errors=True)
+    return results
+
+
+def get_commit():
+    """
+    Gets the commit the benchmark is running on, so the results can be told apart.
+    :return: String, the commit hash, or None if it can't be known.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPOSITORY_PATH, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list):
+    """
+    Prints the results as a table.
+    :param results: The results of every pass.
+    :return:
+    """
+    print(f"{'Mode':<20}{'Pass':<13}{'Source':>10}{'Output':>10}{'Time':>9}{'CPU':>9}{'MB/s':>9}{'Peak RSS':>10}")
+
+    for result in results:
+        peak_rss = f"{result['peak_rss'] / 2 ** 20:.0f} MB" if result["peak_rss"] else "?"
+        print(f"{result['mode']:<20}{result['pass']:<13}{result['source_bytes'] / 2 ** 20:>7.1f} MB"
+              f"{result['output_bytes'] / 2 ** 20:>7.1f} MB{result['wall_time']:>8.2f}s{result['cpu_time']:>8.2f}s"
+              f"{result['throughput'] / 2 ** 20:>9.1f}{peak_rss:>10}")
+
+
+def compare_results(old_path: str, new_path: str):
+    """
+    Prints how the results of a benchmark changed from another one, for every pass they share.
+    :param old_path: The path of the older results.
+    :param new_path: The path of the newer results.
+    :return:
+    """
+    with open(old_path, "r") as old_file, open(new_path, "r") as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+
+    if old["world"] != new["world"]:
+        print("Warning: the results were taken on different worlds, so they can't be compared exactly.")
+
+    old_results = {(result["mode"], result["pass"]): result for result in old["results"]}
+    print(f"Comparing {old['commit'] or old_path} to {new['commit'] or new_path}")
+    print(f"{'Mode':<20}{'Pass':<13}{'Time':>9}{'CPU':>9}{'Output':>9}{'Peak RSS':>10}")
+
+    for result in new["results"]:
+        previous = old_results.get((result["mode"], result["pass"]))
+        if previous is None: continue
+
+        changes = [f"{(result[key] / previous[key] - 1) * 100:>+8.1f}%" if result[key] and previous[key] else "?"
+                   for key in ("wall_time", "cpu_time", "output_bytes", "peak_rss")]
+        print(f"{result['mode']:<20}{result['pass']:<13}{changes[0]:>9}{changes[1]:>9}{changes[2]:>9}{changes[3]:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the MCSM backup modes against a synthetic world.")
+    parser.add_argument("--size", type=float, default=128, help="The size of the region files, in MB.")
+    parser.add_argument("--players", type=int, default=2000, help="The amount of players.")
+    parser.add_argument("--dimensions", type=int, default=2, help="The amount of nested datapack dimensions.")
+    parser.add_argument("--changed", type=float, default=0.05,
+                        help="The fraction of the region files and players changed before the incremental pass.")
+    parser.add_argument("--seed", type=int, default=2026, help="The seed of the generated world.")
+    parser.add_argument("--modes", default=",".join(MODES), help="The comma separated modes to benchmark.")
+    parser.add_argument("--variant", default="Fabric", help="The MCSM variant whose modules are benchmarked.")
+    parser.add_argument("--work-folder", default=None, help="The folder to generate the world in.")
+    parser.add_argument("--output", default="backup_benchmark.json", help="The file to save the results into.")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compares two result files.")
+    parser.add_argument("--run-pass", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.run_pass:
+        return run_pass(arguments.run_pass, arguments.variant, arguments.result)
+
+    if arguments.compare:
+        return compare_results(*arguments.compare)
+
+    modes = [mode.strip() for mode in arguments.modes.split(",") if mode.strip()]
+    unknown_modes = [mode for mode in modes if mode not in MODES]
+    if unknown_modes: parser.error(f"Unknown modes: {', '.join(unknown_modes)}. Known modes: {', '.join(MODES)}")
+
+    work_folder = tempfile.mkdtemp(prefix="mcsm-benchmark-", dir=arguments.work_folder)
+    try:
+        started = time.perf_counter()
+        player_ids = generate_world(os.path.join(work_folder, "base", "world"), int(arguments.size * 2 ** 20),
+                                    arguments.players, arguments.dimensions, arguments.seed)
+        world_bytes, world_files = get_folder_size(os.path.join(work_folder, "base", "world"))
+        print(f"Generated a {world_bytes / 2 ** 20:.1f} MB world with {world_files} files "
+              f"in {time.perf_counter() - started:.1f}s.")
+
+        results = list()
+        for mode in modes:
+            results += benchmark_mode(mode, os.path.join(work_folder, "base"), work_folder, player_ids, arguments)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    print_results(results)
+    with open(arguments.output, "w") as output_file:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": get_commit(), "variant": arguments.variant,
+                   "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                   "world": {"size": arguments.size, "players": arguments.players, "dimensions": arguments.dimensions,
+                             "changed": arguments.changed, "seed": arguments.seed, "bytes": world_bytes,
+                             "files": world_files},
+                   "results": results}, output_file, indent=2)
+
+    print(f"Results saved at '{os.path.abspath(arguments.output)}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# -*- coding: latin-1 -*-
+# Created at 19/10/2026
+__author__ = "MrKelpy / Alexandre Silva"
+__github__ = "github.com/MrKelpy"
+__copyright__ = "� Alexandre Silva 2021"
+__license__ = "GNU GENERAL PUBLIC LICENSE v3"
+
+# Tests the GC log parser against logs recorded from G1, ZGC and a Full GC, and the pause percentiles.
+# The GC log code is the same for every MCSM type, so the Fabric one is tested.
+#
+#     python gc_log_test.py
+
+# Built-in Imports
+from datetime import datetime, timezone
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Third Party Imports
+# Local Application Imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "Fabric"))
+from MCSMGCLog import MCSMGCLog
+
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "gc")
+
+
+class QuietLogger:
+    """
+    This class implements a logger that keeps the messages instead of writing them.
+    """
+
+    def __init__(self):
+        self.messages = list()
+
+
+    def log(self, message: str, level: str = "INFO", console: bool = True):
+        self.messages.append((level, message))
+
+
+class GCLogTest(unittest.TestCase):
+    """
+    This class implements the tests of the GC log parser, following each recorded log as if the server wrote it.
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.gc_log_path = os.path.join(self.folder, "gc.log")
+        self.logger = QuietLogger()
+
+        # The log starts empty, since whatever it has before the server starts belongs to an earlier run.
+        open(self.gc_log_path, "w").close()
+        self.gc_log = MCSMGCLog(self.logger, self.gc_log_path, 200)
+        self.gc_log.start()
+
+
+    def tearDown(self):
+        self.gc_log.stop()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+    def write(self, text: str):
+        with open(self.gc_log_path, "a") as gc_log:
+            gc_log.write(text)
+
+
+    def follow(self, fixture: str):
+        with open(os.path.join(FIXTURES_PATH, fixture), "r") as fixture_file:
+            self.write(fixture_file.read())
+        return self.gc_log.stop()
+
+
+    def test_g1(self):
+        stats = self.follow("g1.log")
+        self.assertEqual(stats["pauses"], 5)
+        self.assertEqual(stats["total_pause"], 66.0)
+        self.assertEqual((stats["p50"], stats["p99"], stats["max"]), (10.0, 30.0, 30.0))
+        self.assertEqual(stats["longest"], "Pause Young (Concurrent Start) (G1 Humongous Allocation)")
+        self.assertEqual(stats["heap_after"], 52.0)
+        self.assertEqual(stats["allocation_rate"], 12.6)
+        self.assertTrue(os.path.isfile(os.path.join(self.folder, "gc-summary.json")))
+
+
+    def test_zgc(self):
+        stats = self.follow("zgc.log")
+
+        # Concurrent phases don't pause the server, and generational ZGC starts its pauses with "y:" or "O:".
+        self.assertEqual(stats["pauses"], 6)
+        self.assertEqual((stats["p50"], stats["max"]), (0.012, 0.03))
+        self.assertEqual(stats["heap_after"], 160.0)
+        self.assertEqual(stats["allocation_rate"], 10.0)
+
+
+    def test_full_gc(self):
+        stats = self.follow("full_gc.log")
+        self.assertEqual(stats["pauses"], 2)
+        self.assertEqual(stats["max"], 450.5)
+        self.assertEqual(stats["longest"], "Pause Full (G1 Compaction Pause)")
+        self.assertIn(("GC/WARN", "Long GC pause, Pause Full (G1 Compaction Pause) took 450.5ms."),
+                      self.logger.messages)
+
+
+    def write_pause(self, duration: float):
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "+0000"
+        self.write(f"[{now}][60.000s][info][gc          ] GC(4) Pause Young (Normal) (G1 Evacuation Pause) "
+                   f"900M->300M(1024M) {duration:.3f}ms\n")
+
+
+    def test_lag_from_gc(self):
+        self.write_pause(300)
+        self.gc_log.process_console("Can't keep up! Is the server overloaded? Running 2500ms or 50 ticks behind")
+        self.gc_log.process_console("Player joined the game")
+        self.assertEqual((self.gc_log.lag_events, self.gc_log.gc_lag_events), (1, 1))
+
+
+    def test_lag_from_elsewhere(self):
+        # The lag is taken to come from the GC only if the pauses right before it add up to a long one.
+        self.write_pause(10)
+        self.gc_log.process_console("Can't keep up! Is the server overloaded? Running 2500ms or 50 ticks behind")
+        self.assertEqual((self.gc_log.lag_events, self.gc_log.gc_lag_events), (1, 0))
+
+
+    def test_lag_without_pauses(self):
+        # Even if every pause counts as a long one, a lag with no pauses before it isn't blamed on the GC.
+        self.gc_log.stop()
+        self.gc_log = MCSMGCLog(self.logger, self.gc_log_path, 0)
+        self.gc_log.start()
+        self.gc_log.process_console("Can't keep up! Is the server overloaded? Running 2500ms or 50 ticks behind")
+        self.assertEqual((self.gc_log.lag_events, self.gc_log.gc_lag_events), (1, 0))
+
+
+    def test_percentile(self):
+        self.assertEqual(MCSMGCLog.percentile(list(range(1, 101)), 0.99), 99)
+        self.assertEqual(MCSMGCLog.percentile(list(range(1, 101)), 0.07), 7)
+        self.assertEqual(MCSMGCLog.percentile(list(range(1, 11)), 0.5), 5)
+        self.assertEqual(MCSMGCLog.percentile([4.0], 0.99), 4.0)
+        self.assertEqual(MCSMGCLog.percentile([1, 2, 3], 0), 1)
+        self.assertEqual(MCSMGCLog.percentile([1, 2, 3], 1), 3)
+        self.assertIsNone(MCSMGCLog.percentile([], 0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()